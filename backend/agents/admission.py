@@ -0,0 +1,111 @@
+from typing import Awaitable, Callable, Dict
+from contextlib import asynccontextmanager
+import asyncio
+import structlog
+
+from config import settings
+
+logger = structlog.get_logger()
+
+
+class Overloaded(Exception):
+    """Raised when the chat path should shed load instead of queueing"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrent LLM calls per process.
+
+    Up to CHAT_MAX_CONCURRENT_LLM_CALLS run at once; further calls wait in
+    a bounded queue. New chat turns are rejected up front once the queue
+    is CHAT_MAX_QUEUED_LLM_CALLS deep, and queued calls give up after
+    CHAT_QUEUE_TIMEOUT_SECONDS, so a traffic spike turns into fast 429s
+    instead of an ever-growing backlog on the LLM backend.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+
+    def check(self):
+        """Reject a new chat turn if the LLM queue is already too deep"""
+        if self.queued >= self.max_queued:
+            logger.warning("chat_load_shed", active=self.active, queued=self.queued)
+            raise Overloaded(settings.CHAT_RETRY_AFTER_SECONDS)
+
+    @asynccontextmanager
+    async def llm_slot(self):
+        """Hold one LLM concurrency slot for the duration of a call"""
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("llm_queue_timeout", active=self.active, queued=self.queued)
+            raise Overloaded(settings.CHAT_RETRY_AFTER_SECONDS)
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+class ConversationGate:
+    """
+    Serializes chat turns per conversation_id and coalesces duplicates.
+
+    An identical message for a conversation that is already being
+    processed (double submit, frontend retry) awaits the in-flight turn
+    instead of starting new LLM calls and searches. Different messages
+    for the same conversation run one after another.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+
+    async def run(self, conversation_id: str, message: str, turn: Callable[[], Awaitable]):
+        key = (conversation_id, message)
+        task = self._in_flight.get(key)
+
+        if task is not None:
+            logger.info("chat_turn_coalesced", conversation_id=conversation_id)
+        else:
+            task = asyncio.create_task(self._serialized(conversation_id, turn))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # Shield so a disconnecting client doesn't cancel the turn for the others
+        return await asyncio.shield(task)
+
+    async def _serialized(self, conversation_id: str, turn: Callable[[], Awaitable]):
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        self._lock_users[conversation_id] = self._lock_users.get(conversation_id, 0) + 1
+        try:
+            async with lock:
+                return await turn()
+        finally:
+            self._lock_users[conversation_id] -= 1
+            if not self._lock_users[conversation_id]:
+                del self._lock_users[conversation_id]
+                del self._locks[conversation_id]
+
+
+admission_controller = AdmissionController(
+    max_concurrent=settings.CHAT_MAX_CONCURRENT_LLM_CALLS,
+    max_queued=settings.CHAT_MAX_QUEUED_LLM_CALLS,
+    queue_timeout=settings.CHAT_QUEUE_TIMEOUT_SECONDS
+)
+conversation_gate = ConversationGate()
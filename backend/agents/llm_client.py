@@ -1,44 +1,97 @@
 from typing import List, Dict, Optional
 import structlog
 import json
+import httpx
 from config import settings
 
 logger = structlog.get_logger()
 
+# Beta flag required by older Anthropic API versions for cache_control blocks
+ANTHROPIC_PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
 
 class LLMClient:
     """
     Unified LLM client supporting multiple providers (OpenAI, Anthropic, Azure).
     Configurable via environment variables.
+
+    A single instance is meant to be shared by the whole process (see
+    get_llm_client) so the underlying HTTP connection pool stays warm
+    between chat turns.
     """
 
-    def __init__(self):
-        self.provider = settings.LLM_PROVIDER
-        self.model = settings.LLM_MODEL
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        name: Optional[str] = None
+    ):
+        # Defaults come from LLM_PROVIDER/LLM_MODEL; explicit arguments are
+        # used by LLMRouter to build one client per configured backend
+        self.provider = provider or settings.LLM_PROVIDER
+        self.model = model or settings.LLM_MODEL
+        self.name = name or self.provider
+
+        # Keep-alive pool shared by every request made through this client
+        self.http_client = httpx.AsyncClient(
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
 
         if self.provider == "openai":
             from openai import AsyncOpenAI
-            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            # base_url lets any OpenAI-compatible server (vLLM, stubs) be used
+            self.client = AsyncOpenAI(
+                api_key=api_key or settings.OPENAI_API_KEY,
+                base_url=base_url or settings.OPENAI_BASE_URL or None,
+                http_client=self.http_client
+            )
         elif self.provider == "anthropic":
             from anthropic import AsyncAnthropic
-            self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+            self.client = AsyncAnthropic(
+                api_key=api_key or settings.ANTHROPIC_API_KEY,
+                base_url=base_url,
+                http_client=self.http_client
+            )
         elif self.provider == "azure":
             from openai import AsyncAzureOpenAI
             self.client = AsyncAzureOpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
+                api_key=api_key or settings.OPENAI_API_KEY,
+                azure_endpoint=base_url or settings.AZURE_OPENAI_ENDPOINT,
+                http_client=self.http_client
             )
         elif self.provider == "ollama":
             from openai import AsyncOpenAI
             # Ollama usa API compatível com OpenAI
             self.client = AsyncOpenAI(
-                base_url=f"{settings.OLLAMA_BASE_URL}/v1",
-                api_key="ollama"  # Ollama não precisa de key real
+                base_url=base_url or f"{settings.OLLAMA_BASE_URL}/v1",
+                api_key="ollama",  # Ollama não precisa de key real
+                http_client=self.http_client
             )
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
 
-        logger.info("llm_client_initialized", provider=self.provider, model=self.model)
+        # Tool lists are module constants, so the Anthropic conversion is
+        # computed once per list and reused on every call
+        self._anthropic_tools_cache: Dict[int, tuple] = {}
+
+        logger.info("llm_client_initialized", name=self.name, provider=self.provider, model=self.model)
+
+    @property
+    def supports_tools(self) -> bool:
+        """Ollama's OpenAI-compatible endpoint is used without function calling"""
+        return self.provider != "ollama"
+
+    async def aclose(self):
+        """Close the underlying HTTP connection pool"""
+        await self.http_client.aclose()
+        logger.info("llm_client_closed", name=self.name, provider=self.provider)
 
     async def chat_completion(
         self,
@@ -55,9 +108,21 @@ class LLMClient:
                 "function_call": {
                     "name": str,
                     "arguments": str (JSON)
-                } (optional)
+                } (optional),
+                "usage": {
+                    "input_tokens": int,
+                    "cached_input_tokens": int,
+                    "output_tokens": int
+                }
             }
+
+        The system prompt and tool schema form a stable prefix that is
+        identical on every turn; when LLM_PROMPT_CACHE_ENABLED is set it is
+        marked as cacheable for providers that support it.
         """
+        if not self.supports_tools:
+            tools = None
+
         try:
             if self.provider in ["openai", "azure", "ollama"]:
                 return await self._openai_completion(messages, tools, temperature)
@@ -65,7 +130,7 @@ class LLMClient:
                 return await self._anthropic_completion(messages, tools, temperature)
 
         except Exception as e:
-            logger.error("llm_error", error=str(e), provider=self.provider)
+            logger.error("llm_error", error=str(e), name=self.name, provider=self.provider)
             raise
 
     async def _openai_completion(
@@ -85,11 +150,18 @@ class LLMClient:
             params["tools"] = tools
             params["tool_choice"] = "auto"
 
+        # OpenAI/Azure reuse identical prompt prefixes automatically. For
+        # ollama, keeping the model resident keeps its KV cache for the
+        # shared system prompt + tools prefix between turns.
+        if settings.LLM_PROMPT_CACHE_ENABLED and self.provider == "ollama":
+            params["extra_body"] = {"keep_alive": settings.OLLAMA_KEEP_ALIVE}
+
         response = await self.client.chat.completions.create(**params)
         message = response.choices[0].message
 
         result = {
-            "content": message.content or ""
+            "content": message.content or "",
+            "usage": self._openai_usage(response)
         }
 
         # Check for function call
@@ -126,16 +198,27 @@ class LLMClient:
         }
 
         if system_message:
-            params["system"] = system_message
+            if settings.LLM_PROMPT_CACHE_ENABLED:
+                params["system"] = [{
+                    "type": "text",
+                    "text": system_message,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            else:
+                params["system"] = system_message
 
         if tools:
             # Convert OpenAI tool format to Anthropic format
-            params["tools"] = self._convert_tools_to_anthropic(tools)
+            params["tools"] = self._get_anthropic_tools(tools)
+
+        if settings.LLM_PROMPT_CACHE_ENABLED:
+            params["extra_headers"] = {"anthropic-beta": ANTHROPIC_PROMPT_CACHING_BETA}
 
         response = await self.client.messages.create(**params)
 
         result = {
-            "content": ""
+            "content": "",
+            "usage": self._anthropic_usage(response)
         }
 
         # Parse response content
@@ -150,6 +233,65 @@ class LLMClient:
 
         return result
 
+    def _openai_usage(self, response) -> Dict:
+        """Extract cached/uncached prompt token counts from an OpenAI-style response"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+        return self._log_usage(
+            input_tokens=usage.prompt_tokens or 0,
+            cached_input_tokens=cached,
+            output_tokens=usage.completion_tokens or 0
+        )
+
+    def _anthropic_usage(self, response) -> Dict:
+        """Extract cached/uncached input token counts from an Anthropic response"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+
+        # Anthropic reports cache reads/writes separately from input_tokens
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+
+        return self._log_usage(
+            input_tokens=(usage.input_tokens or 0) + cache_read + cache_write,
+            cached_input_tokens=cache_read,
+            output_tokens=usage.output_tokens or 0
+        )
+
+    def _log_usage(self, input_tokens: int, cached_input_tokens: int, output_tokens: int) -> Dict:
+        """Log token usage for one completion and return it as a dict"""
+        usage = {
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "output_tokens": output_tokens
+        }
+        logger.info(
+            "llm_usage",
+            name=self.name,
+            provider=self.provider,
+            model=self.model,
+            uncached_input_tokens=input_tokens - cached_input_tokens,
+            **usage
+        )
+        return usage
+
+    def _get_anthropic_tools(self, tools: List[Dict]) -> List[Dict]:
+        """Return the Anthropic version of a tool list, converting it only once"""
+        cached = self._anthropic_tools_cache.get(id(tools))
+        if cached and cached[0] is tools:
+            return cached[1]
+
+        converted = self._convert_tools_to_anthropic(tools)
+        # Keep a reference to the source list so its id() is never reused
+        self._anthropic_tools_cache[id(tools)] = (tools, converted)
+        return converted
+
     def _convert_tools_to_anthropic(self, tools: List[Dict]) -> List[Dict]:
         """Convert OpenAI tool format to Anthropic format"""
         anthropic_tools = []
@@ -161,4 +303,39 @@ class LLMClient:
                     "description": func["description"],
                     "input_schema": func["parameters"]
                 })
+
+        # A breakpoint on the last tool caches the whole tool block
+        # (tools are rendered before the system prompt)
+        if anthropic_tools and settings.LLM_PROMPT_CACHE_ENABLED:
+            anthropic_tools[-1] = {**anthropic_tools[-1], "cache_control": {"type": "ephemeral"}}
+
         return anthropic_tools
+
+
+# Process-wide client, created in the API lifespan (or lazily on first use)
+_llm_client = None
+
+
+def get_llm_client():
+    """
+    Return the shared LLM client, creating it on first use.
+
+    With LLM_BACKENDS configured this is an LLMRouter spreading requests
+    over several backends; otherwise a single LLMClient.
+    """
+    global _llm_client
+    if _llm_client is None:
+        if settings.LLM_BACKENDS:
+            from agents.llm_router import LLMRouter
+            _llm_client = LLMRouter.from_settings()
+        else:
+            _llm_client = LLMClient()
+    return _llm_client
+
+
+async def close_llm_client():
+    """Close the shared LLM client (called on application shutdown)"""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
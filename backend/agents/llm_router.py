@@ -0,0 +1,222 @@
+from typing import List, Dict, Optional
+from collections import deque
+import asyncio
+import time
+import structlog
+
+from agents.llm_client import LLMClient
+from config import settings
+
+logger = structlog.get_logger()
+
+
+class BackendStats:
+    """Rolling latency and error window for one LLM backend"""
+
+    def __init__(self, window_size: int):
+        self.latencies = deque(maxlen=window_size)
+        self.errors = deque(maxlen=window_size)
+        self.in_flight = 0
+        self.unhealthy_until = 0.0
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.errors.append(False)
+
+    def record_latency(self, latency: float):
+        """Latency of a call cut short (lost hedge race): a lower bound, not an outcome"""
+        self.latencies.append(latency)
+
+    def record_error(self, now: float):
+        self.errors.append(True)
+        if (
+            len(self.errors) >= settings.LLM_ROUTER_MIN_SAMPLES
+            and self.error_rate > settings.LLM_ROUTER_MAX_ERROR_RATE
+        ):
+            self.unhealthy_until = now + settings.LLM_ROUTER_COOLDOWN_SECONDS
+
+    @property
+    def error_rate(self) -> float:
+        if not self.errors:
+            return 0.0
+        return sum(self.errors) / len(self.errors)
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def expected_latency(self) -> float:
+        """
+        Median latency scaled by current load and inflated by the error
+        rate (a failed call costs a retry elsewhere). Backends never tried
+        sort first; one that has only errored is assumed as slow as the
+        timeout.
+        """
+        median = self.percentile(0.5)
+        if median is None:
+            if not self.errors:
+                return 0.0
+            median = settings.LLM_TIMEOUT_SECONDS
+        return median * (1 + self.in_flight) / max(1.0 - self.error_rate, 0.05)
+
+
+class LLMRouter:
+    """
+    Routes chat completions across several LLM backends.
+
+    Each request goes to the healthy backend with the lowest expected
+    latency. If it hasn't answered by the backend's rolling p95 (see
+    LLM_ROUTER_HEDGE_PERCENTILE) the same request is hedged to the next
+    backend and the first answer wins. Failures fall through to the
+    remaining backends, and a backend whose error rate crosses
+    LLM_ROUTER_MAX_ERROR_RATE is skipped for LLM_ROUTER_COOLDOWN_SECONDS.
+
+    Exposes the same chat_completion() interface as LLMClient.
+    """
+
+    def __init__(self, backends: List[LLMClient]):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+
+        self.backends = backends
+        self.stats = {
+            backend.name: BackendStats(settings.LLM_ROUTER_WINDOW_SIZE)
+            for backend in backends
+        }
+        # Provider/model of the preferred backend, for callers that log them
+        self.provider = backends[0].provider
+        self.model = backends[0].model
+
+        logger.info("llm_router_initialized", backends=[b.name for b in backends])
+
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        backends = [
+            LLMClient(
+                provider=config.get("provider"),
+                model=config.get("model"),
+                base_url=config.get("base_url"),
+                api_key=config.get("api_key"),
+                name=config.get("name") or f"{config.get('provider')}_{index}"
+            )
+            for index, config in enumerate(settings.LLM_BACKENDS)
+        ]
+        return cls(backends)
+
+    async def aclose(self):
+        for backend in self.backends:
+            await backend.aclose()
+
+    async def chat_completion(
+        self,
+        messages: List[Dict],
+        tools: Optional[List[Dict]] = None,
+        temperature: float = 0.7
+    ) -> Dict:
+        """Get a chat completion from the fastest healthy backend"""
+        candidates = self._rank_backends()
+        last_error = None
+
+        while candidates:
+            primary = candidates[0]
+            hedge = candidates[1] if len(candidates) > 1 and settings.LLM_ROUTER_HEDGE_ENABLED else None
+            tried = set()
+
+            try:
+                return await self._call_with_hedge(
+                    primary, hedge, messages, tools, temperature, tried
+                )
+            except Exception as e:
+                last_error = e
+                logger.warning("llm_router_fallback", backends=sorted(tried), error=str(e))
+                candidates = [b for b in candidates if b.name not in tried]
+
+        raise last_error or RuntimeError("No healthy LLM backend available")
+
+    def _rank_backends(self) -> List[LLMClient]:
+        now = time.monotonic()
+        healthy = [b for b in self.backends if self.stats[b.name].is_healthy(now)]
+        # When everything is tripped, try them all rather than failing fast
+        pool = healthy or list(self.backends)
+        return sorted(pool, key=lambda b: self.stats[b.name].expected_latency())
+
+    def _hedge_delay(self, backend: LLMClient) -> float:
+        p = self.stats[backend.name].percentile(settings.LLM_ROUTER_HEDGE_PERCENTILE)
+        if p is None:
+            # Cold start: don't let an unmeasured (maybe dead) backend cost the whole timeout
+            return settings.LLM_ROUTER_HEDGE_MIN_DELAY_SECONDS
+        return max(settings.LLM_ROUTER_HEDGE_MIN_DELAY_SECONDS, p)
+
+    async def _call_with_hedge(
+        self,
+        primary: LLMClient,
+        hedge: Optional[LLMClient],
+        messages: List[Dict],
+        tools: Optional[List[Dict]],
+        temperature: float,
+        tried: set
+    ) -> Dict:
+        """Run on primary; after its hedge delay also start hedge. First success wins."""
+        tasks = {
+            asyncio.create_task(self._timed_call(primary, messages, tools, temperature)): primary
+        }
+        tried.add(primary.name)
+
+        try:
+            if hedge is not None:
+                done, _ = await asyncio.wait(tasks.keys(), timeout=self._hedge_delay(primary))
+                if not done:
+                    logger.info("llm_router_hedge", primary=primary.name, hedge=hedge.name)
+                    tasks[asyncio.create_task(
+                        self._timed_call(hedge, messages, tools, temperature)
+                    )] = hedge
+                    tried.add(hedge.name)
+
+            last_error = None
+            pending = set(tasks.keys())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _timed_call(
+        self,
+        backend: LLMClient,
+        messages: List[Dict],
+        tools: Optional[List[Dict]],
+        temperature: float
+    ) -> Dict:
+        stats = self.stats[backend.name]
+        stats.in_flight += 1
+        started = time.monotonic()
+
+        try:
+            result = await backend.chat_completion(messages, tools, temperature)
+            latency = time.monotonic() - started
+            stats.record_success(latency)
+            logger.info("llm_router_call", backend=backend.name, latency_ms=int(latency * 1000))
+            return result
+        except asyncio.CancelledError:
+            # Lost a hedge race: not a failure, but it was at least this slow,
+            # so a backend that got slower doesn't keep its old fast median
+            stats.record_latency(time.monotonic() - started)
+            raise
+        except Exception:
+            stats.record_error(time.monotonic())
+            raise
+        finally:
+            stats.in_flight -= 1
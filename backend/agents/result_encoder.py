@@ -0,0 +1,123 @@
+from typing import Dict, Optional
+from datetime import datetime
+import json
+import structlog
+
+logger = structlog.get_logger()
+
+
+# Column legend sent once at the top of every offers table
+OFFERS_HEADER = "id|fonte|preco|duracao|escalas|bagagem|voos|score"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for BPE tokenizers).
+    Good enough to compare payload sizes without loading a tokenizer.
+    """
+    return max(1, len(text) // 4) if text else 0
+
+
+def encode_tool_result(function_name: str, result: Dict) -> str:
+    """
+    Encode a tool result for the follow-up LLM call.
+
+    Offer lists (search_flights / compare_offers) are rendered as a compact
+    pipe-separated table keeping the full offer id so the model can still
+    cite it; everything else falls back to whitespace-free JSON.
+    """
+    raw = json.dumps(result)
+
+    if isinstance(result, dict) and result.get("success") and _offers_key(result):
+        compact = _encode_offers_result(result)
+    else:
+        compact = json.dumps(result, separators=(",", ":"), ensure_ascii=False)
+
+    raw_tokens = estimate_tokens(raw)
+    compact_tokens = estimate_tokens(compact)
+    logger.info(
+        "tool_result_encoded",
+        function=function_name,
+        raw_tokens=raw_tokens,
+        compact_tokens=compact_tokens,
+        saved_tokens=raw_tokens - compact_tokens
+    )
+
+    return compact
+
+
+def _offers_key(result: Dict) -> Optional[str]:
+    for key in ("offers", "ranked_offers"):
+        if isinstance(result.get(key), list):
+            return key
+    return None
+
+
+def _encode_offers_result(result: Dict) -> str:
+    key = _offers_key(result)
+    offers = result[key]
+
+    lines = []
+    if "total_found" in result:
+        lines.append(f"ofertas={len(offers)} de {result['total_found']}")
+    else:
+        lines.append(f"ofertas={len(offers)}")
+
+    if not offers:
+        return lines[0]
+
+    lines.append(OFFERS_HEADER)
+    lines.extend(_encode_offer_row(offer) for offer in offers)
+    return "\n".join(lines)
+
+
+def _encode_offer_row(offer: Dict) -> str:
+    duration = offer.get("duration_minutes") or 0
+    score = offer.get("score")
+
+    return "|".join([
+        offer["id"],
+        offer.get("source", ""),
+        _encode_price(offer.get("price") or {}),
+        f"{duration // 60}h{duration % 60:02d}",
+        str(offer.get("stops", 0)),
+        "S" if offer.get("baggage_included") else "N",
+        " ".join(_encode_segment(seg) for seg in offer.get("segments", [])),
+        f"{score:.2f}" if score is not None else "-"
+    ])
+
+
+def _encode_price(price: Dict) -> str:
+    cash = price.get("cash")
+    if cash:
+        currency = "R$" if cash.get("currency") == "BRL" else cash.get("currency", "")
+        return f"{currency}{cash['amount']:.2f}"
+
+    miles = price.get("miles")
+    if miles:
+        return f"{miles['points']}mi {miles['program']}+R${miles['taxes']:.2f}"
+
+    return "-"
+
+
+def _encode_segment(segment: Dict) -> str:
+    """e.g. LA3261 GRU-REC 12/11 08:30-11:30"""
+    depart = _parse_datetime(segment.get("depart"))
+    arrive = _parse_datetime(segment.get("arrive"))
+
+    times = ""
+    if depart and arrive:
+        times = f" {depart:%d/%m} {depart:%H:%M}-{arrive:%H:%M}"
+
+    return f"{segment.get('carrier', '')}{segment.get('flight_number', '')} {segment.get('from', '')}-{segment.get('to', '')}{times}"
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
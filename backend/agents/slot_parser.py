@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+from datetime import date
+import re
+import unicodedata
+
+
+# Regex-only slot extraction used to start searches before the LLM answers.
+# It only needs to be right when it fires; anything ambiguous returns None
+# and the agent simply waits for the LLM's function call.
+
+IATA_PATTERN = re.compile(r"\b([A-Z]{3})\b")
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+NUMERIC_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+TEXT_DATE_PATTERN = re.compile(r"\b(\d{1,2})\s+de\s+([a-z]+)(?:\s+de\s+(\d{4}))?\b")
+
+MONTHS = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4,
+    "maio": 5, "junho": 6, "julho": 7, "agosto": 8,
+    "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+# Upper-case three-letter words that are not airports
+IATA_STOPWORDS = {"VOO", "IDA", "DIA", "USD", "BRL", "EUR"}
+
+
+def parse_search_slots(
+    message: str,
+    history: Optional[List[str]] = None,
+    today: Optional[date] = None
+) -> Optional[Dict]:
+    """
+    Extract origin, destination and departure date from a user message.
+
+    Missing slots are filled from earlier user messages (most recent first).
+    Returns None unless all three slots were found.
+    """
+    today = today or date.today()
+    slots: Dict = {}
+
+    for text in [message] + list(reversed(history or [])):
+        if "origin" not in slots:
+            route = extract_route(text)
+            if route:
+                slots["origin"], slots["destination"] = route
+        if "out_date" not in slots:
+            out_date = extract_date(text, today)
+            if out_date:
+                slots["out_date"] = out_date
+        if len(slots) == 3:
+            return slots
+
+    return None
+
+
+def new_search_slots(
+    message: str,
+    history: Optional[List[str]] = None,
+    today: Optional[date] = None
+) -> Optional[Dict]:
+    """
+    Like parse_search_slots, but only when the message adds or changes a
+    slot. A follow-up such as "obrigado" in a conversation that already
+    has a route and date returns None.
+    """
+    history = list(history or [])
+    slots = parse_search_slots(message, history, today)
+    if not slots or not history:
+        return slots
+
+    previous = parse_search_slots(history[-1], history[:-1], today)
+    return None if slots == previous else slots
+
+
+def extract_route(text: str) -> Optional[tuple]:
+    """Return the first two distinct IATA-looking codes in the text"""
+    codes = []
+    for code in IATA_PATTERN.findall(text):
+        if code in IATA_STOPWORDS or code in codes:
+            continue
+        codes.append(code)
+        if len(codes) == 2:
+            return codes[0], codes[1]
+    return None
+
+
+def extract_date(text: str, today: date) -> Optional[date]:
+    """Parse YYYY-MM-DD, DD/MM[/YYYY] or '12 de novembro [de 2026]'"""
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = NUMERIC_DATE_PATTERN.search(text)
+    if match:
+        year = match.group(3)
+        if year and len(year) == 2:
+            year = f"20{year}"
+        return _resolve_date(int(match.group(1)), int(match.group(2)), year, today)
+
+    match = TEXT_DATE_PATTERN.search(_strip_accents(text.lower()))
+    if match and match.group(2) in MONTHS:
+        return _resolve_date(int(match.group(1)), MONTHS[match.group(2)], match.group(3), today)
+
+    return None
+
+
+def _resolve_date(day: int, month: int, year: Optional[str], today: date) -> Optional[date]:
+    """Without an explicit year, pick the next occurrence of day/month"""
+    if year:
+        return _safe_date(int(year), month, day)
+
+    candidate = _safe_date(today.year, month, day)
+    if candidate and candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
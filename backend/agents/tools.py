@@ -1,16 +1,152 @@
 from sqlalchemy.orm import Session
 from typing import Dict, List
+import asyncio
 import structlog
 from datetime import date
 
+from database.db import SessionLocal
 from services.search_service import SearchService
 from services.pricing_engine import PricingEngine
 from services.booking_service import BookingService
-from schemas.flight import SearchParams, Pax, CabinClass, BookingRequest, PassengerData
+from services.airport_resolver import get_airport_resolver
+from services.knowledge_service import KnowledgeService
+from schemas.flight import SearchParams, Pax, CabinClass, BookingRequest, PassengerData, Offer
 
 logger = structlog.get_logger()
 
 
+# OpenAI-compatible tool definitions. Built once at import time and shared
+# by every request (the LLM client also caches its converted variants).
+TOOL_DEFINITIONS: List[Dict] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_flights",
+            "description": "Buscar voos disponíveis em dinheiro e milhas. Use esta função quando o usuário pedir para buscar voos ou passagens.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "origin": {
+                        "type": "string",
+                        "description": "Código IATA do aeroporto de origem (3 letras, ex: GRU)"
+                    },
+                    "destination": {
+                        "type": "string",
+                        "description": "Código IATA do aeroporto de destino (3 letras, ex: REC)"
+                    },
+                    "out_date": {
+                        "type": "string",
+                        "description": "Data de ida no formato YYYY-MM-DD"
+                    },
+                    "ret_date": {
+                        "type": "string",
+                        "description": "Data de volta no formato YYYY-MM-DD (opcional, para ida e volta)"
+                    },
+                    "adults": {
+                        "type": "integer",
+                        "description": "Número de adultos (padrão: 1)"
+                    },
+                    "cabin": {
+                        "type": "string",
+                        "enum": ["ECONOMY", "PREMIUM_ECONOMY", "BUSINESS", "FIRST"],
+                        "description": "Classe da cabine (padrão: ECONOMY)"
+                    },
+                    "bag_included": {
+                        "type": "boolean",
+                        "description": "Filtrar apenas opções com bagagem incluída (padrão: true)"
+                    },
+                    "direct_only": {
+                        "type": "boolean",
+                        "description": "Buscar apenas voos diretos (padrão: false)"
+                    }
+                },
+                "required": ["origin", "destination", "out_date"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "hold_booking",
+            "description": "Criar reserva ou gerar link para finalizar compra. Use quando o usuário quiser reservar ou comprar um voo específico.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "offer_id": {
+                        "type": "string",
+                        "description": "ID da oferta selecionada"
+                    },
+                    "passenger_first_name": {
+                        "type": "string",
+                        "description": "Primeiro nome do passageiro principal"
+                    },
+                    "passenger_last_name": {
+                        "type": "string",
+                        "description": "Sobrenome do passageiro principal"
+                    },
+                    "contact_email": {
+                        "type": "string",
+                        "description": "E-mail de contato"
+                    },
+                    "contact_phone": {
+                        "type": "string",
+                        "description": "Telefone de contato"
+                    }
+                },
+                "required": ["offer_id", "contact_email"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "compare_offers",
+            "description": "Comparar ofertas específicas com preferências customizadas do usuário.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "offer_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Lista de IDs de ofertas para comparar"
+                    },
+                    "prefer_miles": {
+                        "type": "boolean",
+                        "description": "Preferir ofertas em milhas"
+                    },
+                    "prefer_direct": {
+                        "type": "boolean",
+                        "description": "Preferir voos diretos"
+                    }
+                },
+                "required": ["offer_ids"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_policies",
+            "description": "Consultar a base de conhecimento sobre políticas de bagagem, remarcação, cancelamento e programas de milhas. Use antes de responder dúvidas sobre regras.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Pergunta ou tema (ex: 'franquia de bagagem LATAM')"
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "Número de trechos a retornar (padrão: 3)"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
+
 class TravelTools:
     """
     Tools/functions exposed to the LLM for function calling.
@@ -22,143 +158,22 @@ class TravelTools:
         self.trace_id = trace_id
         self.search_service = SearchService(db)
         self.pricing_engine = PricingEngine()
-        self.booking_service = BookingService(db)
+        self.booking_service = BookingService(db, search_service=self.search_service)
+        self.knowledge_service = KnowledgeService()
 
     def get_tool_definitions(self) -> List[Dict]:
         """Return OpenAI-compatible tool definitions"""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_flights",
-                    "description": "Buscar voos disponíveis em dinheiro e milhas. Use esta função quando o usuário pedir para buscar voos ou passagens.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "origin": {
-                                "type": "string",
-                                "description": "Código IATA do aeroporto de origem (3 letras, ex: GRU)"
-                            },
-                            "destination": {
-                                "type": "string",
-                                "description": "Código IATA do aeroporto de destino (3 letras, ex: REC)"
-                            },
-                            "out_date": {
-                                "type": "string",
-                                "description": "Data de ida no formato YYYY-MM-DD"
-                            },
-                            "ret_date": {
-                                "type": "string",
-                                "description": "Data de volta no formato YYYY-MM-DD (opcional, para ida e volta)"
-                            },
-                            "adults": {
-                                "type": "integer",
-                                "description": "Número de adultos (padrão: 1)"
-                            },
-                            "cabin": {
-                                "type": "string",
-                                "enum": ["ECONOMY", "PREMIUM_ECONOMY", "BUSINESS", "FIRST"],
-                                "description": "Classe da cabine (padrão: ECONOMY)"
-                            },
-                            "bag_included": {
-                                "type": "boolean",
-                                "description": "Filtrar apenas opções com bagagem incluída (padrão: true)"
-                            },
-                            "direct_only": {
-                                "type": "boolean",
-                                "description": "Buscar apenas voos diretos (padrão: false)"
-                            }
-                        },
-                        "required": ["origin", "destination", "out_date"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "hold_booking",
-                    "description": "Criar reserva ou gerar link para finalizar compra. Use quando o usuário quiser reservar ou comprar um voo específico.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "offer_id": {
-                                "type": "string",
-                                "description": "ID da oferta selecionada"
-                            },
-                            "passenger_first_name": {
-                                "type": "string",
-                                "description": "Primeiro nome do passageiro principal"
-                            },
-                            "passenger_last_name": {
-                                "type": "string",
-                                "description": "Sobrenome do passageiro principal"
-                            },
-                            "contact_email": {
-                                "type": "string",
-                                "description": "E-mail de contato"
-                            },
-                            "contact_phone": {
-                                "type": "string",
-                                "description": "Telefone de contato"
-                            }
-                        },
-                        "required": ["offer_id", "contact_email"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "compare_offers",
-                    "description": "Comparar ofertas específicas com preferências customizadas do usuário.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "offer_ids": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "Lista de IDs de ofertas para comparar"
-                            },
-                            "prefer_miles": {
-                                "type": "boolean",
-                                "description": "Preferir ofertas em milhas"
-                            },
-                            "prefer_direct": {
-                                "type": "boolean",
-                                "description": "Preferir voos diretos"
-                            }
-                        },
-                        "required": ["offer_ids"]
-                    }
-                }
-            }
-        ]
+        return TOOL_DEFINITIONS
 
     async def search_flights(self, params: Dict) -> Dict:
         """Execute flight search"""
         try:
             # Parse parameters
-            search_params = SearchParams(
-                origin=params["origin"].upper(),
-                destination=params["destination"].upper(),
-                out_date=date.fromisoformat(params["out_date"]),
-                ret_date=date.fromisoformat(params["ret_date"]) if params.get("ret_date") else None,
-                pax=Pax(adults=params.get("adults", 1)),
-                cabin=CabinClass(params.get("cabin", "ECONOMY")),
-                bag_included=params.get("bag_included", True),
-                direct_only=params.get("direct_only", False)
-            )
+            search_params = self._build_search_params(params)
 
             logger.info("tool_search_flights", params=params, trace_id=self.trace_id)
 
-            # Search cash offers
-            cash_offers = await self.search_service.search_cash_offers(search_params, self.trace_id)
-
-            # Search miles offers
-            miles_offers = await self.search_service.search_miles_offers(search_params, self.trace_id)
-
-            # Combine and rank
-            all_offers = cash_offers + miles_offers
+            all_offers = await self._get_offers(search_params)
             ranked = self.pricing_engine.rank_offers(all_offers, search_params)
 
             # Return top 5
@@ -177,6 +192,74 @@ class TravelTools:
                 "error": str(e)
             }
 
+    def start_speculative_search(self, params: Dict) -> bool:
+        """
+        Start a search in the background before the LLM asks for it.
+
+        Runs with its own DB session so it can outlive the request: if the
+        LLM never calls search_flights the results still land in the cache
+        for the next turn. Returns True if a new search was started.
+        """
+        try:
+            search_params = self._build_search_params(params)
+        except Exception as e:
+            logger.info("speculative_search_skipped", reason=str(e), trace_id=self.trace_id)
+            return False
+
+        key = _speculative_key(search_params)
+        if key in _speculative_searches:
+            return False
+
+        task = asyncio.create_task(_run_speculative_search(search_params, self.trace_id))
+        _speculative_searches[key] = task
+        task.add_done_callback(lambda _: _speculative_searches.pop(key, None))
+
+        logger.info(
+            "speculative_search_started",
+            origin=search_params.origin,
+            destination=search_params.destination,
+            out_date=str(search_params.out_date),
+            trace_id=self.trace_id
+        )
+        return True
+
+    def _build_search_params(self, params: Dict) -> SearchParams:
+        return SearchParams(
+            origin=self._resolve_location(params["origin"]),
+            destination=self._resolve_location(params["destination"]),
+            out_date=_as_date(params["out_date"]),
+            ret_date=_as_date(params["ret_date"]) if params.get("ret_date") else None,
+            pax=Pax(adults=params.get("adults", 1)),
+            cabin=CabinClass(params.get("cabin", "ECONOMY")),
+            bag_included=params.get("bag_included", True),
+            direct_only=params.get("direct_only", False)
+        )
+
+    def _resolve_location(self, value: str) -> str:
+        """Map city names/nicknames ("Recife", "Sampa") to an airport or metro code"""
+        try:
+            code = get_airport_resolver().resolve(value)
+        except Exception as e:
+            logger.warning("airport_resolve_error", error=str(e), trace_id=self.trace_id)
+            code = None
+        return code or value.upper()
+
+    async def _get_offers(self, search_params: SearchParams) -> List[Offer]:
+        """Get offers from an in-flight speculative search, the cache, or live"""
+        task = _speculative_searches.get(_speculative_key(search_params))
+        if task:
+            try:
+                offers = await asyncio.shield(task)
+                logger.info("speculative_search_hit", count=len(offers), trace_id=self.trace_id)
+                # Speculative searches don't count as demand; this one was asked for
+                self.search_service.record_demand_for(search_params)
+                return offers
+            except Exception as e:
+                logger.warning("speculative_search_failed", error=str(e), trace_id=self.trace_id)
+
+        result = await self.search_service.search_offers(search_params, self.trace_id)
+        return result["offers"]
+
     async def hold_booking(self, params: Dict) -> Dict:
         """Create booking or generate deeplink"""
         try:
@@ -254,6 +337,33 @@ class TravelTools:
                 "error": str(e)
             }
 
+    async def search_policies(self, params: Dict) -> Dict:
+        """Retrieve policy snippets from the in-process knowledge index"""
+        try:
+            top_k = min(int(params.get("top_k", 3)), 5)
+            snippets = self.knowledge_service.search(params["query"], top_k=top_k)
+
+            logger.info("tool_search_policies", results=len(snippets), trace_id=self.trace_id)
+
+            return {
+                "success": True,
+                "snippets": [
+                    {
+                        "content": snippet["content"],
+                        "source": snippet["metadata"].get("source"),
+                        "score": snippet["score"]
+                    }
+                    for snippet in snippets
+                ]
+            }
+
+        except Exception as e:
+            logger.error("tool_policies_error", error=str(e), trace_id=self.trace_id)
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
     async def add_ancillaries(self, params: Dict) -> Dict:
         """Add seats/baggage (stub)"""
         return {
@@ -295,3 +405,30 @@ class TravelTools:
             "score": offer.score,
             "explanation": offer.score_explanation
         }
+
+
+# In-flight speculative searches, keyed by the parameters that define the result
+_speculative_searches: Dict[tuple, asyncio.Task] = {}
+
+
+def _speculative_key(params: SearchParams) -> tuple:
+    return (
+        params.origin, params.destination, params.out_date, params.ret_date,
+        params.pax.adults, params.pax.children, params.pax.infants, params.cabin
+    )
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+async def _run_speculative_search(params: SearchParams, trace_id: str) -> List[Offer]:
+    db = SessionLocal()
+    try:
+        result = await SearchService(db).search_offers(params, trace_id, record_demand=False)
+        return result["offers"]
+    except Exception as e:
+        logger.warning("speculative_search_error", error=str(e), trace_id=trace_id)
+        raise
+    finally:
+        db.close()
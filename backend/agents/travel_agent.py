@@ -1,20 +1,61 @@
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import structlog
 import json
 import uuid
 
 from schemas.chat import ChatMessage, ChatResponse
 from schemas.flight import SearchParams, Pax, CabinClass
-from services.search_service import SearchService
-from services.pricing_engine import PricingEngine
-from services.booking_service import BookingService
-from agents.llm_client import LLMClient
+from agents.llm_client import get_llm_client
 from agents.tools import TravelTools
+from agents.result_encoder import encode_tool_result
+from agents.slot_parser import parse_search_slots, new_search_slots
+from agents.admission import admission_controller, Overloaded
+from config import settings
 
 logger = structlog.get_logger()
 
 
+# Static system prompt, identical on every turn
+SYSTEM_PROMPT = """Você é um agente de viagens sênior especializado em encontrar as melhores ofertas de voos.
+
+Você fala português do Brasil de forma natural, profissional e amigável.
+
+SUAS CAPACIDADES:
+- Buscar voos em dinheiro e em milhas (Smiles, LATAM Pass, TudoAzul)
+- Comparar preços e recomendar melhores opções
+- Ajudar com reservas e emissão de bilhetes
+- Explicar políticas de bagagem, remarcação e cancelamento
+
+INSTRUÇÕES:
+1. Sempre peça confirmação de: origem, destino, datas (ida e opcional volta), número de passageiros
+2. Se faltar alguma informação, pergunte de forma natural
+3. Ao buscar voos, consulte SEMPRE dinheiro E milhas
+4. Apresente no máximo 5 opções, ordenadas por melhor custo-benefício
+5. Explique claramente: preço/milhas + taxas, duração, escalas, bagagem
+6. Para emissão, tente criar booking; se não for possível, gere deeplink e explique o passo-a-passo
+7. Seja transparente sobre limitações (ex: "não tenho disponibilidade em tempo real")
+8. NUNCA invente disponibilidade ou preços
+9. Origem e destino podem ser nomes de cidades (ex: "Recife", "Sampa", "Rio"); não pergunte o código IATA ao usuário
+
+FORMATO DE RESPOSTA:
+- Use listas e bullet points para clareza
+- Destaque as melhores ofertas
+- Seja conciso mas informativo
+
+FERRAMENTAS DISPONÍVEIS:
+- search_flights: Buscar voos em dinheiro e milhas
+- compare_offers: Comparar ofertas específicas
+- hold_booking: Criar reserva ou deeplink
+- search_policies: Consultar políticas de bagagem, remarcação e cancelamento
+- add_ancillaries: Adicionar assentos/bagagem
+
+Use as ferramentas quando apropriado. Se o usuário pedir para buscar voos, chame search_flights.
+Se pedir para reservar, chame hold_booking.
+Para dúvidas sobre regras e políticas, chame search_policies e responda com base nos trechos retornados.
+"""
+
+
 class TravelAgent:
     """
     Conversational travel agent using LLM with function calling.
@@ -29,11 +70,12 @@ class TravelAgent:
     def __init__(self, db: Session, trace_id: str):
         self.db = db
         self.trace_id = trace_id
-        self.llm_client = LLMClient()
+        self.llm_client = get_llm_client()
         self.tools = TravelTools(db, trace_id)
-        self.search_service = SearchService(db)
-        self.pricing_engine = PricingEngine()
-        self.booking_service = BookingService(db)
+        # Reuse the tools' services instead of building a second set per request
+        self.search_service = self.tools.search_service
+        self.pricing_engine = self.tools.pricing_engine
+        self.booking_service = self.tools.booking_service
 
         # Conversation state (in production, store in Redis or database)
         self.state = {}
@@ -66,10 +108,21 @@ class TravelAgent:
                 })
             messages.append({"role": "user", "content": message})
 
+            # If this message completes or changes the route and date, warm
+            # the search while the LLM is still deciding whether to call
+            # search_flights
+            if settings.SPECULATIVE_SEARCH_ENABLED:
+                slots = new_search_slots(
+                    message,
+                    history=[msg.content for msg in history if msg.role == "user"]
+                )
+                if slots:
+                    self.tools.start_speculative_search(slots)
+
             # Get LLM response with function calling
-            llm_response = await self.llm_client.chat_completion(
+            llm_response = await self._chat_completion(
                 messages=messages,
-                tools=self.tools.get_tool_definitions() if self.llm_client.provider != "ollama" else None
+                tools=self.tools.get_tool_definitions()
             )
 
             # Check if LLM wants to call a function
@@ -88,10 +141,12 @@ class TravelAgent:
                 messages.append({
                     "role": "function",
                     "name": llm_response["function_call"]["name"],
-                    "content": json.dumps(function_result)
+                    "content": self._encode_function_result(
+                        llm_response["function_call"]["name"], function_result
+                    )
                 })
 
-                final_response = await self.llm_client.chat_completion(
+                final_response = await self._chat_completion(
                     messages=messages
                 )
 
@@ -120,6 +175,8 @@ class TravelAgent:
                 trace_id=self.trace_id
             )
 
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error("agent_error", error=str(e), trace_id=self.trace_id)
             return ChatResponse(
@@ -128,42 +185,65 @@ class TravelAgent:
                 trace_id=self.trace_id
             )
 
-    def _build_system_prompt(self) -> str:
-        """Build system prompt for the agent"""
-        return """Você é um agente de viagens sênior especializado em encontrar as melhores ofertas de voos.
+    async def degraded_response(
+        self,
+        message: str,
+        conversation_id: str,
+        history: List[ChatMessage]
+    ) -> Optional[ChatResponse]:
+        """
+        Cache-only reply used when the LLM is overloaded.
+
+        Works only when route and date can be read from the conversation
+        and the search is already cached; returns None otherwise.
+        """
+        slots = parse_search_slots(
+            message,
+            history=[msg.content for msg in history if msg.role == "user"]
+        )
+        if not slots:
+            return None
 
-Você fala português do Brasil de forma natural, profissional e amigável.
+        search_params = self.tools._build_search_params(slots)
+        result = await self.search_service.search_offers(search_params, self.trace_id, cache_only=True)
+        if not result["offers"]:
+            return None
 
-SUAS CAPACIDADES:
-- Buscar voos em dinheiro e em milhas (Smiles, LATAM Pass, TudoAzul)
-- Comparar preços e recomendar melhores opções
-- Ajudar com reservas e emissão de bilhetes
-- Explicar políticas de bagagem, remarcação e cancelamento
+        ranked = self.pricing_engine.rank_offers(result["offers"], search_params)[:5]
+        offers = [self.tools._serialize_offer(offer) for offer in ranked]
 
-INSTRUÇÕES:
-1. Sempre peça confirmação de: origem, destino, datas (ida e opcional volta), número de passageiros
-2. Se faltar alguma informação, pergunte de forma natural
-3. Ao buscar voos, consulte SEMPRE dinheiro E milhas
-4. Apresente no máximo 5 opções, ordenadas por melhor custo-benefício
-5. Explique claramente: preço/milhas + taxas, duração, escalas, bagagem
-6. Para emissão, tente criar booking; se não for possível, gere deeplink e explique o passo-a-passo
-7. Seja transparente sobre limitações (ex: "não tenho disponibilidade em tempo real")
-8. NUNCA invente disponibilidade ou preços
+        lines = [
+            f"Estamos com alta demanda no momento. Enquanto isso, estas são as melhores ofertas "
+            f"recentes para {search_params.origin} → {search_params.destination} "
+            f"em {search_params.out_date.strftime('%d/%m/%Y')}:"
+        ]
+        lines.extend(f"- {offer.score_explanation}" for offer in ranked)
+        lines.append("Os preços vêm do nosso cache e podem ter mudado. Tente novamente em instantes para uma busca atualizada.")
 
-FORMATO DE RESPOSTA:
-- Use listas e bullet points para clareza
-- Destaque as melhores ofertas
-- Seja conciso mas informativo
+        logger.info("chat_degraded_reply", conversation_id=conversation_id, offers=len(offers), trace_id=self.trace_id)
 
-FERRAMENTAS DISPONÍVEIS:
-- search_flights: Buscar voos em dinheiro e milhas
-- compare_offers: Comparar ofertas específicas
-- hold_booking: Criar reserva ou deeplink
-- add_ancillaries: Adicionar assentos/bagagem
+        return ChatResponse(
+            message="\n".join(lines),
+            conversation_id=conversation_id,
+            offers=offers,
+            suggested_actions=self._suggest_actions("", offers),
+            trace_id=self.trace_id
+        )
 
-Use as ferramentas quando apropriado. Se o usuário pedir para buscar voos, chame search_flights.
-Se pedir para reservar, chame hold_booking.
-"""
+    async def _chat_completion(self, **kwargs) -> dict:
+        """LLM call gated by the per-process admission controller"""
+        async with admission_controller.llm_slot():
+            return await self.llm_client.chat_completion(**kwargs)
+
+    def _build_system_prompt(self) -> str:
+        """Build system prompt for the agent"""
+        return SYSTEM_PROMPT
+
+    def _encode_function_result(self, function_name: str, function_result) -> str:
+        """Serialize a tool result for the follow-up LLM call"""
+        if settings.LLM_COMPACT_TOOL_RESULTS and isinstance(function_result, dict):
+            return encode_tool_result(function_name, function_result)
+        return json.dumps(function_result)
 
     async def _execute_function(self, function_call: dict):
         """Execute tool/function called by LLM"""
@@ -182,6 +262,8 @@ Se pedir para reservar, chame hold_booking.
             return await self.tools.compare_offers(arguments)
         elif function_name == "hold_booking":
             return await self.tools.hold_booking(arguments)
+        elif function_name == "search_policies":
+            return await self.tools.search_policies(arguments)
         elif function_name == "add_ancillaries":
             return await self.tools.add_ancillaries(arguments)
         else:
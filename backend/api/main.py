@@ -5,8 +5,14 @@ from contextlib import asynccontextmanager
 import structlog
 import uuid
 
-from database.db import engine, Base
-from api.routes import search, chat, booking
+from database.db import engine, Base, SessionLocal
+from api.routes import search, chat, booking, airports
+from agents.llm_client import get_llm_client, close_llm_client
+from services.airport_resolver import load_airport_resolver
+from services.knowledge_service import KnowledgeService, rebuild_knowledge_index
+from services.price_alerts import PriceAlertMatcher
+from providers.amadeus_provider import AmadeusProvider
+from providers.transport import close_provider_transports
 
 logger = structlog.get_logger()
 
@@ -17,8 +23,41 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Travel Agent API")
     # Create tables if they don't exist (in production use Alembic migrations)
     # Base.metadata.create_all(bind=engine)
+
+    # Warm the shared LLM client so the first chat turn doesn't pay for it
+    get_llm_client()
+
+    # Build the in-memory airport/city index used by the agent and autocomplete
+    db = SessionLocal()
+    try:
+        load_airport_resolver(db)
+    except Exception as e:
+        logger.warning("airport_resolver_load_error", error=str(e))
+
+    # Policy retrieval index: open the published one, or build it once
+    try:
+        if KnowledgeService._get_index() is None:
+            rebuild_knowledge_index(db)
+    except Exception as e:
+        logger.warning("knowledge_index_build_error", error=str(e))
+    finally:
+        db.close()
+
+    # Price-alert index builds in the background; start it before the first search
+    PriceAlertMatcher.warm()
+
+    # Fetch the Amadeus OAuth token up front so no search waits for it
+    amadeus = AmadeusProvider()
+    if amadeus.is_available():
+        try:
+            await amadeus.warm()
+        except Exception as e:
+            logger.warning("amadeus_token_warm_error", error=str(e))
+
     yield
     logger.info("Shutting down Travel Agent API")
+    await close_llm_client()
+    await close_provider_transports()
 
 
 app = FastAPI(
@@ -52,6 +91,7 @@ async def add_trace_id(request, call_next):
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
 app.include_router(booking.router, prefix="/api/v1", tags=["booking"])
+app.include_router(airports.router, prefix="/api/v1", tags=["airports"])
 
 
 @app.get("/")
@@ -68,6 +108,18 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/queues")
+async def queue_health():
+    """Backlog depth per Celery queue"""
+    from workers.celery_app import queue_depths
+
+    try:
+        return {"queues": queue_depths()}
+    except Exception as e:
+        logger.warning("queue_depth_error", error=str(e))
+        return JSONResponse(status_code=503, content={"detail": "Broker unavailable"})
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(
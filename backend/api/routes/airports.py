@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+import structlog
+
+from services.airport_resolver import get_airport_resolver
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+
+@router.get("/airports/suggest")
+async def suggest_airports(
+    request: Request,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=8, ge=1, le=20)
+):
+    """
+    Autocomplete airports and cities.
+
+    Accent-insensitive and typo-tolerant: "sao", "Recfe" and "sampa" all
+    return suggestions. Metro areas (e.g. SAO = GRU, CGH, VCP) are listed
+    before their individual airports.
+    """
+    trace_id = request.state.trace_id
+
+    try:
+        suggestions = get_airport_resolver().suggest(q, limit=limit)
+        return {"query": q, "suggestions": suggestions}
+
+    except Exception as e:
+        logger.error("airport_suggest_error", error=str(e), trace_id=trace_id)
+        raise HTTPException(status_code=500, detail=f"Airport suggestion failed: {str(e)}")
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 import structlog
 import uuid
 
-from database.db import get_db
+from database.db import get_db, SessionLocal
 from schemas.chat import ChatRequest, ChatResponse
 from agents.travel_agent import TravelAgent
+from agents.admission import admission_controller, conversation_gate, Overloaded
+from config import settings
 
 router = APIRouter()
 logger = structlog.get_logger()
@@ -28,6 +31,11 @@ async def chat(
     - "Mostre opções em milhas também"
     - "Qual a mais barata?"
     - "Reservar a opção 2"
+
+    Turns of the same conversation_id run one at a time and identical
+    in-flight messages are answered once. When the LLM queue is full the
+    endpoint returns 429 with Retry-After, or a cache-only reply if the
+    requested route is already cached.
     """
     trace_id = chat_req.trace_id or request.state.trace_id
     conversation_id = chat_req.conversation_id or str(uuid.uuid4())
@@ -40,15 +48,29 @@ async def chat(
     )
 
     try:
-        # Initialize travel agent
-        agent = TravelAgent(db=db, trace_id=trace_id)
+        # Shed load before spending anything on this turn
+        admission_controller.check()
 
-        # Process message
-        response = await agent.process_message(
-            message=chat_req.message,
-            conversation_id=conversation_id,
-            history=chat_req.history
-        )
+        async def turn():
+            # A coalesced turn is shared by duplicate requests and may
+            # outlive this one, so it owns its session instead of borrowing
+            # the request's
+            turn_db = SessionLocal()
+            try:
+                agent = TravelAgent(db=turn_db, trace_id=trace_id)
+                return await agent.process_message(
+                    message=chat_req.message,
+                    conversation_id=conversation_id,
+                    history=chat_req.history
+                )
+            finally:
+                turn_db.close()
+
+        # Serialize turns of the same conversation and coalesce duplicates
+        if chat_req.conversation_id:
+            response = await conversation_gate.run(conversation_id, chat_req.message, turn)
+        else:
+            response = await turn()
 
         logger.info(
             "chat_response",
@@ -60,11 +82,40 @@ async def chat(
 
         return response
 
+    except Overloaded as e:
+        return await _overloaded_response(db, chat_req, conversation_id, e, trace_id)
     except Exception as e:
         logger.error("chat_error", error=str(e), trace_id=trace_id)
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 
+async def _overloaded_response(
+    db: Session,
+    chat_req: ChatRequest,
+    conversation_id: str,
+    error: Overloaded,
+    trace_id: str
+):
+    """Cache-only degraded reply when possible, otherwise 429 + Retry-After"""
+    if settings.CHAT_DEGRADED_CACHE_REPLY:
+        try:
+            agent = TravelAgent(db=db, trace_id=trace_id)
+            degraded = await agent.degraded_response(
+                chat_req.message, conversation_id, chat_req.history
+            )
+            if degraded:
+                return degraded
+        except Exception as e:
+            logger.warning("chat_degraded_error", error=str(e), trace_id=trace_id)
+
+    logger.warning("chat_rejected_overloaded", conversation_id=conversation_id, trace_id=trace_id)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please retry shortly", "trace_id": trace_id},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 @router.get("/chat/conversations/{conversation_id}")
 async def get_conversation_history(
     conversation_id: str,
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import structlog
 
 from database.db import get_db, get_redis
-from schemas.flight import SearchParams, RankedOffersResponse, CompareRequest
+from schemas.flight import SearchParams, RankedOffersResponse, CompareRequest, CalendarResponse, CalendarDay, CabinClass, Pax
 from services.search_service import SearchService
 from services.pricing_engine import PricingEngine
 
@@ -23,14 +23,19 @@ async def search_flights(
     Search for flights in both cash and miles.
     Returns ranked offers based on effective cost.
 
-    - **origin**: IATA code (3 letters)
-    - **destination**: IATA code (3 letters)
+    - **origin**: IATA airport or metro code (3 letters, e.g. GRU or SAO)
+    - **destination**: IATA airport or metro code (3 letters, e.g. REC or RIO)
     - **out_date**: Departure date (YYYY-MM-DD)
     - **ret_date**: Return date (optional, for round-trip)
     - **pax**: Passenger counts
     - **cabin**: Cabin class
     - **bag_included**: Filter for baggage included
     - **force_live**: Skip cache and search in real-time
+
+    Metro codes are expanded into every airport pair; each pair is cached
+    separately and only the missing pairs are searched live. Providers
+    whose circuit breaker is open are skipped and listed in
+    assumptions.skipped_providers.
     """
     trace_id = request.state.trace_id
     logger.info(
@@ -46,53 +51,93 @@ async def search_flights(
         search_service = SearchService(db)
         pricing_engine = PricingEngine()
 
-        # Check cache first unless force_live is True
-        if not force_live:
-            cached_offers = await search_service.get_cached_offers(params)
-            if cached_offers:
-                logger.info("cache_hit", trace_id=trace_id, offers_count=len(cached_offers))
-                ranked = pricing_engine.rank_offers(cached_offers, params)
-                return RankedOffersResponse(
-                    ranked=ranked[:5],
-                    cached=True,
-                    cache_age_minutes=search_service.get_cache_age_minutes(params)
-                )
-
-        # Execute live search
-        logger.info("executing_live_search", trace_id=trace_id)
-
-        # Search cash offers
-        cash_offers = await search_service.search_cash_offers(params, trace_id)
-        logger.info("cash_search_complete", count=len(cash_offers), trace_id=trace_id)
-
-        # Search miles offers
-        miles_offers = await search_service.search_miles_offers(params, trace_id)
-        logger.info("miles_search_complete", count=len(miles_offers), trace_id=trace_id)
-
-        # Combine and rank
-        all_offers = cash_offers + miles_offers
+        result = await search_service.search_offers(params, trace_id, force_live=force_live)
+        all_offers = result["offers"]
+
         if not all_offers:
             raise HTTPException(status_code=404, detail="No offers found for the specified criteria")
 
         ranked = pricing_engine.rank_offers(all_offers, params)
 
-        # Cache results
-        await search_service.cache_offers(params, all_offers)
+        if result["cached_pairs"] == result["pairs"]:
+            logger.info("cache_hit", trace_id=trace_id, offers_count=len(all_offers))
+            return RankedOffersResponse(
+                ranked=ranked[:5],
+                cached=True,
+                cache_age_minutes=search_service.get_max_cache_age_minutes(params)
+            )
 
         return RankedOffersResponse(
             ranked=ranked[:5],
             cached=False,
             assumptions={
                 "r_per_mile": pricing_engine.r_per_mile,
-                "max_stops": pricing_engine.max_stops
+                "max_stops": pricing_engine.max_stops,
+                # Providers left out because their circuit breaker is open
+                "skipped_providers": result["skipped_providers"]
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("search_error", error=str(e), trace_id=trace_id)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@router.get("/search/calendar", response_model=CalendarResponse)
+async def search_calendar(
+    request: Request,
+    origin: str = Query(min_length=3, max_length=3, pattern="^[A-Z]{3}$"),
+    destination: str = Query(min_length=3, max_length=3, pattern="^[A-Z]{3}$"),
+    month: str = Query(pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+    adults: int = Query(default=1, ge=1, le=9),
+    cabin: CabinClass = CabinClass.ECONOMY,
+    db: Session = Depends(get_db)
+):
+    """
+    Award calendar: cheapest one-way miles price per day of a month.
+
+    Each loyalty program is fetched once for the whole month; the per-day
+    results are cached and reused by exact-date searches.
+    """
+    trace_id = request.state.trace_id
+    logger.info("calendar_request", origin=origin, destination=destination, month=month, trace_id=trace_id)
+
+    try:
+        month_start = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="month must be YYYY-MM")
+
+    try:
+        search_service = SearchService(db)
+        by_day = await search_service.search_month(
+            origin, destination, month_start, trace_id, pax=Pax(adults=adults), cabin=cabin
+        )
+
+        days = []
+        for day, offers in sorted(by_day.items()):
+            points_by_program = {}
+            for offer in offers:
+                if offer.miles:
+                    program = offer.miles.program.value
+                    points_by_program[program] = min(points_by_program.get(program, offer.miles.points), offer.miles.points)
+
+            cheapest = min(points_by_program, key=points_by_program.get) if points_by_program else None
+            days.append(CalendarDay(
+                day=day,
+                min_points=points_by_program[cheapest] if cheapest else None,
+                min_points_program=cheapest,
+                points_by_program=points_by_program
+            ))
+
+        return CalendarResponse(origin=origin, destination=destination, month=month, days=days)
+
+    except Exception as e:
+        logger.error("calendar_error", error=str(e), trace_id=trace_id)
+        raise HTTPException(status_code=500, detail=f"Calendar search failed: {str(e)}")
+
+
 @router.post("/compare", response_model=RankedOffersResponse)
 async def compare_offers(
     compare_req: CompareRequest,
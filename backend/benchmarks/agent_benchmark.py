@@ -0,0 +1,198 @@
+"""
+Chat-path latency benchmark against a local stub LLM.
+
+Starts an OpenAI-compatible stub server (benchmarks/stub_llm_server.py),
+points the agent at it, and drives either TravelAgent.process_message
+directly or POST /api/v1/chat (in-process ASGI, or a running server via
+--api-url) at each concurrency level. Reports per-turn time to first
+token, total latency, LLM round trips and prompt tokens.
+
+Search still goes through SearchService, so Postgres and Redis from
+docker-compose should be running for realistic numbers.
+
+Usage (from backend/):
+    python -m benchmarks.agent_benchmark --mode agent --concurrency 1,4,16 --turns 50
+    python -m benchmarks.agent_benchmark --mode api --first-token-ms 500 --json out.json
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+from config import settings
+from benchmarks.stub_llm_server import StubConfig, StubLLMServer
+
+DEFAULT_ROUTES = [("GRU", "REC"), ("GRU", "SSA"), ("CGH", "FOR"), ("BSB", "POA")]
+
+
+def build_message(turn: int, template: Optional[str]) -> str:
+    """Vary route and date per turn so caches don't hide the search cost"""
+    origin, destination = DEFAULT_ROUTES[turn % len(DEFAULT_ROUTES)]
+    out_date = date.today() + timedelta(days=30 + turn % 60)
+    if template:
+        return template.format(origin=origin, destination=destination, out_date=out_date.isoformat())
+    return f"Quero voar de {origin} para {destination} no dia {out_date.isoformat()}"
+
+
+async def run_agent_turn(message: str) -> None:
+    from database.db import SessionLocal
+    from agents.travel_agent import TravelAgent
+
+    db = SessionLocal()
+    try:
+        agent = TravelAgent(db=db, trace_id=f"bench-{uuid.uuid4().hex[:8]}")
+        await agent.process_message(message, conversation_id=str(uuid.uuid4()), history=[])
+    finally:
+        db.close()
+
+
+async def run_api_turn(client: httpx.AsyncClient, message: str) -> None:
+    response = await client.post("/api/v1/chat", json={"message": message})
+    response.raise_for_status()
+
+
+async def run_level(
+    server: StubLLMServer,
+    mode: str,
+    concurrency: int,
+    turns: int,
+    template: Optional[str],
+    client: Optional[httpx.AsyncClient]
+) -> List[Dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one_turn(turn: int):
+        marker = uuid.uuid4().hex[:8]
+        message = f"{build_message(turn, template)} [bench:{marker}]"
+
+        async with semaphore:
+            started = time.perf_counter()
+            error = None
+            try:
+                if mode == "agent":
+                    await run_agent_turn(message)
+                else:
+                    await run_api_turn(client, message)
+            except Exception as e:
+                error = str(e)
+            finished = time.perf_counter()
+
+        records = server.state.records_for(marker)
+        results.append({
+            "total_ms": (finished - started) * 1000,
+            # The user sees the first token when the last LLM call of the turn starts answering
+            "ttft_ms": (records[-1].first_token_at - started) * 1000 if records else None,
+            "round_trips": len(records),
+            "prompt_tokens": sum(r.prompt_tokens for r in records),
+            "error": error
+        })
+
+    await asyncio.gather(*(one_turn(turn) for turn in range(turns)))
+    return results
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(concurrency: int, results: List[Dict]) -> Dict:
+    ok = [r for r in results if not r["error"]]
+    totals = [r["total_ms"] for r in ok]
+    ttfts = [r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]
+
+    return {
+        "concurrency": concurrency,
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "ttft_p50_ms": percentile(ttfts, 0.50),
+        "ttft_p95_ms": percentile(ttfts, 0.95),
+        "total_p50_ms": percentile(totals, 0.50),
+        "total_p95_ms": percentile(totals, 0.95),
+        "total_p99_ms": percentile(totals, 0.99),
+        "round_trips_per_turn": statistics.mean(r["round_trips"] for r in ok) if ok else None,
+        "prompt_tokens_per_turn": statistics.mean(r["prompt_tokens"] for r in ok) if ok else None,
+    }
+
+
+def print_report(summaries: List[Dict]):
+    columns = [
+        "concurrency", "turns", "errors", "ttft_p50_ms", "ttft_p95_ms",
+        "total_p50_ms", "total_p95_ms", "total_p99_ms",
+        "round_trips_per_turn", "prompt_tokens_per_turn"
+    ]
+    print(" | ".join(columns))
+    for summary in summaries:
+        print(" | ".join(
+            f"{summary[c]:.1f}" if isinstance(summary[c], float) else str(summary[c])
+            for c in columns
+        ))
+
+
+async def main(args: argparse.Namespace):
+    config = StubConfig(
+        first_token_delay_ms=args.first_token_ms,
+        token_delay_ms=args.token_ms,
+        response_tokens=args.response_tokens,
+        tool_calls=not args.no_tool_calls
+    )
+
+    with StubLLMServer(config, port=args.stub_port) as server:
+        # Point the shared LLM client at the stub
+        settings.LLM_PROVIDER = "openai"
+        settings.OPENAI_BASE_URL = server.base_url
+        settings.OPENAI_API_KEY = "stub"
+        settings.LLM_BACKENDS = []
+
+        client = None
+        if args.mode == "api":
+            if args.api_url:
+                client = httpx.AsyncClient(base_url=args.api_url, timeout=120)
+            else:
+                from api.main import app
+                client = httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120
+                )
+
+        summaries = []
+        try:
+            for concurrency in args.concurrency:
+                results = await run_level(server, args.mode, concurrency, args.turns, args.message, client)
+                summaries.append(summarize(concurrency, results))
+        finally:
+            if client:
+                await client.aclose()
+
+    print_report(summaries)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": args.mode, "stub": vars(config), "levels": summaries}, f, indent=2)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Travel agent chat-path benchmark")
+    parser.add_argument("--mode", choices=["agent", "api"], default="agent")
+    parser.add_argument("--api-url", help="Benchmark a running API instead of the in-process app")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 16])
+    parser.add_argument("--turns", type=int, default=40, help="Chat turns per concurrency level")
+    parser.add_argument("--message", help="Message template with {origin}, {destination}, {out_date}")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--no-tool-calls", action="store_true")
+    parser.add_argument("--stub-port", type=int, default=18080)
+    parser.add_argument("--json", help="Write the summary to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
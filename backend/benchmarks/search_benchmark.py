@@ -0,0 +1,204 @@
+"""
+Search-path load benchmark replaying a recorded provider corpus.
+
+Record a corpus on any environment with real providers
+(PROVIDER_REPLAY_MODE=record, PROVIDER_CORPUS_DIR=...), copy the directory,
+then replay it here with no network access: every provider call is served
+from the corpus with its recorded latency and errors (providers/recording.py),
+optionally scaled and with injected failures/hangs. The workload is the
+recorded searches themselves, re-dated to today, cycled.
+
+Drives SearchService.search_offers directly or POST /api/v1/search
+(in-process ASGI, or a running server via --api-url) at each concurrency
+level and reports latency percentiles, errors, offers per search and how
+often providers were skipped by their circuit breakers. Postgres and Redis
+from docker-compose should be running for realistic numbers.
+
+Usage (from backend/):
+    python -m benchmarks.search_benchmark --corpus data/provider_corpus --concurrency 1,8,32
+    python -m benchmarks.search_benchmark --failure-rate 0.2 --hang-rate 0.05 --seed 7 --json out.json
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+from config import settings
+from schemas.flight import SearchParams
+from benchmarks.agent_benchmark import percentile
+
+DEFAULT_ROUTES = [("GRU", "REC"), ("GRU", "SSA"), ("CGH", "SDU"), ("BSB", "POA")]
+
+
+def build_workload(searches: int) -> List[SearchParams]:
+    """Recorded searches in recording order, or synthetic ones for an empty corpus"""
+    from providers.recording import get_provider_corpus
+
+    queries = get_provider_corpus().queries()
+    if not queries:
+        queries = [
+            SearchParams(origin=origin, destination=destination, out_date=date.today() + timedelta(days=30 + i))
+            for i, (origin, destination) in enumerate(DEFAULT_ROUTES)
+        ]
+    return [queries[i % len(queries)] for i in range(searches)]
+
+
+async def run_service_search(params: SearchParams, force_live: bool) -> Dict:
+    from database.db import SessionLocal
+    from services.search_service import SearchService
+
+    db = SessionLocal()
+    try:
+        result = await SearchService(db).search_offers(
+            params, f"bench-{uuid.uuid4().hex[:8]}", force_live=force_live, record_demand=False
+        )
+        return {"offers": len(result["offers"]), "skipped": result["skipped_providers"]}
+    finally:
+        db.close()
+
+
+async def run_api_search(client: httpx.AsyncClient, params: SearchParams, force_live: bool) -> Dict:
+    response = await client.post(
+        "/api/v1/search",
+        params={"force_live": force_live},
+        content=params.model_dump_json(),
+        headers={"Content-Type": "application/json"}
+    )
+    if response.status_code == 404:
+        return {"offers": 0, "skipped": []}
+    response.raise_for_status()
+    body = response.json()
+    return {"offers": len(body["ranked"]), "skipped": body["assumptions"].get("skipped_providers", [])}
+
+
+async def run_level(
+    mode: str,
+    concurrency: int,
+    workload: List[SearchParams],
+    force_live: bool,
+    client: Optional[httpx.AsyncClient]
+) -> List[Dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one_search(params: SearchParams):
+        async with semaphore:
+            started = time.perf_counter()
+            outcome = {"offers": 0, "skipped": []}
+            error = None
+            try:
+                if mode == "service":
+                    outcome = await run_service_search(params, force_live)
+                else:
+                    outcome = await run_api_search(client, params, force_live)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            finished = time.perf_counter()
+
+        results.append({"total_ms": (finished - started) * 1000, **outcome, "error": error})
+
+    await asyncio.gather(*(one_search(params) for params in workload))
+    return results
+
+
+def summarize(concurrency: int, results: List[Dict]) -> Dict:
+    ok = [r for r in results if not r["error"]]
+    totals = [r["total_ms"] for r in ok]
+
+    return {
+        "concurrency": concurrency,
+        "searches": len(results),
+        "errors": len(results) - len(ok),
+        "total_p50_ms": percentile(totals, 0.50),
+        "total_p95_ms": percentile(totals, 0.95),
+        "total_p99_ms": percentile(totals, 0.99),
+        "offers_per_search": statistics.mean(r["offers"] for r in ok) if ok else None,
+        "searches_with_skipped": sum(1 for r in ok if r["skipped"]),
+    }
+
+
+def print_report(summaries: List[Dict]):
+    columns = [
+        "concurrency", "searches", "errors", "total_p50_ms", "total_p95_ms",
+        "total_p99_ms", "offers_per_search", "searches_with_skipped"
+    ]
+    print(" | ".join(columns))
+    for summary in summaries:
+        print(" | ".join(
+            f"{summary[c]:.1f}" if isinstance(summary[c], float) else str(summary[c])
+            for c in columns
+        ))
+
+
+async def main(args: argparse.Namespace):
+    settings.PROVIDER_REPLAY_MODE = "replay"
+    settings.PROVIDER_CORPUS_DIR = args.corpus
+    settings.PROVIDER_REPLAY_LATENCY_SCALE = args.latency_scale
+    settings.PROVIDER_REPLAY_FAILURE_RATE = args.failure_rate
+    settings.PROVIDER_REPLAY_HANG_RATE = args.hang_rate
+    settings.PROVIDER_REPLAY_SEED = args.seed
+    # No Celery worker needed: loyalty programs replay in-process
+    settings.MILES_SEARCH_VIA_CELERY = args.celery
+
+    workload = build_workload(args.searches)
+
+    client = None
+    if args.mode == "api":
+        if args.api_url:
+            client = httpx.AsyncClient(base_url=args.api_url, timeout=120)
+        else:
+            from api.main import app
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120
+            )
+
+    summaries = []
+    try:
+        for concurrency in args.concurrency:
+            results = await run_level(args.mode, concurrency, workload, not args.use_cache, client)
+            summaries.append(summarize(concurrency, results))
+    finally:
+        if client:
+            await client.aclose()
+
+    print_report(summaries)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "mode": args.mode,
+                "corpus": args.corpus,
+                "replay": {
+                    "latency_scale": args.latency_scale,
+                    "failure_rate": args.failure_rate,
+                    "hang_rate": args.hang_rate,
+                    "seed": args.seed
+                },
+                "levels": summaries
+            }, f, indent=2)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Search-path benchmark over a recorded provider corpus")
+    parser.add_argument("--mode", choices=["service", "api"], default="service")
+    parser.add_argument("--api-url", help="Benchmark a running API (started with PROVIDER_REPLAY_MODE=replay)")
+    parser.add_argument("--corpus", default=settings.PROVIDER_CORPUS_DIR)
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--searches", type=int, default=100, help="Searches per concurrency level")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on recorded latencies")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Extra injected provider errors")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Injected provider calls that never answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-cache", action="store_true", help="Let the pair cache answer repeated searches")
+    parser.add_argument("--celery", action="store_true", help="Dispatch miles scrapes to Celery workers (also in replay mode)")
+    parser.add_argument("--json", help="Write the summary to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
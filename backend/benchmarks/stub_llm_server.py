@@ -0,0 +1,209 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+import uvicorn
+
+from agents.result_encoder import estimate_tokens
+from agents.slot_parser import parse_search_slots
+
+# Marker the benchmark appends to user messages so stub requests can be
+# attributed to the chat turn that caused them
+BENCH_MARKER_PATTERN = re.compile(r"\[bench:([0-9a-f]+)\]")
+
+
+@dataclass
+class StubConfig:
+    """Scripted behaviour of the stub LLM"""
+    first_token_delay_ms: float = 300.0
+    token_delay_ms: float = 20.0
+    response_tokens: int = 60
+    tool_calls: bool = True
+
+
+@dataclass
+class StubRecord:
+    marker: Optional[str]
+    started: float
+    prompt_tokens: int
+    tool_call: bool
+    first_token_at: float = 0.0
+    finished: float = 0.0
+
+
+@dataclass
+class StubState:
+    config: StubConfig
+    records: List[StubRecord] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def records_for(self, marker: str) -> List[StubRecord]:
+        with self.lock:
+            return [r for r in self.records if r.marker == marker]
+
+
+def create_stub_app(state: StubState) -> FastAPI:
+    """
+    OpenAI-compatible /v1/chat/completions stub.
+
+    A user message that already contains a route and a date gets a
+    search_flights tool call (when tools are offered); everything else,
+    including the follow-up after a tool result, gets a scripted text
+    answer of response_tokens tokens. Both streaming and non-streaming
+    requests are supported.
+    """
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config = state.config
+        messages = body.get("messages", [])
+
+        record = StubRecord(
+            marker=_find_marker(messages),
+            started=time.perf_counter(),
+            prompt_tokens=estimate_tokens(json.dumps(messages) + json.dumps(body.get("tools") or [])),
+            tool_call=False
+        )
+        with state.lock:
+            state.records.append(record)
+
+        tool_call = _scripted_tool_call(messages, body.get("tools")) if config.tool_calls else None
+        record.tool_call = tool_call is not None
+        words = [f"palavra{i}" for i in range(config.response_tokens)]
+
+        await asyncio.sleep(config.first_token_delay_ms / 1000)
+        record.first_token_at = time.perf_counter()
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(body, record, words, tool_call, config),
+                media_type="text/event-stream"
+            )
+
+        if not tool_call:
+            await asyncio.sleep(config.token_delay_ms * len(words) / 1000)
+        record.finished = time.perf_counter()
+
+        message = {"role": "assistant", "content": None if tool_call else " ".join(words)}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_call else "stop"
+            }],
+            "usage": _usage(record.prompt_tokens, 0 if tool_call else len(words))
+        })
+
+    return app
+
+
+async def _stream(body: Dict, record: StubRecord, words: List[str], tool_call: Optional[Dict], config: StubConfig):
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    def chunk(delta: Dict, finish_reason: Optional[str] = None) -> str:
+        return "data: " + json.dumps({
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }) + "\n\n"
+
+    if tool_call:
+        yield chunk({"role": "assistant", "tool_calls": [{**tool_call, "index": 0}]})
+        yield chunk({}, "tool_calls")
+    else:
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(config.token_delay_ms / 1000)
+            yield chunk({"content": word + " "})
+        yield chunk({}, "stop")
+
+    record.finished = time.perf_counter()
+    yield "data: [DONE]\n\n"
+
+
+def _find_marker(messages: List[Dict]) -> Optional[str]:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            match = BENCH_MARKER_PATTERN.search(message.get("content") or "")
+            return match.group(1) if match else None
+    return None
+
+
+def _scripted_tool_call(messages: List[Dict], tools: Optional[List[Dict]]) -> Optional[Dict]:
+    """Call search_flights when offered and the last turn is a user message with route + date"""
+    if not tools or not messages or messages[-1].get("role") != "user":
+        return None
+    if not any(t.get("function", {}).get("name") == "search_flights" for t in tools):
+        return None
+
+    slots = parse_search_slots(messages[-1].get("content") or "")
+    if not slots:
+        return None
+
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {
+            "name": "search_flights",
+            "arguments": json.dumps({
+                "origin": slots["origin"],
+                "destination": slots["destination"],
+                "out_date": slots["out_date"].isoformat()
+            })
+        }
+    }
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> Dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+class StubLLMServer:
+    """Runs the stub app with uvicorn in a background thread (own event loop)"""
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 18080):
+        self.state = StubState(config=config)
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_stub_app(self.state), host=host, port=port, log_level="warning"
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def __enter__(self) -> "StubLLMServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Stub LLM server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
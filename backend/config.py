@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import Literal, Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -22,6 +22,34 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = ""
     AZURE_OPENAI_ENDPOINT: str = ""
     OLLAMA_BASE_URL: str = "http://ollama:11434"
+    OPENAI_BASE_URL: str = ""  # Any OpenAI-compatible server (vLLM, benchmark stub)
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_PROMPT_CACHE_ENABLED: bool = True
+    OLLAMA_KEEP_ALIVE: str = "30m"
+    LLM_COMPACT_TOOL_RESULTS: bool = True
+    SPECULATIVE_SEARCH_ENABLED: bool = True
+
+    # LLM router: JSON list of backends, e.g.
+    # [{"name": "ollama", "provider": "ollama", "model": "llama2"},
+    #  {"name": "vllm", "provider": "openai", "model": "llama2", "base_url": "http://vllm:8000/v1"}]
+    LLM_BACKENDS: List[Dict[str, str]] = []
+    LLM_ROUTER_WINDOW_SIZE: int = 50
+    LLM_ROUTER_MAX_ERROR_RATE: float = 0.5
+    LLM_ROUTER_MIN_SAMPLES: int = 5
+    LLM_ROUTER_COOLDOWN_SECONDS: float = 30.0
+    LLM_ROUTER_HEDGE_ENABLED: bool = True
+    LLM_ROUTER_HEDGE_PERCENTILE: float = 0.95
+    LLM_ROUTER_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+
+    # Chat admission control
+    CHAT_MAX_CONCURRENT_LLM_CALLS: int = 8
+    CHAT_MAX_QUEUED_LLM_CALLS: int = 32
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    CHAT_RETRY_AFTER_SECONDS: int = 5
+    CHAT_DEGRADED_CACHE_REPLY: bool = True
 
     # Pricing Engine
     R_PER_MILE: float = 0.03
@@ -34,22 +62,151 @@ class Settings(BaseSettings):
     # Cache
     CACHE_TTL_MINUTES: int = 30
     LIVE_SEARCH_THRESHOLD_MINUTES: int = 30
+    # Per-provider cache cells: how long each source's answer stays fresh
+    # (NDC cash fares move faster than award availability). Providers not
+    # listed use LIVE_SEARCH_THRESHOLD_MINUTES.
+    # TTL relationship: the merged per-pair cache lives
+    #   min(CACHE_TTL_MINUTES, LIVE_SEARCH_THRESHOLD_MINUTES,
+    #       TTL of every *enabled* provider)
+    # i.e. 10 minutes while Duffel is configured, 15 with only Amadeus/Kiwi,
+    # 30 with only the loyalty programs. When it expires, sources whose
+    # cell is still fresh are re-merged from Redis and only the expired
+    # ones are fetched. The warmer derives its skip threshold from this TTL.
+    PROVIDER_CACHE_TTL_MINUTES: Dict[str, int] = {
+        "duffel": 10,
+        "amadeus": 15,
+        "kiwi": 15,
+        "smiles": 30,
+        "latam_pass": 30,
+        "tudoazul": 30
+    }
+
+    # Popular-route warmer
+    WARMER_DEMAND_WINDOW_HOURS: int = 24
+    WARMER_CANDIDATES_PER_BUCKET: int = 200
+    WARMER_MIN_HITS: int = 2
+    WARMER_TOP_N: int = 50
+    WARMER_CONCURRENCY: int = 4
+    WARMER_RUN_BUDGET_MINUTES: int = 5
+    # The warmer draws from its own "warm:<bucket>" rate limits at this share
+    # of each provider's rate, on top of the interactive buckets
+    WARMER_RATE_LIMIT_SHARE: float = 0.3
+    # Skip queries whose pair cache still has more than this fraction of its TTL left
+    WARMER_SKIP_IF_TTL_ABOVE_FRACTION: float = 0.5
+
+    # Offer retention (partition maintenance + batched cleanup)
+    OFFER_PARTITION_WEEKS_AHEAD: int = 56
+    OFFER_PARTITION_RETENTION_WEEKS: int = 1
+    OFFER_CLEANUP_BATCH_SIZE: int = 5000
+    OFFER_CLEANUP_BATCH_PAUSE_SECONDS: float = 0.05
+    OFFER_CLEANUP_MAX_SECONDS: int = 300
+    OFFER_CLEANUP_LOCK_TIMEOUT_MS: int = 2000
+
+    # Price alerts
+    PRICE_ALERT_INDEX_RELOAD_SECONDS: float = 60.0
+    PRICE_ALERT_DEDUPE_HOURS: int = 24
+    PRICE_ALERT_DIGEST_WINDOW_MINUTES: int = 15
+    PRICE_ALERT_DIGEST_MAX_OFFERS: int = 10
+    PRICE_ALERT_DIGEST_USERS_PER_FLUSH: int = 2000
+
+    # Knowledge base retrieval
+    KNOWLEDGE_INDEX_DIR: str = "data/knowledge_index"
+    KNOWLEDGE_EMBEDDING_DIM: int = 1536
+    KNOWLEDGE_IVF_MIN_ROWS: int = 256
+    KNOWLEDGE_IVF_NPROBE: int = 4
+    KNOWLEDGE_INDEX_RELOAD_SECONDS: float = 60.0
 
     # Providers
     DUFFEL_API_KEY: str = ""
     AMADEUS_API_KEY: str = ""
     AMADEUS_API_SECRET: str = ""
     KIWI_API_KEY: str = ""
+    AMADEUS_BASE_URL: str = "https://test.api.amadeus.com"
+
+    # Provider HTTP transport (shared pooled clients per provider)
+    PROVIDER_TIMEOUT_SECONDS: float = 15.0
+    PROVIDER_TIMEOUTS: Dict[str, float] = {"duffel": 20.0}
+    PROVIDER_MAX_CONNECTIONS: int = 20
+    PROVIDER_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    PROVIDER_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    PROVIDER_MAX_RETRIES: int = 2
+    PROVIDER_RETRY_BUDGET_RATIO: float = 0.1
+    PROVIDER_RETRY_BUDGET_WINDOW_SECONDS: float = 10.0
+    PROVIDER_RETRY_BUDGET_MIN: int = 3
+
+    # Provider circuit breakers (shared in Redis) and adaptive timeouts
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_FAILURE_WINDOW_SECONDS: int = 60
+    CIRCUIT_OPEN_SECONDS: int = 30
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = 2.0
+    ADAPTIVE_TIMEOUT_MIN_SECONDS: float = 2.0
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES: int = 20
+    ADAPTIVE_TIMEOUT_WINDOW: int = 200
+
+    # Provider record/replay (providers/recording.py). "record" appends every
+    # provider answer (offers, latency, error) to a gzipped JSONL corpus per
+    # provider; "replay" serves searches from it offline, with latency
+    # scaling and injected failures/hangs for load tests.
+    PROVIDER_REPLAY_MODE: Literal["off", "record", "replay"] = "off"
+    PROVIDER_CORPUS_DIR: str = "data/provider_corpus"
+    PROVIDER_RECORD_SAMPLE_RATE: float = 1.0
+    PROVIDER_REPLAY_LATENCY_SCALE: float = 1.0
+    PROVIDER_REPLAY_FAILURE_RATE: float = 0.0
+    PROVIDER_REPLAY_HANG_RATE: float = 0.0
+    PROVIDER_REPLAY_HANG_SECONDS: float = 60.0
+    PROVIDER_REPLAY_SEED: Optional[int] = None
 
     # Scraping
     ROTATING_PROXY_URL: str = ""
     CAPTCHA_SOLVER_KEY: str = ""
     SCRAPING_ENABLED: bool = True
     SCRAPING_RATE_LIMIT_PER_MINUTE: int = 5
+    MILES_SEARCH_VIA_CELERY: bool = True  # False runs the loyalty providers inline in the API
+    MILES_SEARCH_TIMEOUT_SECONDS: float = 20.0
+    SCRAPING_BROWSER_CONTEXTS: int = 2  # Warm contexts per worker process
+    SCRAPING_CONTEXT_MAX_PAGES: int = 50  # Recycle a context after this many pages
+    SCRAPING_PAGE_TIMEOUT_SECONDS: float = 30.0
+    # Load the program's site in the pooled browser on each scrape. Off while
+    # parsing is a stub: the page adds seconds and the offers are mocked
+    SCRAPING_LOAD_PAGES: bool = False
+    # Entry page per program; point at local fixture servers for testing
+    SCRAPING_PROGRAM_URLS: Dict[str, str] = {
+        "smiles": "https://www.smiles.com.br",
+        "latam_pass": "https://latampass.latam.com",
+        "tudoazul": "https://www.voeazul.com.br/tudoazul"
+    }
+
+    # Route-capability index (services/route_capability.py): which providers
+    # can serve a route, from the offers stored in the last LOOKBACK_DAYS.
+    # A program is skipped on a route whose known carriers are all outside
+    # its own + partner carriers below.
+    ROUTE_CAPABILITY_RELOAD_SECONDS: float = 300.0
+    ROUTE_CAPABILITY_LOOKBACK_DAYS: int = 30
+    ROUTE_CAPABILITY_PROGRAM_CARRIERS: Dict[str, List[str]] = {
+        "smiles": ["G3", "AR", "AF", "KL", "TK", "AA", "EK", "ET"],
+        "latam_pass": ["LA", "JJ", "4M", "XL", "4C", "PZ", "DL", "IB", "QR"],
+        "tudoazul": ["AD", "TP", "UA", "CM", "ET", "TK"]
+    }
+    # Share of searches that still ask a program the carriers rule out
+    ROUTE_CAPABILITY_EXPLORE_RATE: float = 0.05
+    # Programs that only sell domestic awards (airports in one country)
+    ROUTE_CAPABILITY_DOMESTIC_ONLY: List[str] = []
+
+    # Distributed rate limits (Redis token buckets, one per provider).
+    # Per-bucket overrides, e.g. {"smiles": {"per_minute": 10, "burst": 3}}
+    PROVIDER_RATE_LIMIT_PER_MINUTE: int = 120
+    RATE_LIMIT_DEFAULT_BURST: int = 2
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 10.0
+    RATE_LIMIT_BUCKETS: Dict[str, Dict[str, float]] = {}
 
     # Email
     POSTMARK_API_KEY: str = ""
+    POSTMARK_API_URL: str = "https://api.postmarkapp.com"
+    SMTP_HOST: str = ""  # Used when POSTMARK_API_KEY is empty (e.g. a local debugging SMTP server)
+    SMTP_PORT: int = 25
     EMAIL_FROM: str = "noreply@travel-agent.com"
+    EMAIL_MAX_PER_SECOND: float = 10.0
+    EMAIL_RATE_LIMIT_MAX_WAIT_SECONDS: float = 300.0
 
     # Application
     BACKEND_PORT: int = 8000
@@ -3,6 +3,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
 import redis
+import redis.asyncio as redis_asyncio
 
 # PostgreSQL setup
 engine = create_engine(
@@ -24,6 +25,14 @@ redis_client = redis.from_url(
     socket_timeout=5
 )
 
+# Async client for waiting on pub/sub without blocking the event loop
+# (no socket_timeout: subscribers sit idle between messages)
+async_redis_client = redis_asyncio.from_url(
+    settings.redis_url,
+    decode_responses=True,
+    socket_connect_timeout=5
+)
+
 
 def get_db():
     """Dependency for FastAPI routes"""
@@ -37,3 +46,8 @@ def get_db():
 def get_redis():
     """Get Redis client"""
     return redis_client
+
+
+def get_async_redis():
+    """Get asyncio Redis client"""
+    return async_redis_client
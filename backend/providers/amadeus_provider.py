@@ -1,4 +1,7 @@
-from typing import List
+from typing import List, Optional
+import asyncio
+import time
+import weakref
 import structlog
 from providers.base_provider import BaseProvider
 from schemas.flight import SearchParams, Offer
@@ -7,24 +10,106 @@ from config import settings
 logger = structlog.get_logger()
 
 
+# Refresh the OAuth token in the background once it is this close to expiry,
+# and stop using it this close to expiry
+TOKEN_REFRESH_AHEAD_SECONDS = 300
+TOKEN_EXPIRY_MARGIN_SECONDS = 30
+
+
 class AmadeusProvider(BaseProvider):
     """
     Amadeus Self-Service API provider (STUB).
 
     Real implementation: https://developers.amadeus.com/self-service/category/flights
+
+    The OAuth access token is shared by every instance in the process and
+    reused until shortly before it expires; it is refreshed in the
+    background ahead of expiry, so searches only wait for a token fetch
+    when there is no valid token at all (first call, long idle).
     """
 
+    rate_limit_bucket = "amadeus"
+    name = "amadeus"
+
+    # search_offers doesn't call the API yet, so no token is fetched
+    # (neither on the search path nor at startup)
+    stubbed = True
+
+    _access_token: Optional[str] = None
+    _token_expires_at: float = 0.0
+    _refresh_tasks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+    _token_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
     def __init__(self):
         self.api_key = settings.AMADEUS_API_KEY
         self.api_secret = settings.AMADEUS_API_SECRET
+        self.base_url = settings.AMADEUS_BASE_URL
 
     def is_available(self) -> bool:
         return bool(self.api_key and self.api_secret)
 
+    async def warm(self):
+        """Fetch the token before the first search needs it"""
+        if self.stubbed or not self.is_available():
+            return
+        await self.get_access_token()
+
+    async def get_access_token(self, trace_id: Optional[str] = None) -> str:
+        cls = type(self)
+        now = time.monotonic()
+
+        if cls._access_token and now < cls._token_expires_at - TOKEN_EXPIRY_MARGIN_SECONDS:
+            if now > cls._token_expires_at - TOKEN_REFRESH_AHEAD_SECONDS:
+                self._schedule_refresh()
+            return cls._access_token
+
+        return await self._refresh_token(trace_id)
+
+    def _schedule_refresh(self):
+        loop = asyncio.get_running_loop()
+        task = self._refresh_tasks.get(loop)
+        if task is None or task.done():
+            self._refresh_tasks[loop] = loop.create_task(self._refresh_token())
+
+    async def _refresh_token(self, trace_id: Optional[str] = None) -> str:
+        cls = type(self)
+        lock = cls._token_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+        async with lock:
+            # Another caller may have refreshed it while we waited
+            if cls._access_token and time.monotonic() < cls._token_expires_at - TOKEN_REFRESH_AHEAD_SECONDS:
+                return cls._access_token
+
+            response = await self.request(
+                "POST",
+                "/v1/security/oauth2/token",
+                trace_id=trace_id,
+                # Minting a token has no side effects
+                idempotent=True,
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.api_key,
+                    "client_secret": self.api_secret
+                }
+            )
+            response.raise_for_status()
+            body = response.json()
+
+            cls._access_token = body["access_token"]
+            cls._token_expires_at = time.monotonic() + float(body.get("expires_in", 1799))
+            logger.info("amadeus_token_refreshed", expires_in=body.get("expires_in"), trace_id=trace_id)
+            return cls._access_token
+
     async def search_offers(self, params: SearchParams, trace_id: str) -> List[Offer]:
         if not self.is_available():
             return []
 
+        await self.throttle(trace_id)
+
+        # Real call, over the pooled transport:
+        # token = await self.get_access_token(trace_id)
+        # await self.request("GET", "/v2/shopping/flight-offers", trace_id=trace_id,
+        #                    headers={"Authorization": f"Bearer {token}"}, params={...})
         logger.info("amadeus_search_stub", trace_id=trace_id)
         # Stub: return empty for now
         return []
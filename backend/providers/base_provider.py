@@ -1,11 +1,91 @@
 from abc import ABC, abstractmethod
-from typing import List
-from schemas.flight import SearchParams, Offer
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from datetime import date, timedelta
+import calendar
+import httpx
+import structlog
+from schemas.flight import SearchParams, Offer, Pax, CabinClass
+from providers.transport import ProviderTransport, get_provider_transport
+from providers.recording import recorded
+
+logger = structlog.get_logger()
+
+
+# Bucket whose token the caller already took for the provider call it is
+# about to make (prepaid_token); that call's throttle() doesn't take another
+_prepaid_bucket: ContextVar[Optional[str]] = ContextVar("prepaid_rate_limit_bucket", default=None)
+
+
+@contextmanager
+def prepaid_token(bucket: Optional[str]):
+    """
+    Mark a rate-limit token from `bucket` as already taken for the provider
+    calls made inside the block (e.g. taken outside a timeout, or by a
+    Celery task before the scrape).
+    """
+    token = _prepaid_bucket.set(bucket)
+    try:
+        yield
+    finally:
+        _prepaid_bucket.reset(token)
+
+
+def month_days(month: date) -> List[date]:
+    """Bookable days of a month: from today (or the 1st) to the last day"""
+    first = max(month.replace(day=1), date.today())
+    last = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def calendar_points_factor(day: date) -> float:
+    """Synthetic award pricing for mock calendars: Fri/Sun cost more, midweek less"""
+    return {4: 1.3, 6: 1.3, 1: 0.85, 2: 0.85}.get(day.weekday(), 1.0)
 
 
 class BaseProvider(ABC):
     """Base class for all flight providers (APIs and scrapers)"""
 
+    # Shared token bucket this provider's calls draw from (services/rate_limiter.py)
+    rate_limit_bucket: Optional[str] = None
+
+    # Provider name (record/replay corpus, circuit breaker); API-based
+    # providers also set the base URL of their pooled HTTP transport
+    name: Optional[str] = None
+    base_url: Optional[str] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Record/replay hook (providers/recording.py, PROVIDER_REPLAY_MODE)
+        if "search_offers" in cls.__dict__:
+            cls.search_offers = recorded(cls.search_offers)
+
+    @property
+    def transport(self) -> ProviderTransport:
+        """Process-wide keep-alive client for this provider (providers/transport.py)"""
+        return get_provider_transport(self.name, self.base_url)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        trace_id: Optional[str] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        HTTP call through the provider's pooled transport, with retries.
+        Pass idempotent=True for POSTs that are safe to resend (searches).
+        """
+        return await self.transport.request(method, path, trace_id=trace_id, idempotent=idempotent, **kwargs)
+
+    async def throttle(self, trace_id: str):
+        """Wait for a token from the provider's distributed rate limit, unless the caller prepaid it"""
+        if self.rate_limit_bucket and _prepaid_bucket.get() != self.rate_limit_bucket:
+            from services.rate_limiter import get_rate_limiter
+            await get_rate_limiter().acquire(self.rate_limit_bucket, trace_id=trace_id)
+
     @abstractmethod
     async def search_offers(self, params: SearchParams, trace_id: str) -> List[Offer]:
         """
@@ -20,6 +100,36 @@ class BaseProvider(ABC):
         """
         pass
 
+    async def search_month(
+        self,
+        origin: str,
+        destination: str,
+        month: date,
+        trace_id: str,
+        pax: Optional[Pax] = None,
+        cabin: CabinClass = CabinClass.ECONOMY
+    ) -> Dict[date, List[Offer]]:
+        """
+        One-way offers for every bookable day of a month (award calendar).
+
+        Providers with a calendar/bulk endpoint override this to fetch the
+        whole month in one interaction; the default falls back to one
+        search_offers call per day.
+
+        Returns {day: offers}
+        """
+        results = {}
+        for day in month_days(month):
+            params = SearchParams(
+                origin=origin,
+                destination=destination,
+                out_date=day,
+                pax=pax or Pax(),
+                cabin=cabin
+            )
+            results[day] = await self.search_offers(params, trace_id)
+        return results
+
     @abstractmethod
     def is_available(self) -> bool:
         """
@@ -29,3 +139,43 @@ class BaseProvider(ABC):
             True if provider can be used
         """
         pass
+
+
+class MockAwardCalendarMixin:
+    """
+    Award calendar for the stub loyalty providers: one throttled request
+    for the whole month (as a real calendar endpoint would be), answered
+    with the provider's _mock_offer for each day at calendar pricing.
+    """
+
+    async def search_month(
+        self,
+        origin: str,
+        destination: str,
+        month: date,
+        trace_id: str,
+        pax: Optional[Pax] = None,
+        cabin: CabinClass = CabinClass.ECONOMY
+    ) -> Dict[date, List[Offer]]:
+        if not self.is_available():
+            return {}
+
+        # One award-calendar request covers the whole month
+        await self.throttle(trace_id)
+
+        logger.info(
+            "month_search_mock",
+            provider=self.name,
+            origin=origin,
+            destination=destination,
+            month=month.isoformat(),
+            trace_id=trace_id
+        )
+
+        return {
+            day: [self._mock_offer(
+                SearchParams(origin=origin, destination=destination, out_date=day, pax=pax or Pax(), cabin=cabin),
+                points_factor=calendar_points_factor(day)
+            )]
+            for day in month_days(month)
+        }
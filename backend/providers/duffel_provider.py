@@ -20,9 +20,12 @@ class DuffelProvider(BaseProvider):
     Docs: https://duffel.com/docs/api
     """
 
+    rate_limit_bucket = "duffel"
+    name = "duffel"
+    base_url = "https://api.duffel.com"
+
     def __init__(self):
         self.api_key = settings.DUFFEL_API_KEY
-        self.base_url = "https://api.duffel.com"
 
     def is_available(self) -> bool:
         return bool(self.api_key)
@@ -32,7 +35,8 @@ class DuffelProvider(BaseProvider):
         Search for cash offers via Duffel API (STUB).
 
         In production, this would:
-        1. Call POST /air/offer_requests with search params
+        1. Call POST /air/offer_requests with search params via self.request
+           (pooled keep-alive transport)
         2. Poll for results or use webhook
         3. Transform Duffel's offer format to our Offer schema
         """
@@ -40,6 +44,8 @@ class DuffelProvider(BaseProvider):
             logger.warning("duffel_not_configured", trace_id=trace_id)
             return []
 
+        await self.throttle(trace_id)
+
         logger.info(
             "duffel_search_mock",
             origin=params.origin,
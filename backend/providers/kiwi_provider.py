@@ -14,6 +14,10 @@ class KiwiProvider(BaseProvider):
     Real implementation: https://tequila.kiwi.com/portal/docs
     """
 
+    rate_limit_bucket = "kiwi"
+    name = "kiwi"
+    base_url = "https://api.tequila.kiwi.com"
+
     def __init__(self):
         self.api_key = settings.KIWI_API_KEY
 
@@ -24,6 +28,8 @@ class KiwiProvider(BaseProvider):
         if not self.is_available():
             return []
 
+        await self.throttle(trace_id)
+
         logger.info("kiwi_search_stub", trace_id=trace_id)
         # Stub: return empty for now
         return []
@@ -0,0 +1,282 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import asyncio
+import functools
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import structlog
+
+from schemas.flight import SearchParams, Offer, Pax, CabinClass
+from config import settings
+
+logger = structlog.get_logger()
+
+
+class ProviderReplayError(Exception):
+    """A recorded or injected provider failure during replay"""
+
+
+def query_key(params: SearchParams, today: Optional[date] = None) -> str:
+    """
+    Corpus key of a search. Dates are relative (days ahead, trip length)
+    so a corpus recorded last month still matches today's searches.
+    """
+    today = today or date.today()
+    trip_days = (params.ret_date - params.out_date).days if params.ret_date else ""
+    return "|".join([
+        params.origin,
+        params.destination,
+        str((params.out_date - today).days),
+        str(trip_days),
+        str(params.pax.adults),
+        str(params.pax.children),
+        str(params.pax.infants),
+        params.cabin.value
+    ])
+
+
+class ProviderCorpus:
+    """
+    On-disk corpus of provider answers: gzipped JSONL, one line per
+    recorded search_offers call with its query, latency, outcome and
+    offers. Each recording process writes its own file per provider
+    ({dir}/{provider}.{pid}.jsonl.gz), so uvicorn and Celery processes
+    recording at once never interleave writes; reads merge every file of
+    the provider ({provider}.jsonl.gz from older corpora included).
+
+    Appends write a new gzip member, so recording needs no rewrite and
+    the file stays readable while it grows.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict]] = {}
+        self._by_key: Dict[str, Dict[str, List[Dict]]] = {}
+        self._cursors: Dict[tuple, int] = {}
+        self.rng = random.Random(settings.PROVIDER_REPLAY_SEED)
+
+    def path(self, provider: str) -> str:
+        """This process's file for a provider"""
+        return os.path.join(self.directory, f"{provider}.{os.getpid()}.jsonl.gz")
+
+    def paths(self, provider: str) -> List[str]:
+        """Every recorded file for a provider"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".jsonl.gz") and name.split(".", 1)[0] == provider
+        )
+
+    def append(self, provider: str, entry: Dict):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with gzip.open(self.path(provider), "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def has(self, provider: str) -> bool:
+        return bool(self.entries(provider))
+
+    def providers(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted({
+            name.split(".", 1)[0]
+            for name in os.listdir(self.directory)
+            if name.endswith(".jsonl.gz")
+        })
+
+    def entries(self, provider: str) -> List[Dict]:
+        if provider not in self._entries:
+            entries = []
+            for path in self.paths(provider):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    entries.extend(json.loads(line) for line in f if line.strip())
+            entries.sort(key=lambda entry: entry["recorded_at"])
+
+            by_key: Dict[str, List[Dict]] = {}
+            for entry in entries:
+                by_key.setdefault(entry["key"], []).append(entry)
+
+            self._entries[provider] = entries
+            self._by_key[provider] = by_key
+        return self._entries[provider]
+
+    def queries(self) -> List[SearchParams]:
+        """Distinct recorded searches (every provider), re-dated to today, in recording order"""
+        seen = {}
+        for provider in self.providers():
+            for entry in self.entries(provider):
+                seen.setdefault(entry["key"], entry)
+
+        ordered = sorted(seen.values(), key=lambda entry: entry["recorded_at"])
+        return [self._params_for(entry["query"]) for entry in ordered]
+
+    async def replay(self, provider: str, params: SearchParams, trace_id: str) -> List[Offer]:
+        """
+        Serve a search from the corpus: the recorded answers for the same
+        query in turn, otherwise a seeded random answer of the provider
+        moved onto the requested route and dates. The recorded latency is
+        slept (times PROVIDER_REPLAY_LATENCY_SCALE) and recorded errors are
+        raised; PROVIDER_REPLAY_FAILURE_RATE / _HANG_RATE inject more.
+        """
+        entries = self.entries(provider)
+        if not entries:
+            raise ProviderReplayError(f"No recorded responses for {provider}")
+
+        key = query_key(params)
+        matches = self._by_key[provider].get(key)
+        if matches:
+            cursor = self._cursors.get((provider, key), 0)
+            self._cursors[(provider, key)] = cursor + 1
+            entry = matches[cursor % len(matches)]
+        else:
+            entry = self.rng.choice(entries)
+
+        if entry.get("timed_out") or self.rng.random() < settings.PROVIDER_REPLAY_HANG_RATE:
+            await asyncio.sleep(settings.PROVIDER_REPLAY_HANG_SECONDS)
+            raise ProviderReplayError(f"{provider} did not answer (replayed hang)")
+
+        await asyncio.sleep(entry["latency_ms"] / 1000 * settings.PROVIDER_REPLAY_LATENCY_SCALE)
+
+        if entry.get("error"):
+            raise ProviderReplayError(entry["error"])
+        if self.rng.random() < settings.PROVIDER_REPLAY_FAILURE_RATE:
+            raise ProviderReplayError(f"{provider} injected failure")
+
+        offers = [self._adapt(Offer(**offer), entry, params) for offer in entry["offers"]]
+        logger.info(
+            "provider_replayed",
+            provider=provider,
+            exact=bool(matches),
+            count=len(offers),
+            latency_ms=entry["latency_ms"],
+            trace_id=trace_id
+        )
+        return offers
+
+    def _adapt(self, offer: Offer, entry: Dict, params: SearchParams) -> Offer:
+        """Move a recorded offer onto the requested route and dates"""
+        shift = params.out_date - date.fromisoformat(entry["query"]["out_date"])
+        same_route = (
+            entry["query"]["origin"] == params.origin
+            and entry["query"]["destination"] == params.destination
+        )
+
+        segments = [
+            segment.model_copy(update={"depart": segment.depart + shift, "arrive": segment.arrive + shift})
+            for segment in offer.segments
+        ]
+        if not same_route:
+            segments[0] = segments[0].model_copy(update={"origin": params.origin})
+            segments[-1] = segments[-1].model_copy(update={"destination": params.destination})
+
+        now = datetime.now()
+        update = {
+            "segments": segments,
+            "out_date": params.out_date,
+            "ret_date": params.ret_date,
+            "created_at": now,
+            "expires_at": now + (offer.expires_at - offer.created_at)
+        }
+        # A moved offer is a different offer (offers' primary key is id + out_date)
+        if shift or not same_route:
+            update["id"] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{offer.id}:{query_key(params)}"))
+
+        return offer.model_copy(update=update)
+
+    def _params_for(self, query: Dict) -> SearchParams:
+        recorded_on = date.fromisoformat(query["recorded_on"])
+        out_date = date.today() + (date.fromisoformat(query["out_date"]) - recorded_on)
+        ret_date = None
+        if query.get("ret_date"):
+            ret_date = out_date + (date.fromisoformat(query["ret_date"]) - date.fromisoformat(query["out_date"]))
+
+        return SearchParams(
+            origin=query["origin"],
+            destination=query["destination"],
+            out_date=out_date,
+            ret_date=ret_date,
+            pax=Pax(**query["pax"]),
+            cabin=CabinClass(query["cabin"])
+        )
+
+
+async def _record(corpus: ProviderCorpus, provider: str, call, params: SearchParams) -> List[Offer]:
+    started = time.perf_counter()
+    entry = {
+        "key": query_key(params),
+        "recorded_at": datetime.now().isoformat(),
+        "query": {
+            "origin": params.origin,
+            "destination": params.destination,
+            "out_date": params.out_date.isoformat(),
+            "ret_date": params.ret_date.isoformat() if params.ret_date else None,
+            "pax": params.pax.model_dump(),
+            "cabin": params.cabin.value,
+            "recorded_on": date.today().isoformat()
+        },
+        "error": None,
+        "offers": []
+    }
+
+    try:
+        offers = await call
+        entry["offers"] = [offer.model_dump(mode="json", exclude_none=True) for offer in offers]
+        return offers
+    except asyncio.CancelledError:
+        # Cut off by the caller's timeout: replay it as a hang
+        entry["timed_out"] = True
+        raise
+    except Exception as e:
+        entry["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        entry["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            # Off the event loop: the append is blocking file I/O
+            await asyncio.to_thread(corpus.append, provider, entry)
+        except Exception as e:
+            logger.warning("provider_record_error", provider=provider, error=str(e))
+
+
+def recorded(search_offers):
+    """
+    Wrap a provider's search_offers for PROVIDER_REPLAY_MODE (applied to
+    every BaseProvider subclass): pass through, record into the corpus,
+    or answer from it without touching the network. Providers with nothing
+    recorded (e.g. the in-process miles mocks) pass through in replay mode.
+    """
+
+    @functools.wraps(search_offers)
+    async def wrapper(provider, params: SearchParams, trace_id: str) -> List[Offer]:
+        mode = settings.PROVIDER_REPLAY_MODE
+        if replaying(provider.name):
+            return await get_provider_corpus().replay(provider.name, params, trace_id)
+        if mode == "record" and random.random() < settings.PROVIDER_RECORD_SAMPLE_RATE:
+            return await _record(get_provider_corpus(), provider.name, search_offers(provider, params, trace_id), params)
+        return await search_offers(provider, params, trace_id)
+
+    return wrapper
+
+
+def replaying(provider: str) -> bool:
+    """Whether searches for this provider are served from the corpus"""
+    return settings.PROVIDER_REPLAY_MODE == "replay" and get_provider_corpus().has(provider)
+
+
+_corpus: Optional[ProviderCorpus] = None
+
+
+def get_provider_corpus() -> ProviderCorpus:
+    global _corpus
+    if _corpus is None or _corpus.directory != settings.PROVIDER_CORPUS_DIR:
+        _corpus = ProviderCorpus(settings.PROVIDER_CORPUS_DIR)
+    return _corpus
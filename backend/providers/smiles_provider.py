@@ -3,14 +3,14 @@ from datetime import datetime, timedelta
 import uuid
 import structlog
 
-from providers.base_provider import BaseProvider
+from providers.base_provider import BaseProvider, MockAwardCalendarMixin
 from schemas.flight import SearchParams, Offer, Segment, MilesPrice, OfferType, MilesProgram
 from config import settings
 
 logger = structlog.get_logger()
 
 
-class SmilesProvider(BaseProvider):
+class SmilesProvider(MockAwardCalendarMixin, BaseProvider):
     """
     Smiles (Gol) loyalty program provider.
 
@@ -23,6 +23,9 @@ class SmilesProvider(BaseProvider):
     within legal/ToS boundaries.
     """
 
+    rate_limit_bucket = "smiles"
+    name = "smiles"
+
     def is_available(self) -> bool:
         return settings.SCRAPING_ENABLED
 
@@ -30,6 +33,8 @@ class SmilesProvider(BaseProvider):
         if not self.is_available():
             return []
 
+        await self.throttle(trace_id)
+
         logger.info(
             "smiles_search_mock",
             origin=params.origin,
@@ -37,7 +42,12 @@ class SmilesProvider(BaseProvider):
             trace_id=trace_id
         )
 
-        # Mock miles offer
+        offers = [self._mock_offer(params)]
+
+        logger.info("smiles_mock_complete", trace_id=trace_id)
+        return offers
+
+    def _mock_offer(self, params: SearchParams, points_factor: float = 1.0) -> Offer:
         offer_id = f"smiles_{uuid.uuid4().hex[:12]}"
 
         # Direct flight segment
@@ -84,7 +94,7 @@ class SmilesProvider(BaseProvider):
             cabin=params.cabin,
             miles=MilesPrice(
                 program=MilesProgram.SMILES,
-                points=15000 if params.ret_date else 7500,
+                points=int((15000 if params.ret_date else 7500) * points_factor),
                 taxes_cents=12800  # R$ 128.00
             ),
             baggage_included=True,
@@ -97,5 +107,4 @@ class SmilesProvider(BaseProvider):
             expires_at=datetime.now() + timedelta(hours=4)
         )
 
-        logger.info("smiles_mock_complete", trace_id=trace_id)
-        return [offer]
+        return offer
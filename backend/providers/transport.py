@@ -0,0 +1,165 @@
+from collections import deque
+from typing import Dict, Optional
+import asyncio
+import time
+import weakref
+import httpx
+import structlog
+
+from config import settings
+
+logger = structlog.get_logger()
+
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Statuses meaning the request was turned away before it was processed,
+# so even a non-idempotent request (e.g. creating an order) can be resent
+REJECTED_STATUS = {429, 503}
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent requests.
+
+    Retries are allowed while they stay under PROVIDER_RETRY_BUDGET_RATIO
+    of the requests in the last PROVIDER_RETRY_BUDGET_WINDOW_SECONDS (with
+    a small floor), so a struggling provider gets a few retries but an
+    outage doesn't turn into a retry storm. Only first attempts count as
+    requests; retries are counted separately against them.
+    """
+
+    def __init__(self, ratio: float, window_seconds: float, min_retries: int):
+        self.ratio = ratio
+        self.window_seconds = window_seconds
+        self.min_retries = min_retries
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def record_request(self):
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+        if len(self._retries) >= max(self.min_retries, self.ratio * len(self._requests)):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class ProviderTransport:
+    """
+    Pooled HTTP client for one API provider.
+
+    Keeps a keep-alive (HTTP/2 when h2 is installed) connection pool with
+    the provider's timeout, so searches reuse warm TLS connections, and
+    retries failures with backoff within the provider's retry budget.
+
+    Idempotent methods (and requests marked idempotent=True, e.g. a POST
+    search) are retried on connect errors, dropped connections, read
+    timeouts and 429/5xx. Other requests may already have taken effect, so they are
+    only retried when they never reached the provider (connect errors)
+    or were rejected outright (429/503).
+    """
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.timeout = settings.PROVIDER_TIMEOUTS.get(name, settings.PROVIDER_TIMEOUT_SECONDS)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.PROVIDER_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+        self.retry_budget = RetryBudget(
+            ratio=settings.PROVIDER_RETRY_BUDGET_RATIO,
+            window_seconds=settings.PROVIDER_RETRY_BUDGET_WINDOW_SECONDS,
+            min_retries=settings.PROVIDER_RETRY_BUDGET_MIN
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        trace_id: Optional[str] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retryable_status = RETRYABLE_STATUS if idempotent else REJECTED_STATUS
+
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            failure = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in retryable_status:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Never sent
+                response, failure = None, e
+                error = str(e) or type(e).__name__
+            except (httpx.RemoteProtocolError, httpx.ReadTimeout) as e:
+                # Sent, but the answer was lost: the provider may have acted on it
+                if not idempotent:
+                    raise
+                response, failure = None, e
+                error = str(e) or type(e).__name__
+
+            attempt += 1
+            if attempt > settings.PROVIDER_MAX_RETRIES or not self.retry_budget.try_spend():
+                logger.warning("provider_request_failed", provider=self.name, attempts=attempt, error=error, trace_id=trace_id)
+                if response is not None:
+                    return response
+                raise failure
+
+            delay = 0.2 * 2 ** (attempt - 1)
+            if response is not None and response.headers.get("retry-after", "").isdigit():
+                delay = max(delay, float(response.headers["retry-after"]))
+            logger.info("provider_request_retry", provider=self.name, attempt=attempt, error=error, trace_id=trace_id)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# httpx clients are bound to the event loop that first uses them, and Celery
+# tasks each run their own loop, so transports are kept per loop
+_transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, ProviderTransport]]" = weakref.WeakKeyDictionary()
+
+
+def get_provider_transport(name: str, base_url: str) -> ProviderTransport:
+    """Process-wide (per event loop) transport for a provider"""
+    loop = asyncio.get_running_loop()
+    transports = _transports.setdefault(loop, {})
+    if name not in transports:
+        transports[name] = ProviderTransport(name, base_url)
+        logger.info("provider_transport_created", provider=name, http2=HTTP2_AVAILABLE)
+    return transports[name]
+
+
+async def close_provider_transports():
+    """Close the transports of the running loop (application shutdown)"""
+    transports = _transports.pop(asyncio.get_running_loop(), {})
+    for transport in transports.values():
+        await transport.aclose()
@@ -3,16 +3,19 @@ from datetime import datetime, timedelta
 import uuid
 import structlog
 
-from providers.base_provider import BaseProvider
+from providers.base_provider import BaseProvider, MockAwardCalendarMixin
 from schemas.flight import SearchParams, Offer, Segment, MilesPrice, OfferType, MilesProgram
 from config import settings
 
 logger = structlog.get_logger()
 
 
-class TudoAzulProvider(BaseProvider):
+class TudoAzulProvider(MockAwardCalendarMixin, BaseProvider):
     """TudoAzul (Azul) loyalty program provider (STUB)"""
 
+    rate_limit_bucket = "tudoazul"
+    name = "tudoazul"
+
     def is_available(self) -> bool:
         return settings.SCRAPING_ENABLED
 
@@ -20,8 +23,13 @@ class TudoAzulProvider(BaseProvider):
         if not self.is_available():
             return []
 
+        await self.throttle(trace_id)
+
         logger.info("tudoazul_search_mock", trace_id=trace_id)
 
+        return [self._mock_offer(params)]
+
+    def _mock_offer(self, params: SearchParams, points_factor: float = 1.0) -> Offer:
         offer_id = f"tudoazul_{uuid.uuid4().hex[:12]}"
 
         depart = datetime.combine(params.out_date, datetime.min.time()).replace(hour=7, minute=30)
@@ -66,7 +74,7 @@ class TudoAzulProvider(BaseProvider):
             cabin=params.cabin,
             miles=MilesPrice(
                 program=MilesProgram.TUDO_AZUL,
-                points=16000 if params.ret_date else 8000,
+                points=int((16000 if params.ret_date else 8000) * points_factor),
                 taxes_cents=14200
             ),
             baggage_included=True,
@@ -79,4 +87,4 @@ class TudoAzulProvider(BaseProvider):
             expires_at=datetime.now() + timedelta(hours=4)
         )
 
-        return [offer]
+        return offer
@@ -37,6 +37,8 @@ class Pax(BaseModel):
 
 
 class SearchParams(BaseModel):
+    # Airport (GRU) or metro/city code (SAO = GRU+CGH+VCP); metro codes are
+    # expanded into airport pairs by SearchService.search_offers
     origin: str = Field(min_length=3, max_length=3, pattern="^[A-Z]{3}$")
     destination: str = Field(min_length=3, max_length=3, pattern="^[A-Z]{3}$")
     out_date: date
@@ -127,6 +129,20 @@ class RankedOffersResponse(BaseModel):
     cache_age_minutes: Optional[int] = None
 
 
+class CalendarDay(BaseModel):
+    day: date
+    min_points: Optional[int] = None
+    min_points_program: Optional[MilesProgram] = None
+    points_by_program: dict[str, int] = {}
+
+
+class CalendarResponse(BaseModel):
+    origin: str
+    destination: str
+    month: str
+    days: list[CalendarDay]
+
+
 class CompareRequest(BaseModel):
     offers: list[Offer]
     user_prefs: Optional[dict] = None
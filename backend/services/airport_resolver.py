@@ -0,0 +1,244 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional
+import difflib
+import re
+import unicodedata
+import structlog
+
+logger = structlog.get_logger()
+
+
+# Metropolitan areas served by more than one airport (IATA city codes)
+METRO_AREAS = {
+    "SAO": {"name": "São Paulo (todos os aeroportos)", "city": "São Paulo", "airports": ["GRU", "CGH", "VCP"]},
+    "RIO": {"name": "Rio de Janeiro (todos os aeroportos)", "city": "Rio de Janeiro", "airports": ["GIG", "SDU"]},
+    "BHZ": {"name": "Belo Horizonte (todos os aeroportos)", "city": "Belo Horizonte", "airports": ["CNF", "PLU"]},
+}
+
+# Colloquial names users type instead of the city name
+ALIASES = {
+    "sampa": "SAO",
+    "sp": "SAO",
+    "rio": "RIO",
+    "rj": "RIO",
+    "bh": "BHZ",
+    "beaga": "BHZ",
+    "guarulhos": "GRU",
+    "congonhas": "CGH",
+    "viracopos": "VCP",
+    "campinas": "VCP",
+    "galeao": "GIG",
+    "santos dumont": "SDU",
+    "confins": "CNF",
+    "pampulha": "PLU",
+    "brasilia": "BSB",
+}
+
+IATA_PATTERN = re.compile(r"^[A-Z]{3}$")
+
+# Ranking of how an entry matched a prefix (lower is better)
+MATCH_CODE, MATCH_ALIAS, MATCH_CITY, MATCH_NAME = range(4)
+
+
+def normalize(value: str) -> str:
+    """Lower-case, strip accents and collapse whitespace"""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", value.lower()).split())
+
+
+class _TrieNode:
+    __slots__ = ("children", "matches")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # code -> best match kind for every key passing through this node
+        self.matches: Dict[str, int] = {}
+
+
+class AirportResolver:
+    """
+    In-memory airport/city index.
+
+    Built once from the airports table. Prefix lookups walk an
+    accent-insensitive trie (cost proportional to the query length, not
+    the table size); fuzzy matching is only tried when nothing matches
+    exactly, to absorb typos like "Recfe".
+    """
+
+    def __init__(self, airports: List[Dict]):
+        self.airports: Dict[str, Dict] = {a["iata"]: a for a in airports}
+        self.metros: Dict[str, Dict] = {
+            code: {**metro, "airports": [a for a in metro["airports"] if a in self.airports]}
+            for code, metro in METRO_AREAS.items()
+        }
+        self.metros = {code: m for code, m in self.metros.items() if m["airports"]}
+
+        self._root = _TrieNode()
+        # Exact normalized key -> code, also the candidate list for fuzzy matching
+        self._exact: Dict[str, str] = {}
+        # Normalized city -> metro or airport code
+        self._cities: Dict[str, str] = {}
+
+        for metro_code, metro in self.metros.items():
+            self._cities[normalize(metro["city"])] = metro_code
+
+        for code, airport in self.airports.items():
+            city = normalize(airport["city"])
+            self._cities.setdefault(city, code)
+            self._index(code.lower(), code, MATCH_CODE)
+            self._index(city, code, MATCH_CITY)
+            for word in normalize(airport["name"]).split():
+                if len(word) > 2:
+                    self._index(word, code, MATCH_NAME)
+
+        for metro_code, metro in self.metros.items():
+            self._index(metro_code.lower(), metro_code, MATCH_CODE)
+            self._index(normalize(metro["city"]), metro_code, MATCH_CITY)
+
+        for alias, code in ALIASES.items():
+            if code in self.airports or code in self.metros:
+                self._index(alias, code, MATCH_ALIAS)
+
+        logger.info("airport_resolver_built", airports=len(self.airports), metros=len(self.metros))
+
+    @classmethod
+    def from_db(cls, db: Session) -> "AirportResolver":
+        rows = db.execute(text("SELECT iata, name, city, country FROM airports")).fetchall()
+        return cls([
+            {"iata": row.iata, "name": row.name, "city": row.city, "country": row.country}
+            for row in rows
+        ])
+
+    def _index(self, key: str, code: str, kind: int):
+        if not key:
+            return
+        self._exact.setdefault(key, code)
+
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            if kind < node.matches.get(code, MATCH_NAME + 1):
+                node.matches[code] = kind
+
+    def is_known(self, code: str) -> bool:
+        return code in self.airports or code in self.metros
+
+    def expand(self, code: str) -> List[str]:
+        """Airports behind a code (a metro code expands to all its airports)"""
+        if code in self.metros:
+            return list(self.metros[code]["airports"])
+        return [code]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """
+        Resolve free text ("Recife", "Sampa", "gru", "São Paulo") to an
+        airport or metro code. Returns None when nothing plausible matches.
+        """
+        if not query:
+            return None
+
+        upper = query.strip().upper()
+        if IATA_PATTERN.match(upper) and self.is_known(upper):
+            return upper
+
+        key = normalize(query)
+        if key in self._cities:
+            return self._cities[key]
+        if key in self._exact:
+            return self._exact[key]
+
+        matches = self._prefix_matches(key)
+        if matches:
+            return matches[0]
+
+        close = difflib.get_close_matches(key, self._exact.keys(), n=1, cutoff=0.75)
+        if close:
+            return self._exact[close[0]]
+
+        return None
+
+    def resolve_airport(self, query: str) -> Optional[str]:
+        """Like resolve(), but metro codes collapse to their main airport"""
+        code = self.resolve(query)
+        if code in self.metros:
+            return self.metros[code]["airports"][0]
+        return code
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """Autocomplete suggestions for a (partial) airport/city name"""
+        key = normalize(query)
+        if not key:
+            return []
+
+        codes = self._prefix_matches(key)
+        if not codes:
+            codes = [
+                self._exact[match]
+                for match in difflib.get_close_matches(key, self._exact.keys(), n=limit, cutoff=0.7)
+            ]
+
+        suggestions = []
+        for code in dict.fromkeys(codes):
+            suggestions.append(self._describe(code))
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def _prefix_matches(self, key: str) -> List[str]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        # Metros before their airports, then by match kind and code
+        return sorted(
+            node.matches,
+            key=lambda code: (node.matches[code], code not in self.metros, code)
+        )
+
+    def _describe(self, code: str) -> Dict:
+        if code in self.metros:
+            metro = self.metros[code]
+            return {
+                "code": code,
+                "type": "metro",
+                "name": metro["name"],
+                "city": metro["city"],
+                "airports": metro["airports"],
+            }
+
+        airport = self.airports[code]
+        return {
+            "code": code,
+            "type": "airport",
+            "name": airport["name"],
+            "city": airport["city"],
+            "airports": [code],
+        }
+
+
+# Process-wide index, built in the API lifespan
+_resolver: Optional[AirportResolver] = None
+
+
+def load_airport_resolver(db: Session) -> AirportResolver:
+    """(Re)build the shared resolver from the airports table"""
+    global _resolver
+    _resolver = AirportResolver.from_db(db)
+    return _resolver
+
+
+def get_airport_resolver() -> AirportResolver:
+    """Return the shared resolver, building it on first use"""
+    if _resolver is None:
+        from database.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return load_airport_resolver(db)
+        finally:
+            db.close()
+    return _resolver
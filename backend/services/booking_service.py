@@ -15,9 +15,9 @@ logger = structlog.get_logger()
 
 
 class BookingService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, search_service: Optional[SearchService] = None):
         self.db = db
-        self.search_service = SearchService(db)
+        self.search_service = search_service or SearchService(db)
 
     async def hold_or_create_booking(
         self,
@@ -202,9 +202,8 @@ class BookingService:
         """Retrieve booking by ID"""
         try:
             query = text("""
-                SELECT b.*, o.id as offer_id
+                SELECT b.*
                 FROM bookings b
-                JOIN offers o ON b.offer_id = o.id
                 WHERE b.id = :booking_id
             """)
 
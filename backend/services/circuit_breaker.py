@@ -0,0 +1,132 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+import time
+import structlog
+
+from database.db import get_redis
+from config import settings
+
+logger = structlog.get_logger()
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breakers shared by every replica through Redis,
+    plus adaptive per-provider timeouts.
+
+    A provider's circuit opens after CIRCUIT_FAILURE_THRESHOLD failures
+    within CIRCUIT_FAILURE_WINDOW_SECONDS; while open, searches skip it.
+    After CIRCUIT_OPEN_SECONDS one caller (cluster-wide, via a Redis NX
+    key) is let through as a half-open probe: success closes the circuit,
+    failure re-opens it.
+
+    Timeouts follow the provider's rolling p95 latency in this process
+    (times ADAPTIVE_TIMEOUT_MULTIPLIER, clamped between
+    ADAPTIVE_TIMEOUT_MIN_SECONDS and the provider's configured ceiling),
+    so a slow-but-working provider isn't cut off and a hanging one costs
+    far less than its full static timeout.
+
+    Redis errors fail open (the provider is called).
+    """
+
+    def __init__(self):
+        self.redis = get_redis()
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def allow(self, provider: str) -> bool:
+        try:
+            state = self.redis.hgetall(f"circuit:{provider}")
+            if state.get("state", CLOSED) == CLOSED:
+                return True
+
+            if time.time() - float(state.get("opened_at", 0)) < settings.CIRCUIT_OPEN_SECONDS:
+                return False
+
+            # Cooldown over: exactly one half-open probe at a time
+            probe = self.redis.set(
+                f"circuit:{provider}:probe", 1, nx=True,
+                ex=max(int(self.ceiling(provider)) + 5, 10)
+            )
+            if probe:
+                self.redis.hset(f"circuit:{provider}", "state", HALF_OPEN)
+                logger.info("circuit_half_open", provider=provider)
+            return bool(probe)
+
+        except Exception as e:
+            logger.warning("circuit_state_error", provider=provider, error=str(e))
+            return True
+
+    def record_success(self, provider: str, latency: Optional[float] = None):
+        """Close the circuit if needed; latency (if given) feeds the adaptive timeout"""
+        if latency is not None:
+            self._latencies.setdefault(provider, deque(maxlen=settings.ADAPTIVE_TIMEOUT_WINDOW)).append(latency)
+
+        try:
+            key = f"circuit:{provider}"
+            if self.redis.hget(key, "state") in (OPEN, HALF_OPEN):
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.delete(key, f"{key}:failures", f"{key}:probe")
+                pipe.execute()
+                logger.info("circuit_closed", provider=provider)
+        except Exception as e:
+            logger.warning("circuit_state_error", provider=provider, error=str(e))
+
+    def record_failure(self, provider: str):
+        try:
+            key = f"circuit:{provider}"
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hget(key, "state")
+            pipe.incr(f"{key}:failures")
+            pipe.expire(f"{key}:failures", settings.CIRCUIT_FAILURE_WINDOW_SECONDS)
+            state, failures, _ = pipe.execute()
+
+            if state == HALF_OPEN or failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.hset(key, mapping={"state": OPEN, "opened_at": time.time()})
+                pipe.delete(f"{key}:failures", f"{key}:probe")
+                pipe.execute()
+                logger.warning("circuit_opened", provider=provider, failures=failures, was=state or CLOSED)
+
+        except Exception as e:
+            logger.warning("circuit_state_error", provider=provider, error=str(e))
+
+    def release_probe(self, provider: str):
+        """Give the half-open probe back when the call never reached the provider"""
+        try:
+            self.redis.delete(f"circuit:{provider}:probe")
+        except Exception:
+            pass
+
+    def timeout_for(self, provider: str) -> float:
+        ceiling = self.ceiling(provider)
+        latencies = self._latencies.get(provider)
+        if not latencies or len(latencies) < settings.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return ceiling
+
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return min(ceiling, max(settings.ADAPTIVE_TIMEOUT_MIN_SECONDS, p95 * settings.ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def ceiling(self, provider: str) -> float:
+        """Configured timeout for the provider, the adaptive timeout's upper bound"""
+        if provider in settings.PROVIDER_TIMEOUTS:
+            return settings.PROVIDER_TIMEOUTS[provider]
+        if provider in {"smiles", "latam_pass", "tudoazul"}:
+            return settings.MILES_SEARCH_TIMEOUT_SECONDS
+        return settings.PROVIDER_TIMEOUT_SECONDS
+
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Process-wide breaker (circuit state itself lives in Redis)"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
@@ -0,0 +1,276 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+import uuid
+import numpy as np
+import structlog
+
+from config import settings
+
+logger = structlog.get_logger()
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Local, dependency-free text embedder (feature hashing of unigrams and
+    bigrams into a fixed number of signed buckets, L2-normalized).
+
+    Not as good as a learned model, but deterministic, takes microseconds
+    and is plenty for matching policy questions ("posso levar mala?",
+    "cancelamento LATAM") against a small curated knowledge base.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed(self, text_value: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = self._tokenize(text_value)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+
+        # Sublinear term frequency, then unit length for cosine similarity
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.embed(t) for t in texts]).astype(np.float32)
+
+    def _tokenize(self, text_value: str) -> List[str]:
+        normalized = unicodedata.normalize("NFKD", text_value.lower())
+        normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+        return [t for t in TOKEN_PATTERN.findall(normalized) if len(t) > 1]
+
+
+class KnowledgeIndex:
+    """
+    In-process IVF (inverted file) ANN index over knowledge_base snippets.
+
+    Vectors are stored on disk sorted by their coarse cluster and opened
+    with numpy's mmap, so every API worker shares the same pages. A query
+    scores the centroids, then only the KNOWLEDGE_IVF_NPROBE closest
+    clusters. Small knowledge bases use a single cluster (exact search).
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        documents: List[Dict],
+        version: str
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.documents = documents
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query_vector: np.ndarray, top_k: int = 3) -> List[Dict]:
+        if not self.documents:
+            return []
+
+        nprobe = min(settings.KNOWLEDGE_IVF_NPROBE, len(self.centroids))
+        centroid_scores = self.centroids @ query_vector
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidate_rows = np.concatenate([
+            np.arange(self.offsets[c], self.offsets[c + 1]) for c in probe
+        ])
+        if candidate_rows.size == 0:
+            return []
+
+        scores = self.vectors[candidate_rows] @ query_vector
+        k = min(top_k, scores.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        return [
+            {**self.documents[candidate_rows[i]], "score": round(float(scores[i]), 4)}
+            for i in best
+        ]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, documents: List[Dict], version: str) -> "KnowledgeIndex":
+        """Cluster vectors (spherical k-means) and sort them by cluster"""
+        n = len(documents)
+        if n < settings.KNOWLEDGE_IVF_MIN_ROWS:
+            n_lists = 1
+        else:
+            n_lists = max(1, int(np.sqrt(n)))
+
+        if n == 0:
+            return cls(vectors, np.zeros((1, vectors.shape[1]), dtype=np.float32), np.array([0, 0]), [], version)
+
+        centroids, assignment = _spherical_kmeans(vectors, n_lists)
+
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        return cls(
+            vectors[order],
+            centroids,
+            offsets,
+            [documents[i] for i in order],
+            version
+        )
+
+    def save(self, directory: str):
+        """Write the index into a new versioned directory and repoint 'current'"""
+        target = os.path.join(directory, self.version)
+        os.makedirs(target, exist_ok=True)
+
+        np.save(os.path.join(target, "vectors.npy"), np.ascontiguousarray(self.vectors))
+        np.save(os.path.join(target, "centroids.npy"), self.centroids)
+        np.save(os.path.join(target, "offsets.npy"), self.offsets)
+        with open(os.path.join(target, "documents.json"), "w") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+        pointer = os.path.join(directory, "CURRENT")
+        staged = f"{pointer}.{self.version}.tmp"
+        with open(staged, "w") as f:
+            f.write(self.version)
+        os.replace(staged, pointer)
+
+        # Keep the previous version for readers still mapping it
+        versions = sorted(d for d in os.listdir(directory) if d.startswith("v"))
+        for old_version in versions[:-2]:
+            if old_version != self.version:
+                shutil.rmtree(os.path.join(directory, old_version), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["KnowledgeIndex"]:
+        pointer = os.path.join(directory, "CURRENT")
+        if not os.path.exists(pointer):
+            return None
+
+        with open(pointer) as f:
+            version = f.read().strip()
+        source = os.path.join(directory, version)
+
+        with open(os.path.join(source, "documents.json")) as f:
+            documents = json.load(f)
+
+        return cls(
+            np.load(os.path.join(source, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(source, "centroids.npy")),
+            np.load(os.path.join(source, "offsets.npy")),
+            documents,
+            version
+        )
+
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10):
+    if k == 1:
+        centroid = vectors.mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        centroid = centroid / norm if norm else centroid
+        return centroid[np.newaxis, :].astype(np.float32), np.zeros(len(vectors), dtype=np.int64)
+
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[c] = centroid / norm if norm else centroid
+
+    assignment = np.argmax(vectors @ centroids.T, axis=1)
+    return centroids.astype(np.float32), assignment
+
+
+_embedder = HashingEmbedder(settings.KNOWLEDGE_EMBEDDING_DIM)
+
+
+def rebuild_knowledge_index(db: Session) -> KnowledgeIndex:
+    """Re-embed every knowledge_base row and publish a new on-disk index"""
+    rows = db.execute(text("SELECT id, content, metadata FROM knowledge_base ORDER BY id")).fetchall()
+
+    documents = [
+        {"id": row.id, "content": row.content, "metadata": row.metadata or {}}
+        for row in rows
+    ]
+    vectors = _embedder.embed_many([d["content"] for d in documents])
+
+    # Unique even when two rebuilds (e.g. startup warm-up and the beat task)
+    # run in the same second; the nanosecond timestamp keeps names sortable
+    version = f"v{time.time_ns()}_{uuid.uuid4().hex[:8]}"
+    index = KnowledgeIndex.build(vectors, documents, version)
+    index.save(settings.KNOWLEDGE_INDEX_DIR)
+
+    logger.info(
+        "knowledge_index_rebuilt",
+        documents=len(documents),
+        lists=len(index.centroids),
+        version=version
+    )
+    return index
+
+
+class KnowledgeService:
+    """
+    Policy/FAQ retrieval for the agent.
+
+    Searches the memory-mapped index published by rebuild_knowledge_index
+    (run periodically by the Celery worker); the API only re-opens the
+    index when the published version changes, so queries never touch
+    Postgres.
+    """
+
+    _index: Optional[KnowledgeIndex] = None
+    _checked_at: float = 0.0
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+        index = self._get_index()
+        if index is None:
+            return []
+        return index.search(_embedder.embed(query), top_k=top_k)
+
+    @classmethod
+    def _get_index(cls) -> Optional[KnowledgeIndex]:
+        now = time.monotonic()
+        if cls._index is not None and now - cls._checked_at < settings.KNOWLEDGE_INDEX_RELOAD_SECONDS:
+            return cls._index
+
+        cls._checked_at = now
+        try:
+            pointer = os.path.join(settings.KNOWLEDGE_INDEX_DIR, "CURRENT")
+            if not os.path.exists(pointer):
+                return cls._index
+
+            with open(pointer) as f:
+                version = f.read().strip()
+            if cls._index is None or cls._index.version != version:
+                cls._index = KnowledgeIndex.load(settings.KNOWLEDGE_INDEX_DIR)
+                logger.info("knowledge_index_loaded", version=version, documents=len(cls._index))
+
+        except Exception as e:
+            logger.warning("knowledge_index_load_error", error=str(e))
+
+        return cls._index
@@ -0,0 +1,122 @@
+from email.message import EmailMessage
+from typing import Dict, List
+import smtplib
+import httpx
+import structlog
+
+from services.rate_limiter import get_rate_limiter
+from config import settings
+
+logger = structlog.get_logger()
+
+
+# Postmark accepts at most 500 messages per /email/batch call
+POSTMARK_BATCH_LIMIT = 500
+
+# Shared rate-limiter bucket pacing every sender in every worker
+EMAIL_BUCKET = "email"
+
+
+class EmailBatchError(Exception):
+    """A batch send failed part-way; the first `handled` messages were already submitted"""
+
+    def __init__(self, handled: int, error: Exception):
+        super().__init__(f"Email batch failed after {handled} message(s): {error}")
+        self.handled = handled
+        self.error = error
+
+
+class EmailSender:
+    """
+    Rate-limited batch email sender.
+
+    Uses Postmark's batch endpoint when POSTMARK_API_KEY is set, otherwise
+    one SMTP connection to SMTP_HOST for the whole batch (a local debugging
+    SMTP server works for testing, as does pointing POSTMARK_API_URL at a
+    stand-in). Sends are paced to EMAIL_MAX_PER_SECOND through the shared
+    "email" rate-limiter bucket, so overlapping flushes in any number of
+    workers stay under the provider limit together.
+
+    Messages are dicts with "to", "subject" and "text". If a send fails
+    part-way, EmailBatchError says how many messages were already handed
+    to the provider so the caller can retry only the rest.
+    """
+
+    def __init__(self):
+        self.rate_limiter = get_rate_limiter()
+
+    def send_batch(self, messages: List[Dict]) -> int:
+        if not messages:
+            return 0
+
+        if settings.POSTMARK_API_KEY:
+            return self._send_postmark(messages)
+        if settings.SMTP_HOST:
+            return self._send_smtp(messages)
+
+        logger.warning("email_not_configured", messages=len(messages))
+        return 0
+
+    def _send_postmark(self, messages: List[Dict]) -> int:
+        sent = 0
+        with httpx.Client(
+            base_url=settings.POSTMARK_API_URL,
+            headers={
+                "X-Postmark-Server-Token": settings.POSTMARK_API_KEY,
+                "Accept": "application/json"
+            },
+            timeout=30
+        ) as client:
+            for i in range(0, len(messages), POSTMARK_BATCH_LIMIT):
+                chunk = messages[i:i + POSTMARK_BATCH_LIMIT]
+
+                try:
+                    self._throttle(len(chunk))
+                    response = client.post("/email/batch", json=[
+                        {
+                            "From": settings.EMAIL_FROM,
+                            "To": message["to"],
+                            "Subject": message["subject"],
+                            "TextBody": message["text"],
+                            "MessageStream": "outbound"
+                        }
+                        for message in chunk
+                    ])
+                    response.raise_for_status()
+                except Exception as e:
+                    raise EmailBatchError(i, e) from e
+
+                # Per-message results; ErrorCode 0 means accepted
+                sent += sum(1 for result in response.json() if result.get("ErrorCode") == 0)
+
+        logger.info("email_batch_sent", transport="postmark", sent=sent, total=len(messages))
+        return sent
+
+    def _send_smtp(self, messages: List[Dict]) -> int:
+        sent = 0
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30) as smtp:
+            for i, message in enumerate(messages):
+                try:
+                    self._throttle(1)
+                except Exception as e:
+                    raise EmailBatchError(i, e) from e
+
+                email = EmailMessage()
+                email["From"] = settings.EMAIL_FROM
+                email["To"] = message["to"]
+                email["Subject"] = message["subject"]
+                email.set_content(message["text"])
+
+                try:
+                    smtp.send_message(email)
+                    sent += 1
+                except smtplib.SMTPException as e:
+                    logger.warning("email_send_error", to=message["to"], error=str(e))
+
+        logger.info("email_batch_sent", transport="smtp", sent=sent, total=len(messages))
+        return sent
+
+    def _throttle(self, count: int):
+        # One token per message; a whole Postmark chunk waits for all of its tokens
+        for _ in range(count):
+            self.rate_limiter.acquire_blocking(EMAIL_BUCKET, max_wait=settings.EMAIL_RATE_LIMIT_MAX_WAIT_SECONDS)
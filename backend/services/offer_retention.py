@@ -0,0 +1,312 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import time
+import structlog
+
+from config import settings
+
+logger = structlog.get_logger()
+
+
+PARTITION_PREFIX = "offers_p"
+DEFAULT_PARTITION = "offers_default"
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _partition_name(week_start: date) -> str:
+    return f"{PARTITION_PREFIX}{week_start:%Y%m%d}"
+
+
+def partition_horizon(today: Optional[date] = None) -> date:
+    """
+    First out_date not guaranteed to have a partition. offers has no
+    DEFAULT partition (it would rule out DETACH ... CONCURRENTLY), so rows
+    past this are not stored; the week partitions already reach further
+    than airlines sell.
+    """
+    return _week_start(today or date.today()) + timedelta(weeks=settings.OFFER_PARTITION_WEEKS_AHEAD)
+
+
+def _partition_week(name: str) -> Optional[date]:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class OfferRetention:
+    """
+    Keeps the offers table small without long locks.
+
+    offers is range-partitioned by out_date week (infra/init.sql). Each run:
+    1. creates the weekly partitions OFFER_PARTITION_WEEKS_AHEAD ahead;
+    2. retires a legacy DEFAULT partition (older schemas), moving its rows
+       into their week first;
+    3. detaches (CONCURRENTLY, so searches keep reading and writing
+       offers) and drops weeks that departed more than
+       OFFER_PARTITION_RETENTION_WEEKS ago, finishing detaches an earlier
+       run was interrupted in;
+    4. deletes the remaining expired rows partition by partition in
+       ctid batches of OFFER_CLEANUP_BATCH_SIZE, one short transaction each.
+
+    Other DDL runs with a lock_timeout and batches skip rows locked by the
+    search path's upserts, so writers are never queued behind cleanup;
+    whatever is skipped is picked up by the next run.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def run(self) -> Dict:
+        started = time.monotonic()
+        deadline = started + settings.OFFER_CLEANUP_MAX_SECONDS
+
+        created = self.ensure_partitions()
+        self.retire_default_partition()
+        dropped, rows_dropped = self.drop_old_partitions()
+        deleted, batches, complete = self.delete_expired(deadline)
+
+        stats = {
+            "partitions_created": created,
+            "partitions_dropped": dropped,
+            "rows_dropped": rows_dropped,
+            "rows_deleted": deleted,
+            "batches": batches,
+            "complete": complete,
+            "duration_seconds": round(time.monotonic() - started, 2)
+        }
+        logger.info("offer_cleanup_complete", **stats)
+        return stats
+
+    def list_partitions(self, detach_pending: bool = False) -> List[str]:
+        """Attached partitions, or those left half-detached by an interrupted DETACH CONCURRENTLY"""
+        rows = self.db.execute(text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'offers'::regclass AND i.inhdetachpending = :pending
+            ORDER BY c.relname
+        """), {"pending": detach_pending}).fetchall()
+        self.db.commit()
+        return [row.relname for row in rows]
+
+    def ensure_partitions(self) -> int:
+        existing = set(self.list_partitions())
+        has_default = DEFAULT_PARTITION in existing
+        first_week = _week_start(date.today())
+        created = 0
+
+        for i in range(settings.OFFER_PARTITION_WEEKS_AHEAD + 1):
+            week = first_week + timedelta(weeks=i)
+            name = _partition_name(week)
+            if name in existing:
+                continue
+
+            bounds = f"FOR VALUES FROM ('{week.isoformat()}') TO ('{(week + timedelta(weeks=1)).isoformat()}')"
+            if has_default:
+                # A DEFAULT partition may already hold rows of this week,
+                # which would make CREATE ... PARTITION OF fail
+                ok = self._attach_from_default(name, week, bounds)
+            else:
+                ok = self._run_ddl(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF offers {bounds}',
+                    "offer_partition_create_failed",
+                    partition=name
+                )
+            if ok:
+                created += 1
+
+        return created
+
+    def retire_default_partition(self) -> bool:
+        """
+        Drop the DEFAULT partition of older schemas, which rules out
+        DETACH ... CONCURRENTLY. Departed rows in it are deleted and the
+        rest were moved to their week by ensure_partitions; rows beyond
+        the partition horizon keep it attached and are reported.
+        """
+        if DEFAULT_PARTITION not in self.list_partitions():
+            return False
+
+        try:
+            self.db.execute(
+                text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE out_date < :first_week'),
+                {"first_week": _week_start(date.today())}
+            )
+            remaining = self.db.execute(text(f'SELECT count(*) FROM "{DEFAULT_PARTITION}"')).scalar()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("offer_default_partition_check_failed", error=str(e))
+            return False
+
+        if remaining:
+            logger.error(
+                "offer_default_partition_not_empty",
+                rows=remaining,
+                horizon=partition_horizon().isoformat()
+            )
+            return False
+
+        retired = self._run_ddl(
+            f'ALTER TABLE offers DETACH PARTITION "{DEFAULT_PARTITION}"',
+            "offer_default_partition_retire_failed",
+            partition=DEFAULT_PARTITION,
+            then=f'DROP TABLE "{DEFAULT_PARTITION}"'
+        )
+        if retired:
+            logger.info("offer_default_partition_retired")
+        return retired
+
+    def drop_old_partitions(self):
+        cutoff = _week_start(date.today()) - timedelta(weeks=settings.OFFER_PARTITION_RETENTION_WEEKS)
+        dropped = 0
+        rows_dropped = 0
+
+        partitions = self.list_partitions()
+        if DEFAULT_PARTITION in partitions:
+            # Postgres refuses DETACH ... CONCURRENTLY while a DEFAULT
+            # partition exists (see retire_default_partition)
+            logger.warning("offer_partition_drop_skipped", reason="default partition attached")
+            return 0, 0
+
+        # An interrupted DETACH CONCURRENTLY leaves the partition pending
+        for name in self.list_partitions(detach_pending=True):
+            if self._run_autocommit(
+                [f'ALTER TABLE offers DETACH PARTITION "{name}" FINALIZE', f'DROP TABLE "{name}"'],
+                "offer_partition_drop_failed",
+                partition=name
+            ):
+                dropped += 1
+                logger.info("offer_partition_dropped", partition=name, finalized=True)
+
+        for name in partitions:
+            week = _partition_week(name)
+            if week is None or week >= cutoff:
+                continue
+
+            # Planner estimate; good enough for progress metrics
+            rows = self.db.execute(
+                text("SELECT reltuples::bigint AS n FROM pg_class WHERE relname = :name"),
+                {"name": name}
+            ).scalar() or 0
+            self.db.commit()
+
+            # Only SHARE UPDATE EXCLUSIVE on offers: searches aren't blocked
+            if self._run_autocommit(
+                [f'ALTER TABLE offers DETACH PARTITION "{name}" CONCURRENTLY', f'DROP TABLE "{name}"'],
+                "offer_partition_drop_failed",
+                partition=name
+            ):
+                dropped += 1
+                rows_dropped += max(rows, 0)
+                logger.info("offer_partition_dropped", partition=name, rows=rows)
+
+        return dropped, rows_dropped
+
+    def delete_expired(self, deadline: float):
+        deleted = 0
+        batches = 0
+        batch_size = settings.OFFER_CLEANUP_BATCH_SIZE
+
+        for name in self.list_partitions():
+            partition_deleted = 0
+
+            while True:
+                if time.monotonic() > deadline:
+                    logger.info("offer_cleanup_budget_exhausted", deleted=deleted, batches=batches, partition=name)
+                    return deleted, batches, False
+
+                try:
+                    # TID scan over a bounded, already-locked set of rows
+                    result = self.db.execute(text(f"""
+                        DELETE FROM "{name}"
+                        WHERE ctid = ANY(ARRAY(
+                            SELECT ctid FROM "{name}"
+                            WHERE expires_at < NOW()
+                            LIMIT :batch_size
+                            FOR UPDATE SKIP LOCKED
+                        ))
+                    """), {"batch_size": batch_size})
+                    self.db.commit()
+                except Exception as e:
+                    self.db.rollback()
+                    logger.warning("offer_cleanup_batch_error", partition=name, error=str(e))
+                    break
+
+                batches += 1
+                partition_deleted += result.rowcount
+                deleted += result.rowcount
+
+                if result.rowcount < batch_size:
+                    break
+                time.sleep(settings.OFFER_CLEANUP_BATCH_PAUSE_SECONDS)
+
+            if partition_deleted:
+                logger.info(
+                    "offer_cleanup_progress",
+                    partition=name,
+                    partition_deleted=partition_deleted,
+                    deleted=deleted,
+                    batches=batches
+                )
+
+        return deleted, batches, True
+
+    def _attach_from_default(self, name: str, week: date, bounds: str) -> bool:
+        """Create a week's partition from rows already in the DEFAULT partition, in one transaction"""
+        next_week = week + timedelta(weeks=1)
+        try:
+            self.db.execute(text(f"SET LOCAL lock_timeout = {int(settings.OFFER_CLEANUP_LOCK_TIMEOUT_MS)}"))
+            self.db.execute(text(f'CREATE TABLE "{name}" (LIKE offers INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+            moved = self.db.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM "{DEFAULT_PARTITION}"
+                    WHERE out_date >= :week AND out_date < :next_week
+                    RETURNING *
+                )
+                INSERT INTO "{name}" SELECT * FROM moved
+            """), {"week": week, "next_week": next_week}).rowcount
+            self.db.execute(text(f'ALTER TABLE offers ATTACH PARTITION "{name}" {bounds}'))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("offer_partition_create_failed", partition=name, error=str(e))
+            return False
+
+        if moved:
+            logger.info("offer_partition_rows_moved_from_default", partition=name, rows=moved)
+        return True
+
+    def _run_autocommit(self, statements: List[str], error_event: str, **log_fields) -> bool:
+        """Run statements outside a transaction block (required by DETACH ... CONCURRENTLY)"""
+        try:
+            with self.db.get_bind().connect() as conn:
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                for statement in statements:
+                    conn.execute(text(statement))
+            return True
+        except Exception as e:
+            logger.warning(error_event, error=str(e), **log_fields)
+            return False
+
+    def _run_ddl(self, statement: str, error_event: str, then: Optional[str] = None, **log_fields) -> bool:
+        """Run DDL with a lock_timeout so it gives up instead of blocking writers"""
+        try:
+            self.db.execute(text(f"SET LOCAL lock_timeout = {int(settings.OFFER_CLEANUP_LOCK_TIMEOUT_MS)}"))
+            self.db.execute(text(statement))
+            if then:
+                self.db.execute(text(then))
+            self.db.commit()
+            return True
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(error_event, error=str(e), **log_fields)
+            return False
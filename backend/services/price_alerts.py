@@ -0,0 +1,400 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import json
+import threading
+import time
+import structlog
+
+from schemas.flight import Offer, OfferType
+from database.db import get_redis
+from services.notifications import EmailSender, EmailBatchError
+from config import settings
+
+logger = structlog.get_logger()
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed [start, end] intervals.
+
+    stab(point) returns every item whose interval contains point in
+    O(log n + matches), instead of scanning all intervals.
+    """
+
+    def __init__(self, intervals: List[Tuple[date, date, Dict]]):
+        self.center = None
+        self.left = None
+        self.right = None
+        self.by_start: List[Tuple[date, date, Dict]] = []
+        self.by_end: List[Tuple[date, date, Dict]] = []
+
+        if not intervals:
+            return
+
+        starts = sorted(start for start, _, _ in intervals)
+        self.center = starts[len(starts) // 2]
+
+        left, right, overlap = [], [], []
+        for interval in intervals:
+            start, end, _ = interval
+            if end < self.center:
+                left.append(interval)
+            elif start > self.center:
+                right.append(interval)
+            else:
+                overlap.append(interval)
+
+        self.by_start = sorted(overlap, key=lambda i: i[0])
+        self.by_end = sorted(overlap, key=lambda i: i[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point: date) -> List[Dict]:
+        found = []
+        node = self
+        while node is not None and node.center is not None:
+            if point < node.center:
+                for start, _, item in node.by_start:
+                    if start > point:
+                        break
+                    found.append(item)
+                node = node.left
+            elif point > node.center:
+                for _, end, item in node.by_end:
+                    if end < point:
+                        break
+                    found.append(item)
+                node = node.right
+            else:
+                found.extend(item for _, _, item in node.by_start)
+                break
+        return found
+
+
+class PriceAlertIndex:
+    """Active alerts grouped by (origin, destination), each with an interval tree over out_date"""
+
+    def __init__(self, alerts: List[Dict]):
+        routes: Dict[Tuple[str, str], List[Tuple[date, date, Dict]]] = {}
+        for alert in alerts:
+            for origin, destination in self._airport_pairs(alert["origin"], alert["destination"]):
+                routes.setdefault((origin, destination), []).append(
+                    (alert["out_date_start"], alert["out_date_end"], alert)
+                )
+
+        self.routes = {route: IntervalTree(intervals) for route, intervals in routes.items()}
+        self.size = len(alerts)
+
+    @classmethod
+    def from_db(cls, db: Session) -> "PriceAlertIndex":
+        rows = db.execute(text("""
+            SELECT id, user_id, origin, destination,
+                   out_date_start, out_date_end, ret_date_start, ret_date_end,
+                   max_price_cents, max_miles
+            FROM price_alerts
+            WHERE active = true AND out_date_end >= CURRENT_DATE
+        """)).fetchall()
+        return cls([dict(row._mapping) for row in rows])
+
+    def candidates(self, origin: str, destination: str, out_date: date) -> List[Dict]:
+        tree = self.routes.get((origin, destination))
+        return tree.stab(out_date) if tree else []
+
+    def _airport_pairs(self, origin: str, destination: str) -> List[Tuple[str, str]]:
+        # Alerts may be set on metro codes (SAO, RIO); offers carry airports
+        from services.airport_resolver import get_airport_resolver
+
+        try:
+            resolver = get_airport_resolver()
+            origins = resolver.expand(origin)
+            destinations = resolver.expand(destination)
+        except Exception:
+            origins, destinations = [origin], [destination]
+
+        return [(o, d) for o in origins for d in destinations if o != d]
+
+
+def alert_matches(alert: Dict, offer: Offer) -> bool:
+    """Return-date window and price ceiling check for an out_date candidate"""
+    if alert["ret_date_start"] or alert["ret_date_end"]:
+        if not offer.ret_date:
+            return False
+        if alert["ret_date_start"] and offer.ret_date < alert["ret_date_start"]:
+            return False
+        if alert["ret_date_end"] and offer.ret_date > alert["ret_date_end"]:
+            return False
+
+    max_price = alert["max_price_cents"]
+    max_miles = alert["max_miles"]
+    if max_price is None and max_miles is None:
+        return True
+
+    if offer.offer_type == OfferType.CASH and offer.cash:
+        return max_price is not None and offer.cash.amount_cents <= max_price
+    if offer.offer_type == OfferType.MILES and offer.miles:
+        return max_miles is not None and offer.miles.points <= max_miles
+    return False
+
+
+class PriceAlertMatcher:
+    """
+    Incremental alert matching over each batch of stored offers.
+
+    The index of active alerts is shared by the process. Once it is older
+    than PRICE_ALERT_INDEX_RELOAD_SECONDS a background thread rebuilds it
+    with its own session and swaps it in, so no search's write path pays
+    for the table scan; the old index keeps serving meanwhile (and nothing
+    matches before the first build). Each offer costs one dict lookup and
+    one interval-tree stab, so matching scales with new offers rather than
+    alerts x offers. A match is buffered once per alert, offer and price
+    within PRICE_ALERT_DEDUPE_HOURS, since the same offers are re-stored
+    by every search of their route.
+    """
+
+    _index: Optional[PriceAlertIndex] = None
+    _loaded_at: float = 0.0
+    _reloading = threading.Lock()
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.redis = get_redis()
+
+    def match(self, offers: List[Offer]) -> List[Tuple[Dict, Offer]]:
+        index = self._get_index()
+        if index is None or not index.routes:
+            return []
+
+        matches = []
+        for offer in offers:
+            candidates = index.candidates(
+                offer.segments[0].origin,
+                offer.segments[-1].destination,
+                offer.out_date
+            )
+            matches.extend((alert, offer) for alert in candidates if alert_matches(alert, offer))
+
+        return matches
+
+    def notify(self, offers: List[Offer]) -> int:
+        """Match a freshly stored batch and buffer new matches for the user digests"""
+        if not offers:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            matches = self.match(offers)
+            new_matches = self._dedupe(matches)
+            buffer_digest_matches(self.redis, new_matches)
+
+            logger.info(
+                "price_alerts_matched",
+                offers=len(offers),
+                matches=len(matches),
+                buffered=len(new_matches),
+                duration_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+            return len(new_matches)
+
+        except Exception as e:
+            logger.warning("price_alert_match_error", error=str(e))
+            return 0
+
+    def _dedupe(self, matches: List[Tuple[Dict, Offer]]) -> List[Tuple[Dict, Offer]]:
+        if not matches:
+            return []
+
+        ttl = settings.PRICE_ALERT_DEDUPE_HOURS * 3600
+        pipe = self.redis.pipeline(transaction=False)
+        for alert, offer in matches:
+            # Keyed on price too, so a further drop on the same offer notifies again
+            price = offer.cash.amount_cents if offer.cash else offer.miles.points
+            pipe.set(f"price_alert_sent:{alert['id']}:{offer.id}:{price}", 1, ex=ttl, nx=True)
+
+        return [match for match, is_new in zip(matches, pipe.execute()) if is_new]
+
+    @classmethod
+    def warm(cls):
+        """Start building the index (application startup), unless a build is running"""
+        if cls._reloading.acquire(blocking=False):
+            threading.Thread(target=cls._reload, name="price-alert-index-reload", daemon=True).start()
+
+    def _get_index(self) -> Optional[PriceAlertIndex]:
+        cls = type(self)
+        if time.monotonic() - cls._loaded_at >= settings.PRICE_ALERT_INDEX_RELOAD_SECONDS:
+            cls.warm()
+        return cls._index
+
+    @classmethod
+    def _reload(cls):
+        from database.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            index = PriceAlertIndex.from_db(db)
+            cls._index = index
+            logger.info("price_alert_index_loaded", alerts=index.size, routes=len(index.routes))
+        except Exception as e:
+            logger.warning("price_alert_index_load_error", error=str(e))
+        finally:
+            db.close()
+            # Also after a failure, so a down database isn't retried per search
+            cls._loaded_at = time.monotonic()
+            cls._reloading.release()
+
+
+DIGEST_KEY_PREFIX = "price_alert_digest"
+DIGEST_DUE_KEY = "price_alert_digest_due"
+
+
+def _offer_price(offer: Offer) -> Tuple[int, str]:
+    """Sort key and display label for an offer's price"""
+    if offer.cash:
+        return offer.cash.amount_cents, f"{offer.cash.currency} {offer.cash.amount_cents / 100:.2f}"
+    return offer.miles.points, f"{offer.miles.points} milhas {offer.miles.program.value} + R$ {offer.miles.taxes_cents / 100:.2f}"
+
+
+def buffer_digest_matches(redis, matches: List[Tuple[Dict, Offer]]):
+    """
+    Add matches to each user's pending digest.
+
+    Entries are hash fields keyed by offer id, so an offer matched by
+    several alerts (or re-matched within the window) is listed once. The
+    first match schedules the user's digest PRICE_ALERT_DIGEST_WINDOW_MINUTES
+    later; later matches join it.
+    """
+    if not matches:
+        return
+
+    due_at = time.time() + settings.PRICE_ALERT_DIGEST_WINDOW_MINUTES * 60
+    pipe = redis.pipeline(transaction=False)
+    for alert, offer in matches:
+        price, label = _offer_price(offer)
+        pipe.hset(f"{DIGEST_KEY_PREFIX}:{alert['user_id']}", offer.id, json.dumps({
+            "alert_id": alert["id"],
+            "origin": offer.segments[0].origin,
+            "destination": offer.segments[-1].destination,
+            "out_date": offer.out_date.isoformat(),
+            "ret_date": offer.ret_date.isoformat() if offer.ret_date else None,
+            "source": offer.source,
+            "offer_type": offer.offer_type.value,
+            "price": price,
+            "price_label": label
+        }))
+        pipe.zadd(DIGEST_DUE_KEY, {str(alert["user_id"]): due_at}, nx=True)
+    pipe.execute()
+
+
+class PriceAlertDigester:
+    """
+    Sends one email per user with every offer matched in their window.
+
+    Run periodically by the Celery worker. Due users are taken atomically
+    from Redis, so a fare drop that matches thousands of alerts turns
+    into at most one digest per user instead of one task and one email
+    per alert and offer.
+    """
+
+    def __init__(self, db: Session, sender=None):
+        self.db = db
+        self.redis = get_redis()
+        self.sender = sender or EmailSender()
+
+    def flush(self) -> Dict:
+        pending = self._take_due_digests()
+        if not pending:
+            return {"users": 0, "offers": 0, "sent": 0}
+
+        rows = self.db.execute(
+            text("SELECT id, email, name FROM users WHERE id = ANY(:ids)"),
+            {"ids": list(pending.keys())}
+        ).fetchall()
+        users = {row.id: row for row in rows}
+
+        messages = []
+        recipients = []
+        for user_id, entries in pending.items():
+            user = users.get(user_id)
+            if user and user.email:
+                messages.append(self._build_message(user, entries))
+                recipients.append(user_id)
+
+        try:
+            sent = self.sender.send_batch(messages)
+        except Exception as e:
+            # Put back only the digests the provider never got, so users
+            # already emailed don't get the same digest on the next flush
+            handled = e.handled if isinstance(e, EmailBatchError) else 0
+            unsent = {user_id: pending[user_id] for user_id in recipients[handled:]}
+            logger.error(
+                "price_alert_digest_send_error",
+                error=str(e),
+                users=len(messages),
+                handled=handled,
+                requeued=len(unsent)
+            )
+            self._requeue(unsent)
+            raise
+
+        stats = {
+            "users": len(pending),
+            "offers": sum(len(entries) for entries in pending.values()),
+            "sent": sent
+        }
+        logger.info("price_alert_digests_sent", **stats)
+        return stats
+
+    def _take_due_digests(self) -> Dict[int, List[Dict]]:
+        user_ids = self.redis.zrangebyscore(
+            DIGEST_DUE_KEY, 0, time.time(),
+            start=0, num=settings.PRICE_ALERT_DIGEST_USERS_PER_FLUSH
+        )
+        if not user_ids:
+            return {}
+
+        # Read and clear in one transaction so matches buffered meanwhile
+        # start a new digest instead of being lost
+        pipe = self.redis.pipeline(transaction=True)
+        for user_id in user_ids:
+            key = f"{DIGEST_KEY_PREFIX}:{user_id}"
+            pipe.hgetall(key)
+            pipe.delete(key)
+        pipe.zrem(DIGEST_DUE_KEY, *user_ids)
+        results = pipe.execute()
+
+        pending = {}
+        for user_id, entries in zip(user_ids, results[0:-1:2]):
+            if entries:
+                pending[int(user_id)] = [
+                    {"offer_id": offer_id, **json.loads(value)}
+                    for offer_id, value in entries.items()
+                ]
+        return pending
+
+    def _requeue(self, pending: Dict[int, List[Dict]]):
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id, entries in pending.items():
+            for entry in entries:
+                entry = dict(entry)
+                offer_id = entry.pop("offer_id")
+                pipe.hsetnx(f"{DIGEST_KEY_PREFIX}:{user_id}", offer_id, json.dumps(entry))
+            pipe.zadd(DIGEST_DUE_KEY, {str(user_id): time.time()}, nx=True)
+        pipe.execute()
+
+    def _build_message(self, user, entries: List[Dict]) -> Dict:
+        entries = sorted(entries, key=lambda e: (e["offer_type"], e["price"]))
+        shown = entries[:settings.PRICE_ALERT_DIGEST_MAX_OFFERS]
+
+        lines = [f"Olá{', ' + user.name if user.name else ''}!", "", "Encontramos ofertas para os seus alertas de preço:", ""]
+        for entry in shown:
+            dates = entry["out_date"] + (f" - {entry['ret_date']}" if entry["ret_date"] else "")
+            lines.append(f"- {entry['origin']} -> {entry['destination']} ({dates}): {entry['price_label']} via {entry['source']}")
+        if len(entries) > len(shown):
+            lines.append(f"... e mais {len(entries) - len(shown)} ofertas.")
+
+        return {
+            "to": user.email,
+            "subject": f"Alerta de preço: {len(entries)} oferta(s) encontrada(s)",
+            "text": "\n".join(lines)
+        }
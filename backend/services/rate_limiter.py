@@ -0,0 +1,176 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+import redis
+import structlog
+
+from database.db import get_redis
+from config import settings
+
+logger = structlog.get_logger()
+
+
+# Refill, then take `requested` tokens if available. Uses the Redis clock so
+# every API replica and Celery worker shares one consistent bucket.
+# Returns {allowed, ms_until_enough_tokens}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local allowed = 0
+local wait_ms = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    wait_ms = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, wait_ms}
+"""
+
+# Buckets for the loyalty-program sites; everything else is a paid API
+SCRAPER_BUCKETS = {"smiles", "latam_pass", "tudoazul"}
+
+# "warm:<bucket>" is the route warmer's own, smaller budget for <bucket>,
+# so background refreshes never take the tokens interactive searches wait for
+WARM_BUCKET_PREFIX = "warm:"
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token could not be obtained before the deadline"""
+
+    def __init__(self, bucket: str, waited: float):
+        super().__init__(f"Rate limit for '{bucket}' not available after {waited:.1f}s")
+        self.bucket = bucket
+        self.waited = waited
+
+
+class RateLimiter:
+    """
+    Distributed token-bucket limiter with named buckets.
+
+    Each bucket refills at per_minute / 60 tokens per second and holds up
+    to burst tokens. Buckets default to SCRAPING_RATE_LIMIT_PER_MINUTE for
+    the loyalty scrapers, EMAIL_MAX_PER_SECOND for the "email" bucket,
+    WARMER_RATE_LIMIT_SHARE of the base bucket for "warm:" buckets and
+    PROVIDER_RATE_LIMIT_PER_MINUTE for paid APIs, with per-bucket
+    overrides in RATE_LIMIT_BUCKETS. Callers wait (async or blocking)
+    until a token is available or their deadline passes; waits and
+    timeouts are logged (rate_limit_waited / rate_limit_timeout) for the
+    log pipeline to aggregate across processes.
+
+    Redis errors fail open, like the circuit breakers: the bucket is
+    enforced by a per-process fallback bucket with the same rate until
+    Redis answers again, and only RateLimitExceeded means "don't call".
+    """
+
+    def __init__(self):
+        self.redis = get_redis()
+        self._script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+        # bucket -> (tokens, monotonic ts), used only while Redis is down
+        self._local: Dict[str, Tuple[float, float]] = {}
+        self._unavailable_logged_at = 0.0
+
+    def bucket_config(self, bucket: str) -> Tuple[float, float]:
+        """(tokens per second, burst capacity) for a bucket"""
+        override = settings.RATE_LIMIT_BUCKETS.get(bucket, {})
+        if bucket.startswith(WARM_BUCKET_PREFIX):
+            base_rate, _ = self.bucket_config(bucket[len(WARM_BUCKET_PREFIX):])
+            default_per_minute = base_rate * 60 * settings.WARMER_RATE_LIMIT_SHARE
+        elif bucket in SCRAPER_BUCKETS:
+            default_per_minute = settings.SCRAPING_RATE_LIMIT_PER_MINUTE
+        elif bucket == "email":
+            default_per_minute = settings.EMAIL_MAX_PER_SECOND * 60
+        else:
+            default_per_minute = settings.PROVIDER_RATE_LIMIT_PER_MINUTE
+        per_minute = float(override.get("per_minute", default_per_minute))
+        burst = float(override.get("burst", settings.RATE_LIMIT_DEFAULT_BURST))
+        return per_minute / 60, max(burst, 1.0)
+
+    def try_acquire(self, bucket: str, tokens: int = 1) -> float:
+        """Take tokens if available; returns 0 on success, else seconds to wait"""
+        rate, capacity = self.bucket_config(bucket)
+        try:
+            allowed, wait_ms = self._script(keys=[f"ratelimit:{bucket}"], args=[rate, capacity, tokens])
+        except redis.RedisError as e:
+            return self._try_acquire_local(bucket, rate, capacity, tokens, e)
+        return 0.0 if allowed else wait_ms / 1000
+
+    def _try_acquire_local(self, bucket: str, rate: float, capacity: float, tokens: int, error: Exception) -> float:
+        """Same token bucket, in this process only"""
+        now = time.monotonic()
+        if now - self._unavailable_logged_at > 10:
+            self._unavailable_logged_at = now
+            logger.warning("rate_limit_redis_unavailable", bucket=bucket, error=str(error))
+
+        available, ts = self._local.get(bucket, (capacity, now))
+        available = min(capacity, available + (now - ts) * rate)
+        if available >= tokens:
+            self._local[bucket] = (available - tokens, now)
+            return 0.0
+        self._local[bucket] = (available, now)
+        return (tokens - available) / rate
+
+    async def acquire(self, bucket: str, max_wait: Optional[float] = None, trace_id: Optional[str] = None):
+        """Wait asynchronously for a token, up to max_wait seconds"""
+        started = time.monotonic()
+        deadline = started + (settings.RATE_LIMIT_MAX_WAIT_SECONDS if max_wait is None else max_wait)
+
+        while True:
+            wait = self.try_acquire(bucket)
+            if not wait:
+                self._record(bucket, time.monotonic() - started, trace_id)
+                return
+            if time.monotonic() + wait > deadline:
+                self._timeout(bucket, time.monotonic() - started, trace_id)
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, bucket: str, max_wait: Optional[float] = None, trace_id: Optional[str] = None):
+        """Blocking variant for Celery tasks"""
+        started = time.monotonic()
+        deadline = started + (settings.RATE_LIMIT_MAX_WAIT_SECONDS if max_wait is None else max_wait)
+
+        while True:
+            wait = self.try_acquire(bucket)
+            if not wait:
+                self._record(bucket, time.monotonic() - started, trace_id)
+                return
+            if time.monotonic() + wait > deadline:
+                self._timeout(bucket, time.monotonic() - started, trace_id)
+            time.sleep(wait)
+
+    def _record(self, bucket: str, waited: float, trace_id: Optional[str]):
+        if waited > 0.001:
+            logger.info("rate_limit_waited", bucket=bucket, waited_ms=round(waited * 1000, 1), trace_id=trace_id)
+
+    def _timeout(self, bucket: str, waited: float, trace_id: Optional[str]):
+        logger.warning("rate_limit_timeout", bucket=bucket, waited_ms=round(waited * 1000, 1), trace_id=trace_id)
+        raise RateLimitExceeded(bucket, waited)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter (the buckets themselves live in Redis)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,189 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import random
+import threading
+import time
+import structlog
+
+from schemas.flight import SearchParams, Offer, MilesProgram
+from config import settings
+
+logger = structlog.get_logger()
+
+
+LOYALTY_PROGRAMS = {program.value for program in MilesProgram}
+
+
+class RouteCapabilityIndex:
+    """
+    Which providers can answer which airport pair.
+
+    Built from the offers table, two kinds of evidence per route:
+    - observed: providers (offer source) that returned offers for it;
+    - network: carriers seen flying it, from any source, matched against
+      each loyalty program's carriers (ROUTE_CAPABILITY_PROGRAM_CARRIERS).
+
+    Absence of offers is never taken as proof (it may only mean a sold-out
+    date), so a route nobody has searched yet goes to every provider and
+    the results teach the index. A program ruled out only by carriers is
+    still asked ROUTE_CAPABILITY_EXPLORE_RATE of the time, so an incomplete
+    carrier list can't exclude it for good.
+    """
+
+    def __init__(self, rows: List[Dict], countries: Dict[str, str]):
+        self.observed: Dict[Tuple[str, str], Set[str]] = {}
+        self.carriers: Dict[Tuple[str, str], Set[str]] = {}
+        self.countries = countries
+
+        for row in rows:
+            route = (row["origin"], row["destination"])
+            self.observed.setdefault(route, set()).add(row["source"])
+            self.carriers.setdefault(route, set()).update(c for c in row["carriers"] or [] if c)
+
+    @classmethod
+    def from_db(cls, db: Session) -> "RouteCapabilityIndex":
+        rows = db.execute(text("""
+            SELECT o.origin, o.destination, o.source,
+                   array_agg(DISTINCT segment->>'carrier') AS carriers
+            FROM offers o, jsonb_array_elements(o.segments) AS segment
+            WHERE o.created_at > NOW() - make_interval(days => :days)
+            GROUP BY o.origin, o.destination, o.source
+        """), {"days": settings.ROUTE_CAPABILITY_LOOKBACK_DAYS}).fetchall()
+
+        countries = db.execute(text("SELECT iata, country FROM airports")).fetchall()
+
+        return cls(
+            [dict(row._mapping) for row in rows],
+            {row.iata: row.country for row in countries}
+        )
+
+    def observe(self, provider: str, origin: str, destination: str, carriers: Iterable[str]):
+        """Record a non-empty live result right away (other processes see it on reload)"""
+        route = (origin, destination)
+        self.observed.setdefault(route, set()).add(provider)
+        self.carriers.setdefault(route, set()).update(carriers)
+
+    def can_serve(self, provider: str, origin: str, destination: str) -> bool:
+        route = (origin, destination)
+        if provider in self.observed.get(route, ()):
+            return True
+
+        if provider in settings.ROUTE_CAPABILITY_DOMESTIC_ONLY and self._is_international(origin, destination):
+            return False
+
+        program_carriers = settings.ROUTE_CAPABILITY_PROGRAM_CARRIERS.get(provider)
+        route_carriers = self.carriers.get(route)
+        if program_carriers and route_carriers and route_carriers.isdisjoint(program_carriers):
+            return random.random() < settings.ROUTE_CAPABILITY_EXPLORE_RATE
+
+        # No evidence either way: ask
+        return True
+
+    def _is_international(self, origin: str, destination: str) -> bool:
+        origin_country = self.countries.get(origin)
+        destination_country = self.countries.get(destination)
+        return bool(origin_country and destination_country and origin_country != destination_country)
+
+
+class ProviderDispatcher:
+    """
+    Prunes the provider fan-out of a search to the providers that can
+    answer its route (RouteCapabilityIndex) and, for loyalty programs, to
+    SearchParams.preferred_programs when given.
+
+    The index is shared by the process. Once it is older than
+    ROUTE_CAPABILITY_RELOAD_SECONDS a background thread rebuilds it with
+    its own session and swaps it in, so searches never wait on the
+    offers aggregate; until the first build finishes nothing is pruned
+    except by preferred_programs. Lookups are in-memory set checks.
+    """
+
+    _index: Optional[RouteCapabilityIndex] = None
+    _loaded_at: float = 0.0
+    _reloading = threading.Lock()
+
+    def providers_for(
+        self,
+        origin: str,
+        destination: str,
+        providers: List[str],
+        preferred_programs: Optional[List[MilesProgram]] = None,
+        trace_id: Optional[str] = None
+    ) -> List[str]:
+        candidates = providers
+        if preferred_programs:
+            preferred = {program.value for program in preferred_programs}
+            candidates = [p for p in candidates if p not in LOYALTY_PROGRAMS or p in preferred]
+
+        index = self._get_index()
+        if index is not None:
+            pairs = self._airport_pairs(origin, destination)
+            candidates = [
+                p for p in candidates
+                if any(index.can_serve(p, o, d) for o, d in pairs)
+            ]
+
+        pruned = [p for p in providers if p not in candidates]
+        if pruned:
+            logger.info(
+                "providers_pruned",
+                origin=origin,
+                destination=destination,
+                pruned=pruned,
+                trace_id=trace_id
+            )
+        return candidates
+
+    def providers_for_params(self, params: SearchParams, providers: List[str], trace_id: Optional[str] = None) -> List[str]:
+        return self.providers_for(
+            params.origin, params.destination, providers, params.preferred_programs, trace_id
+        )
+
+    def observe(self, provider: str, params: SearchParams, offers: List[Offer]):
+        index = self._get_index()
+        if index is None or not offers:
+            return
+        carriers = {segment.carrier for offer in offers for segment in offer.segments}
+        index.observe(provider, params.origin, params.destination, carriers)
+
+    def _airport_pairs(self, origin: str, destination: str) -> List[Tuple[str, str]]:
+        # The calendar may be asked for metro codes (SAO, RIO); the index holds airports
+        from services.airport_resolver import get_airport_resolver
+
+        try:
+            resolver = get_airport_resolver()
+            origins = resolver.expand(origin)
+            destinations = resolver.expand(destination)
+        except Exception:
+            origins, destinations = [origin], [destination]
+
+        return [(o, d) for o in origins for d in destinations if o != d]
+
+    def _get_index(self) -> Optional[RouteCapabilityIndex]:
+        cls = type(self)
+        if time.monotonic() - cls._loaded_at >= settings.ROUTE_CAPABILITY_RELOAD_SECONDS:
+            if cls._reloading.acquire(blocking=False):
+                threading.Thread(target=cls._reload, name="route-capability-reload", daemon=True).start()
+        return cls._index
+
+    @classmethod
+    def _reload(cls):
+        from database.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            index = RouteCapabilityIndex.from_db(db)
+            cls._index = index
+            logger.info(
+                "route_capability_index_loaded",
+                routes=len(index.observed),
+                providers=len({p for providers in index.observed.values() for p in providers})
+            )
+        except Exception as e:
+            logger.warning("route_capability_index_load_error", error=str(e))
+        finally:
+            db.close()
+            # Also after a failure, so a down database isn't retried per search
+            cls._loaded_at = time.monotonic()
+            cls._reloading.release()
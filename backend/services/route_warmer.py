@@ -0,0 +1,188 @@
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+import asyncio
+import structlog
+
+from schemas.flight import SearchParams, Pax, CabinClass
+from database.db import get_redis
+from services.rate_limiter import get_rate_limiter, SCRAPER_BUCKETS, WARM_BUCKET_PREFIX
+from config import settings
+
+logger = structlog.get_logger()
+
+
+DEMAND_KEY_PREFIX = "search_demand"
+
+
+def _demand_key(moment: datetime) -> str:
+    return f"{DEMAND_KEY_PREFIX}:{moment:%Y%m%d%H}"
+
+
+def _encode_query(params: SearchParams) -> str:
+    return "|".join([
+        params.origin,
+        params.destination,
+        params.out_date.isoformat(),
+        params.ret_date.isoformat() if params.ret_date else "",
+        str(params.pax.adults),
+        str(params.pax.children),
+        str(params.pax.infants),
+        params.cabin.value
+    ])
+
+
+def _decode_query(member: str) -> SearchParams:
+    origin, destination, out_date, ret_date, adults, children, infants, cabin = member.split("|")
+    return SearchParams(
+        origin=origin,
+        destination=destination,
+        out_date=date.fromisoformat(out_date),
+        ret_date=date.fromisoformat(ret_date) if ret_date else None,
+        pax=Pax(adults=int(adults), children=int(children), infants=int(infants)),
+        cabin=CabinClass(cabin)
+    )
+
+
+def record_search_demand(queries: List[SearchParams]):
+    """
+    Count one search per airport-pair query in the current hourly bucket.
+    Buckets expire on their own once they leave the demand window.
+    """
+    try:
+        redis = get_redis()
+        key = _demand_key(datetime.now())
+        pipe = redis.pipeline(transaction=False)
+        for params in queries:
+            pipe.zincrby(key, 1, _encode_query(params))
+        pipe.expire(key, (settings.WARMER_DEMAND_WINDOW_HOURS + 1) * 3600)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("search_demand_record_error", error=str(e))
+
+
+class RouteWarmer:
+    """
+    Refreshes the cache for the queries users actually search.
+
+    Demand is the sum of the hourly Redis counters over the last
+    WARMER_DEMAND_WINDOW_HOURS. Each query is prioritized by
+    hits / minutes-until-its-cache-expires, so popular queries about to
+    go stale are refreshed first and ones with a fresh cache are skipped.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.redis = get_redis()
+
+    def top_queries(self, limit: int) -> List[Dict]:
+        now = datetime.now()
+        keys = [
+            _demand_key(now - timedelta(hours=h))
+            for h in range(settings.WARMER_DEMAND_WINDOW_HOURS)
+        ]
+
+        hits: Dict[str, float] = {}
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrevrange(key, 0, settings.WARMER_CANDIDATES_PER_BUCKET - 1, withscores=True)
+        for bucket in pipe.execute():
+            for member, score in bucket:
+                hits[member] = hits.get(member, 0) + score
+
+        from services.search_service import SearchService
+        search_service = SearchService(self.db)
+
+        queries = []
+        for member, count in hits.items():
+            if count < settings.WARMER_MIN_HITS:
+                continue
+            try:
+                params = _decode_query(member)
+            except Exception:
+                continue
+            if params.out_date >= date.today():
+                queries.append((params, count))
+
+        pipe = self.redis.pipeline(transaction=False)
+        for params, _ in queries:
+            pipe.ttl(search_service._generate_cache_key(params))
+        ttls = pipe.execute() if queries else []
+
+        # Relative to the real pair TTL, which follows the fastest enabled
+        # provider (see PROVIDER_CACHE_TTL_MINUTES)
+        skip_above_minutes = search_service.cache_ttl / 60 * settings.WARMER_SKIP_IF_TTL_ABOVE_FRACTION
+
+        candidates = []
+        for (params, count), ttl_seconds in zip(queries, ttls):
+            ttl_minutes = max(ttl_seconds, 0) / 60
+            if ttl_minutes > skip_above_minutes:
+                continue
+
+            candidates.append({
+                "params": params,
+                "hits": count,
+                "ttl_minutes": ttl_minutes,
+                "priority": count / max(ttl_minutes, 1.0)
+            })
+
+        candidates.sort(key=lambda c: c["priority"], reverse=True)
+        return candidates[:limit]
+
+    async def warm(self, trace_id: str = "route_warmer") -> Dict:
+        from services.search_service import SearchService
+
+        # Every warm search hits each loyalty scraper once, so the warmer's
+        # own scraping budget bounds how many queries one run may refresh
+        limiter = get_rate_limiter()
+        scrape_per_minute = min(
+            limiter.bucket_config(WARM_BUCKET_PREFIX + bucket)[0] * 60 for bucket in SCRAPER_BUCKETS
+        )
+        budget = min(settings.WARMER_TOP_N, int(scrape_per_minute * settings.WARMER_RUN_BUDGET_MINUTES))
+        candidates = self.top_queries(budget)
+        semaphore = asyncio.Semaphore(settings.WARMER_CONCURRENCY)
+        # The warmer runs as a task on the background pool; scrapes it sent to
+        # a queue could sit behind the very task waiting for them, so they
+        # run inline here. Tokens come from the warmer's own "warm:" buckets,
+        # never the ones interactive searches wait on, and may wait for the
+        # whole run budget
+        search_service = SearchService(
+            self.db,
+            inline_scrapes=True,
+            rate_limit_prefix=WARM_BUCKET_PREFIX,
+            rate_limit_max_wait=settings.WARMER_RUN_BUDGET_MINUTES * 60
+        )
+
+        async def refresh(candidate: Dict) -> int:
+            async with semaphore:
+                result = await search_service.search_offers(
+                    candidate["params"], trace_id, force_live=True, record_demand=False
+                )
+                return len(result["offers"])
+
+        results = await asyncio.gather(
+            *(refresh(c) for c in candidates), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+
+        logger.info(
+            "route_warmer_complete",
+            candidates=len(candidates),
+            refreshed=len(candidates) - len(failures),
+            failed=len(failures),
+            budget=budget
+        )
+
+        return {
+            "refreshed": len(candidates) - len(failures),
+            "failed": len(failures),
+            "routes": [
+                {
+                    "origin": c["params"].origin,
+                    "destination": c["params"].destination,
+                    "out_date": c["params"].out_date.isoformat(),
+                    "hits": c["hits"]
+                }
+                for c in candidates
+            ]
+        }
@@ -1,34 +1,123 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
 import json
 import hashlib
+import time
+import uuid
 import structlog
 
-from schemas.flight import SearchParams, Offer, OfferType
-from database.db import get_redis
+from schemas.flight import SearchParams, Offer, OfferType, MilesProgram, Pax, CabinClass
+from database.db import get_redis, get_async_redis
 from config import settings
 from providers.duffel_provider import DuffelProvider
 from providers.amadeus_provider import AmadeusProvider
 from providers.kiwi_provider import KiwiProvider
+from providers.base_provider import month_days, prepaid_token
+from providers.recording import replaying
+from services.route_warmer import record_search_demand
+from services.price_alerts import PriceAlertMatcher
+from services.circuit_breaker import get_circuit_breaker
+from services.rate_limiter import get_rate_limiter, RateLimitExceeded
+from services.route_capability import ProviderDispatcher
+from services.offer_retention import partition_horizon
 
 logger = structlog.get_logger()
 
 
+# Loyalty programs searched for miles offers (scraped by the Celery workers)
+MILES_PROGRAMS = [MilesProgram.SMILES, MilesProgram.LATAM_PASS, MilesProgram.TUDO_AZUL]
+
+# Cash API providers, searched concurrently when configured
+CASH_PROVIDERS = {
+    "duffel": DuffelProvider,
+    "amadeus": AmadeusProvider,
+    "kiwi": KiwiProvider
+}
+
+
+def get_miles_provider(program: str):
+    """Provider instance for a loyalty program"""
+    from providers.smiles_provider import SmilesProvider
+    from providers.latam_provider import LatamPassProvider
+    from providers.tudoazul_provider import TudoAzulProvider
+
+    providers = {
+        MilesProgram.SMILES.value: SmilesProvider,
+        MilesProgram.LATAM_PASS.value: LatamPassProvider,
+        MilesProgram.TUDO_AZUL.value: TudoAzulProvider
+    }
+    return providers[program]()
+
+
 class SearchService:
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        scrape_queue: str = "interactive",
+        inline_scrapes: bool = False,
+        rate_limit_prefix: str = "",
+        rate_limit_max_wait: Optional[float] = None
+    ):
         self.db = db
+        # Celery queue for miles scrapes
+        self.scrape_queue = scrape_queue
+        # Run loyalty providers in this process even with MILES_SEARCH_VIA_CELERY
+        # (callers that are themselves Celery tasks must not wait on the queue)
+        self.inline_scrapes = inline_scrapes
+        # Provider calls take their tokens from "<prefix><bucket>" (e.g. the
+        # warmer's "warm:" buckets), waiting up to rate_limit_max_wait
+        self.rate_limit_prefix = rate_limit_prefix
+        self.rate_limit_max_wait = rate_limit_max_wait
         self.redis = get_redis()
-        self.cache_ttl = settings.CACHE_TTL_MINUTES * 60
+        # The merged pair result is only as fresh as its fastest-moving
+        # source; providers that aren't enabled don't shorten it
+        self.pair_fresh_minutes = min(
+            [settings.LIVE_SEARCH_THRESHOLD_MINUTES]
+            + [self._provider_cell_ttl(name) // 60 for name in self._cash_provider_names()]
+            + [self._provider_cell_ttl(program.value) // 60 for program in MILES_PROGRAMS]
+        )
+        self.cache_ttl = min(settings.CACHE_TTL_MINUTES, self.pair_fresh_minutes) * 60
+        # Providers skipped because their circuit breaker is open
+        self.skipped_providers = set()
+        # Prunes each search's fan-out to providers that serve the route
+        self.dispatcher = ProviderDispatcher()
 
     def _generate_cache_key(self, params: SearchParams) -> str:
         """Generate unique cache key for search parameters"""
+        return f"search:{self._params_digest(params)}"
+
+    def _provider_cell_key(self, provider: str, params: SearchParams) -> str:
+        """Per-provider cell for one query, filled by live searches and award calendars"""
+        return f"provider_cell:{provider}:{self._params_digest(params)}"
+
+    def _provider_cell_ttl(self, provider: str) -> int:
+        minutes = settings.PROVIDER_CACHE_TTL_MINUTES.get(provider, settings.LIVE_SEARCH_THRESHOLD_MINUTES)
+        return minutes * 60
+
+    def _cash_provider_names(self) -> List[str]:
+        """Configured cash providers (replay mode also runs those with only a recorded corpus)"""
+        keys = {
+            "duffel": settings.DUFFEL_API_KEY,      # NDC aggregator
+            "amadeus": settings.AMADEUS_API_KEY,
+            "kiwi": settings.KIWI_API_KEY           # Tequila
+        }
+        return [name for name in CASH_PROVIDERS if keys[name] or replaying(name)]
+
+    def _params_digest(self, params: SearchParams) -> str:
         key_data = f"{params.origin}:{params.destination}:{params.out_date}:{params.ret_date}:{params.pax.adults}:{params.pax.children}:{params.pax.infants}:{params.cabin}"
-        return f"search:{hashlib.md5(key_data.encode()).hexdigest()}"
+        return hashlib.md5(key_data.encode()).hexdigest()
 
     async def get_cached_offers(self, params: SearchParams) -> Optional[List[Offer]]:
-        """Retrieve cached offers if available and not stale"""
+        """
+        Retrieve cached offers if available and not stale.
+
+        Redis is tried first; on a miss the durable queries_cache row (L2)
+        is used and Redis is refilled from it, so a Redis restart or
+        eviction doesn't send every search live.
+        """
         cache_key = self._generate_cache_key(params)
 
         try:
@@ -39,32 +128,134 @@ class SearchService:
 
                 # Check if cache is still fresh
                 age_minutes = (datetime.now() - cached_at).total_seconds() / 60
-                if age_minutes < settings.LIVE_SEARCH_THRESHOLD_MINUTES:
+                if age_minutes < self.pair_fresh_minutes:
                     logger.info("cache_hit", cache_key=cache_key, age_minutes=age_minutes)
                     return [Offer(**offer) for offer in data["offers"]]
 
                 logger.info("cache_stale", cache_key=cache_key, age_minutes=age_minutes)
+                return None
 
         except Exception as e:
             logger.warning("cache_retrieval_error", error=str(e))
 
-        return None
+        return await self._get_durable_cached_offers(params)
+
+    async def _get_durable_cached_offers(self, params: SearchParams) -> Optional[List[Offer]]:
+        """L2: ranked offer ids from queries_cache, hydrated from offers in one query"""
+        try:
+            from sqlalchemy import text
+
+            row = self.db.execute(text("""
+                SELECT result_offer_ids, last_refreshed FROM queries_cache
+                WHERE origin = :origin AND destination = :destination
+                  AND out_date = :out_date AND ret_date IS NOT DISTINCT FROM :ret_date
+                  AND pax_adults = :pax_adults AND pax_children = :pax_children
+                  AND pax_infants = :pax_infants AND cabin = :cabin
+            """), self._query_cache_params(params)).fetchone()
+
+            if not row or not row.result_offer_ids:
+                return None
+
+            age_minutes = (datetime.now() - row.last_refreshed).total_seconds() / 60
+            if age_minutes >= self.pair_fresh_minutes:
+                logger.info("durable_cache_stale", origin=params.origin, destination=params.destination, age_minutes=age_minutes)
+                return None
+
+            offer_ids = list(row.result_offer_ids)
+            rows = self.db.execute(text("""
+                SELECT * FROM offers
+                WHERE id = ANY(:ids) AND out_date = :out_date AND expires_at > NOW()
+            """), {"ids": offer_ids, "out_date": params.out_date}).fetchall()
+            by_id = {r.id: r for r in rows}
 
-    async def cache_offers(self, params: SearchParams, offers: List[Offer]):
-        """Cache search results"""
+            # A partial result would silently drop offers, so search live instead
+            if len(by_id) < len(set(offer_ids)):
+                logger.info("durable_cache_incomplete", expected=len(set(offer_ids)), found=len(by_id))
+                return None
+
+            offers = [self._row_to_offer(by_id[offer_id]) for offer_id in offer_ids]
+
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("durable_cache_retrieval_error", error=str(e))
+            return None
+
+        logger.info("durable_cache_hit", origin=params.origin, destination=params.destination, age_minutes=age_minutes)
+        await self.cache_offers(params, offers, cached_at=row.last_refreshed, persist=False)
+        return offers
+
+    async def cache_offers(
+        self,
+        params: SearchParams,
+        offers: List[Offer],
+        cached_at: Optional[datetime] = None,
+        persist: bool = True
+    ):
+        """
+        Cache search results in Redis and, with persist, the ranked offer ids
+        in queries_cache. cached_at keeps the original age when Redis is
+        refilled from queries_cache.
+        """
         cache_key = self._generate_cache_key(params)
+        cached_at = cached_at or datetime.now()
 
         try:
-            cache_data = {
-                "cached_at": datetime.now().isoformat(),
-                "offers": [offer.model_dump(mode='json') for offer in offers]
-            }
-            self.redis.setex(cache_key, self.cache_ttl, json.dumps(cache_data))
-            logger.info("cache_stored", cache_key=cache_key, offers_count=len(offers))
+            ttl = self.cache_ttl - int((datetime.now() - cached_at).total_seconds())
+            if ttl > 0:
+                cache_data = {
+                    "cached_at": cached_at.isoformat(),
+                    "offers": [offer.model_dump(mode='json') for offer in offers]
+                }
+                self.redis.setex(cache_key, ttl, json.dumps(cache_data))
+                logger.info("cache_stored", cache_key=cache_key, offers_count=len(offers))
 
         except Exception as e:
             logger.warning("cache_storage_error", error=str(e))
 
+        if persist:
+            self._store_query_result(params, offers, cached_at)
+
+    def _store_query_result(self, params: SearchParams, offers: List[Offer], refreshed_at: datetime):
+        """Upsert the ranked offer ids for a query into queries_cache"""
+        try:
+            from sqlalchemy import text
+
+            self.db.execute(text("""
+                INSERT INTO queries_cache (
+                    origin, destination, out_date, ret_date,
+                    pax_adults, pax_children, pax_infants, cabin,
+                    result_offer_ids, last_refreshed
+                ) VALUES (
+                    :origin, :destination, :out_date, :ret_date,
+                    :pax_adults, :pax_children, :pax_infants, :cabin,
+                    :result_offer_ids, :last_refreshed
+                )
+                ON CONFLICT ON CONSTRAINT unique_query DO UPDATE SET
+                    result_offer_ids = EXCLUDED.result_offer_ids,
+                    last_refreshed = EXCLUDED.last_refreshed
+            """), {
+                **self._query_cache_params(params),
+                "result_offer_ids": [offer.id for offer in offers],
+                "last_refreshed": refreshed_at
+            })
+            self.db.commit()
+
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("durable_cache_storage_error", error=str(e))
+
+    def _query_cache_params(self, params: SearchParams) -> Dict:
+        return {
+            "origin": params.origin,
+            "destination": params.destination,
+            "out_date": params.out_date,
+            "ret_date": params.ret_date,
+            "pax_adults": params.pax.adults,
+            "pax_children": params.pax.children,
+            "pax_infants": params.pax.infants,
+            "cabin": params.cabin.value
+        }
+
     def get_cache_age_minutes(self, params: SearchParams) -> Optional[int]:
         """Get age of cached data in minutes"""
         cache_key = self._generate_cache_key(params)
@@ -80,101 +271,550 @@ class SearchService:
 
         return None
 
-    async def search_cash_offers(self, params: SearchParams, trace_id: str) -> List[Offer]:
-        """Search for cash offers from multiple providers"""
-        all_offers = []
+    async def search_offers(
+        self,
+        params: SearchParams,
+        trace_id: str,
+        force_live: bool = False,
+        cache_only: bool = False,
+        record_demand: bool = True
+    ) -> Dict:
+        """
+        Search cash + miles offers for a query whose origin/destination may be
+        metro codes (SAO, RIO, ...).
+
+        The query is expanded into every airport pair and each pair is its
+        own cache cell, so "SAO -> RIO" and "GRU -> SDU" share entries. Only
+        the pairs missing from cache are searched live, concurrently
+        (never, with cache_only). A pair result goes stale with its
+        fastest-moving source; the live search then reassembles it from
+        the per-provider cells and only refetches the providers whose cell
+        expired. force_live skips the pair cache, not the provider cells.
+
+        Returns {"offers": [...], "pairs": int, "cached_pairs": int,
+        "skipped_providers": [...]}
+        """
+        pairs = self._expand_airport_pairs(params)
+
+        if record_demand:
+            record_search_demand(pairs)
+
+        offers = []
+        missing = []
+        for pair in pairs:
+            cached = None if force_live else await self.get_cached_offers(pair)
+            if cached:
+                offers.extend(cached)
+            else:
+                missing.append(pair)
+
+        if missing and not cache_only:
+            results = await asyncio.gather(
+                *(self._search_pair_live(pair, trace_id) for pair in missing)
+            )
+            for pair_offers in results:
+                offers.extend(pair_offers)
+
+        # Pair caches hold every program; keep only the ones asked for
+        if params.preferred_programs:
+            preferred = set(params.preferred_programs)
+            offers = [offer for offer in offers if not offer.miles or offer.miles.program in preferred]
+
+        logger.info(
+            "search_pairs_complete",
+            origin=params.origin,
+            destination=params.destination,
+            pairs=len(pairs),
+            cached_pairs=len(pairs) - len(missing),
+            offers_count=len(offers),
+            trace_id=trace_id
+        )
+
+        return {
+            "offers": offers,
+            "pairs": len(pairs),
+            "cached_pairs": len(pairs) - len(missing),
+            "skipped_providers": sorted(self.skipped_providers)
+        }
 
-        # Duffel (NDC aggregator)
-        if settings.DUFFEL_API_KEY:
-            try:
-                duffel = DuffelProvider()
-                offers = await duffel.search_offers(params, trace_id)
-                all_offers.extend(offers)
-                logger.info("duffel_search_complete", count=len(offers), trace_id=trace_id)
-            except Exception as e:
-                logger.error("duffel_search_error", error=str(e), trace_id=trace_id)
+    def get_max_cache_age_minutes(self, params: SearchParams) -> Optional[int]:
+        """Age of the oldest cache cell behind a (possibly metro) query"""
+        ages = [self.get_cache_age_minutes(pair) for pair in self._expand_airport_pairs(params)]
+        ages = [age for age in ages if age is not None]
+        return max(ages) if ages else None
 
-        # Amadeus
-        if settings.AMADEUS_API_KEY:
-            try:
-                amadeus = AmadeusProvider()
-                offers = await amadeus.search_offers(params, trace_id)
-                all_offers.extend(offers)
-                logger.info("amadeus_search_complete", count=len(offers), trace_id=trace_id)
-            except Exception as e:
-                logger.error("amadeus_search_error", error=str(e), trace_id=trace_id)
+    def record_demand_for(self, params: SearchParams):
+        """Feed the demand counters the route warmer ranks by"""
+        record_search_demand(self._expand_airport_pairs(params))
 
-        # Kiwi/Tequila
-        if settings.KIWI_API_KEY:
-            try:
-                kiwi = KiwiProvider()
-                offers = await kiwi.search_offers(params, trace_id)
-                all_offers.extend(offers)
-                logger.info("kiwi_search_complete", count=len(offers), trace_id=trace_id)
-            except Exception as e:
-                logger.error("kiwi_search_error", error=str(e), trace_id=trace_id)
+    def _expand_airport_pairs(self, params: SearchParams) -> List[SearchParams]:
+        """One SearchParams per concrete origin/destination airport pair"""
+        from services.airport_resolver import get_airport_resolver
+
+        try:
+            resolver = get_airport_resolver()
+            origins = resolver.expand(params.origin)
+            destinations = resolver.expand(params.destination)
+        except Exception as e:
+            logger.warning("airport_expand_error", error=str(e))
+            origins, destinations = [params.origin], [params.destination]
+
+        if origins == [params.origin] and destinations == [params.destination]:
+            return [params]
+
+        return [
+            params.model_copy(update={"origin": origin, "destination": destination})
+            for origin in origins
+            for destination in destinations
+            if origin != destination
+        ]
+
+    async def _search_pair_live(self, params: SearchParams, trace_id: str) -> List[Offer]:
+        """Live cash + miles search for one airport pair, cached on success"""
+        cash_offers, miles_offers = await asyncio.gather(
+            self.search_cash_offers(params, trace_id),
+            self.search_miles_offers(params, trace_id)
+        )
+
+        offers = cash_offers + miles_offers
+        # A search narrowed to preferred_programs isn't a complete pair result
+        if offers and not params.preferred_programs:
+            await self.cache_offers(params, offers)
+
+        return offers
+
+    async def search_cash_offers(self, params: SearchParams, trace_id: str) -> List[Offer]:
+        """
+        Search for cash offers from multiple providers.
+
+        Providers with a fresh per-provider cell are served from it; only
+        the others are called, and their answers become new cells with
+        their own TTL (PROVIDER_CACHE_TTL_MINUTES).
+        """
+        providers = [CASH_PROVIDERS[name]() for name in self._cash_provider_names()]
+
+        routable = self.dispatcher.providers_for_params(params, [p.name for p in providers], trace_id)
+        cached_offers, missing = self._get_cached_provider_offers(params, routable)
+        providers = [provider for provider in providers if provider.name in missing]
+
+        # Concurrently, each behind its circuit breaker and adaptive timeout,
+        # so one slow or failing provider no longer delays the others
+        results = await asyncio.gather(
+            *(self._call_provider(provider.name, provider, params, trace_id) for provider in providers)
+        )
+        fetched = {
+            provider.name: offers
+            for provider, offers in zip(providers, results)
+            if offers is not None
+        }
+
+        # Store first so the cells carry the persisted offer ids; an offer
+        # returned by several providers is stored once and shares its id
+        persisted = {}
+        for offers in fetched.values():
+            for offer in offers:
+                persisted.setdefault(self._hash_offer(offer), offer)
+        await self._store_offers_in_db(list(persisted.values()))
+        for offers in fetched.values():
+            for offer in offers:
+                offer.id = persisted[self._hash_offer(offer)].id
+        self._cache_provider_offers([(params, name, offers) for name, offers in fetched.items()])
 
         # Deduplicate offers by hash
         seen_hashes = set()
         unique_offers = []
-        for offer in all_offers:
+        for offer in cached_offers + [offer for offers in fetched.values() for offer in offers]:
             offer_hash = self._hash_offer(offer)
             if offer_hash not in seen_hashes:
                 seen_hashes.add(offer_hash)
                 unique_offers.append(offer)
 
-        # Store offers in database
-        await self._store_offers_in_db(unique_offers)
-
         return unique_offers
 
     async def search_miles_offers(self, params: SearchParams, trace_id: str) -> List[Offer]:
-        """Search for miles offers from loyalty programs"""
-        # This will trigger Celery tasks for scraping
-        # For MVP, we'll use stubs that return mock data
+        """
+        Search for miles offers from loyalty programs.
+
+        One scrape_miles_offers task per program is dispatched to the
+        workers as a Celery group and the results come back on a
+        per-request Redis pub/sub channel, so the API event loop only
+        waits. Programs that haven't answered within
+        MILES_SEARCH_TIMEOUT_SECONDS are filled from the offers they stored
+        earlier; otherwise the result is partial. Workers store the offers
+        themselves, so late results still warm the next search.
+
+        Only programs that serve the route (and are in preferred_programs,
+        if given) are asked. Programs with a fresh per-provider cell (e.g.
+        from an award calendar fetch) are served from it without a scrape.
+        Programs whose circuit breaker is open are skipped. Only explicit
+        scrape errors count against a circuit; throttled scrapes and
+        deadline misses are neutral.
+        """
+        routable = self.dispatcher.providers_for_params(
+            params, [program.value for program in MILES_PROGRAMS], trace_id
+        )
+        if not routable:
+            return []
+
+        offers, programs = self._get_cached_provider_offers(params, routable)
+        if not programs:
+            return offers
+
+        if self.inline_scrapes or not settings.MILES_SEARCH_VIA_CELERY:
+            return offers + await self._search_miles_inline(params, programs, trace_id)
+
+        breaker = get_circuit_breaker()
+        tripped = [program for program in programs if not breaker.allow(program)]
+        if tripped:
+            self.skipped_providers.update(tripped)
+            logger.info("provider_circuit_open_skipped", provider=tripped, trace_id=trace_id)
+            programs = [program for program in programs if program not in tripped]
+            if not programs:
+                return offers
+
+        from celery import group
+        from workers.tasks import scrape_miles_offers
+
+        channel = f"miles_results:{uuid.uuid4().hex}"
+        # The wait also covers Celery queueing and the workers' token waits,
+        # so it's the fixed deadline rather than the adaptive scrape timeout
+        timeout = settings.MILES_SEARCH_TIMEOUT_SECONDS
+        loop = asyncio.get_running_loop()
+
+        answered = set()
+        pubsub = get_async_redis().pubsub()
+        try:
+            # Subscribe before dispatching so no reply can be missed
+            await pubsub.subscribe(channel)
+
+            group(
+                scrape_miles_offers.s(
+                    params.origin,
+                    params.destination,
+                    params.out_date.isoformat(),
+                    program,
+                    ret_date=params.ret_date.isoformat() if params.ret_date else None,
+                    adults=params.pax.adults,
+                    children=params.pax.children,
+                    infants=params.pax.infants,
+                    cabin=params.cabin.value,
+                    trace_id=trace_id,
+                    reply_channel=channel
+                )
+                for program in programs
+            ).apply_async(expires=timeout, queue=self.scrape_queue)
+
+            started = loop.time()
+            deadline = started + timeout
+            while len(answered) < len(programs):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is None:
+                    continue
+
+                result = json.loads(message["data"])
+                answered.add(result["program"])
+                program_offers = [Offer(**offer) for offer in result.get("offers", [])]
+                offers.extend(program_offers)
+                if result.get("success"):
+                    self._cache_provider_offers([(params, result["program"], program_offers)])
+                    breaker.record_success(
+                        result["program"],
+                        result.get("scrape_ms", (loop.time() - started) * 1000) / 1000
+                    )
+                    self.dispatcher.observe(result["program"], params, program_offers)
+                elif result.get("rate_limited"):
+                    breaker.release_probe(result["program"])
+                else:
+                    breaker.record_failure(result["program"])
+                logger.info(
+                    f"{result['program']}_search_complete",
+                    count=len(result.get("offers", [])),
+                    success=result.get("success"),
+                    trace_id=trace_id
+                )
 
-        from providers.smiles_provider import SmilesProvider
-        from providers.latam_provider import LatamPassProvider
-        from providers.tudoazul_provider import TudoAzulProvider
+        except Exception as e:
+            logger.error("miles_dispatch_error", error=str(e), trace_id=trace_id)
 
-        all_offers = []
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+        missing = [program for program in programs if program not in answered]
+        # A late reply may only mean a busy queue or a throttled scrape, so
+        # deadline misses don't count against the circuit
+        for program in missing:
+            breaker.release_probe(program)
+        if missing:
+            stored = await self._get_stored_miles_offers(params, missing)
+            offers.extend(stored)
+            logger.warning(
+                "miles_search_deadline",
+                missing=missing,
+                stored_fallback=len(stored),
+                trace_id=trace_id
+            )
 
-        # Smiles
+        return offers
+
+    async def _call_provider(
+        self,
+        name: str,
+        provider,
+        params: SearchParams,
+        trace_id: str
+    ) -> Optional[List[Offer]]:
+        """
+        One provider search behind its circuit breaker, with the provider's
+        adaptive timeout (services/circuit_breaker.py).
+
+        Returns None when the provider was skipped or failed, so callers
+        don't cache its missing result as "no offers".
+        """
+        offers = await self._guarded_call(
+            name, provider, lambda: provider.search_offers(params, trace_id), trace_id
+        )
+        if offers is not None:
+            self.dispatcher.observe(name, params, offers)
+            logger.info(f"{name}_search_complete", count=len(offers), trace_id=trace_id)
+        return offers
+
+    async def _guarded_call(
+        self,
+        name: str,
+        provider,
+        call: Callable[[], Awaitable],
+        trace_id: str,
+        operation: str = "search",
+        adaptive: bool = True
+    ):
+        """
+        Run call() behind the provider's circuit breaker. The rate-limit
+        token is taken first, outside the timeout. The timeout is adaptive,
+        or the configured ceiling for calls unlike a one-day search (their
+        latency isn't sampled either). Returns None when skipped or failed.
+        """
+        breaker = get_circuit_breaker()
+        if not breaker.allow(name):
+            self.skipped_providers.add(name)
+            logger.info("provider_circuit_open_skipped", provider=name, trace_id=trace_id)
+            return None
+
+        # Waiting for our own rate-limit token isn't provider latency, so it
+        # happens outside the timeout
+        # (the limiter fails open on Redis errors; only a real timeout skips)
         try:
-            smiles = SmilesProvider()
-            offers = await smiles.search_offers(params, trace_id)
-            all_offers.extend(offers)
-            logger.info("smiles_search_complete", count=len(offers), trace_id=trace_id)
+            if provider.rate_limit_bucket:
+                await get_rate_limiter().acquire(
+                    self.rate_limit_prefix + provider.rate_limit_bucket,
+                    max_wait=self.rate_limit_max_wait,
+                    trace_id=trace_id
+                )
+        except RateLimitExceeded as e:
+            breaker.release_probe(name)
+            logger.warning(f"{name}_{operation}_rate_limited", error=str(e), trace_id=trace_id)
+            return None
+
+        timeout = breaker.timeout_for(name) if adaptive else breaker.ceiling(name)
+        started = time.monotonic()
+        try:
+            with prepaid_token(provider.rate_limit_bucket):
+                result = await asyncio.wait_for(call(), timeout=timeout)
         except Exception as e:
-            logger.error("smiles_search_error", error=str(e), trace_id=trace_id)
+            breaker.record_failure(name)
+            logger.error(
+                f"{name}_{operation}_error",
+                error=str(e) or type(e).__name__,
+                timeout=round(timeout, 2),
+                trace_id=trace_id
+            )
+            return None
+
+        breaker.record_success(name, time.monotonic() - started if adaptive else None)
+        return result
+
+    async def _search_miles_inline(self, params: SearchParams, programs: List[str], trace_id: str) -> List[Offer]:
+        """Run the loyalty providers in this process (inline_scrapes or MILES_SEARCH_VIA_CELERY off)"""
+        by_program = {}
+
+        for program in programs:
+            offers = await self._call_provider(program, get_miles_provider(program), params, trace_id)
+            if offers is not None:
+                by_program[program] = offers
+
+        all_offers = [offer for offers in by_program.values() for offer in offers]
+
+        # Store offers in database
+        await self._store_offers_in_db(all_offers)
+        self._cache_provider_offers([(params, program, offers) for program, offers in by_program.items()])
+
+        return all_offers
+
+    async def search_month(
+        self,
+        origin: str,
+        destination: str,
+        month: date,
+        trace_id: str,
+        pax: Optional[Pax] = None,
+        cabin: CabinClass = CabinClass.ECONOMY
+    ) -> Dict[date, List[Offer]]:
+        """
+        Award calendar: one-way miles offers for every bookable day of a month.
+
+        Each program is asked for the whole month in one provider call
+        (BaseProvider.search_month), behind its circuit breaker, unless all
+        its day cells are still fresh. Fetched days are written back as per-provider day cells, so
+        exact-date searches for those days skip the scrape too.
+
+        Returns {day: offers}
+        """
+        pax = pax or Pax()
+        days = month_days(month)
+        day_params = {
+            day: SearchParams(origin=origin, destination=destination, out_date=day, pax=pax, cabin=cabin)
+            for day in days
+        }
+        programs = self.dispatcher.providers_for(
+            origin, destination, [program.value for program in MILES_PROGRAMS], trace_id=trace_id
+        )
+
+        async def fetch(program: str):
+            try:
+                cells = self.redis.mget([self._provider_cell_key(program, day_params[day]) for day in days])
+            except Exception as e:
+                logger.warning("cache_retrieval_error", error=str(e))
+                cells = [None] * len(days)
+
+            if days and all(cell is not None for cell in cells):
+                return {day: [Offer(**o) for o in json.loads(cell)] for day, cell in zip(days, cells)}, True
+
+            provider = get_miles_provider(program)
+            program_days = await self._guarded_call(
+                program,
+                provider,
+                lambda: provider.search_month(origin, destination, month, trace_id, pax=pax, cabin=cabin),
+                trace_id,
+                operation="month_search",
+                adaptive=False
+            )
+            return program_days, False
+
+        results = await asyncio.gather(*(fetch(program) for program in programs), return_exceptions=True)
+
+        by_day: Dict[date, List[Offer]] = {day: [] for day in days}
+        fetched: Dict[str, Dict[date, List[Offer]]] = {}
+        for program, result in zip(programs, results):
+            if isinstance(result, Exception):
+                logger.error(f"{program}_month_search_error", error=str(result), trace_id=trace_id)
+                continue
+
+            program_days, from_cache = result
+            if program_days is None:
+                # Skipped (open circuit) or failed; already logged
+                continue
+            if not from_cache:
+                fetched[program] = program_days
+            for day, offers in program_days.items():
+                if day in by_day:
+                    by_day[day].extend(offers)
+
+        # Store first so the cells carry the persisted offer ids
+        await self._store_offers_in_db([
+            offer for program_days in fetched.values() for offers in program_days.values() for offer in offers
+        ])
+        self._cache_provider_offers([
+            (day_params[day], program, offers)
+            for program, program_days in fetched.items()
+            for day, offers in program_days.items()
+            if day in day_params
+        ])
+
+        logger.info(
+            "month_search_complete",
+            origin=origin,
+            destination=destination,
+            month=month.strftime("%Y-%m"),
+            days=len(days),
+            fetched_programs=list(fetched),
+            trace_id=trace_id
+        )
+        return by_day
+
+    def _get_cached_provider_offers(self, params: SearchParams, providers: List[str]) -> Tuple[List[Offer], List[str]]:
+        """Offers from fresh per-provider cells, and the providers without one"""
+        if not providers:
+            return [], []
 
-        # LATAM Pass
         try:
-            latam = LatamPassProvider()
-            offers = await latam.search_offers(params, trace_id)
-            all_offers.extend(offers)
-            logger.info("latam_search_complete", count=len(offers), trace_id=trace_id)
+            cells = self.redis.mget([self._provider_cell_key(provider, params) for provider in providers])
         except Exception as e:
-            logger.error("latam_search_error", error=str(e), trace_id=trace_id)
+            logger.warning("cache_retrieval_error", error=str(e))
+            return [], providers
+
+        offers = []
+        missing = []
+        for provider, cell in zip(providers, cells):
+            if cell is None:
+                missing.append(provider)
+            else:
+                offers.extend(Offer(**offer) for offer in json.loads(cell))
+        return offers, missing
+
+    def _cache_provider_offers(self, cells: List[Tuple[SearchParams, str, List[Offer]]]):
+        """Write (params, provider, offers) cells; each expires with its source's TTL"""
+        if not cells:
+            return
 
-        # TudoAzul
         try:
-            tudoazul = TudoAzulProvider()
-            offers = await tudoazul.search_offers(params, trace_id)
-            all_offers.extend(offers)
-            logger.info("tudoazul_search_complete", count=len(offers), trace_id=trace_id)
+            pipe = self.redis.pipeline(transaction=False)
+            for params, provider, offers in cells:
+                pipe.setex(
+                    self._provider_cell_key(provider, params),
+                    self._provider_cell_ttl(provider),
+                    json.dumps([offer.model_dump(mode='json') for offer in offers])
+                )
+            pipe.execute()
         except Exception as e:
-            logger.error("tudoazul_search_error", error=str(e), trace_id=trace_id)
+            logger.warning("cache_storage_error", error=str(e))
 
-        # Store offers in database
-        await self._store_offers_in_db(all_offers)
+    async def _get_stored_miles_offers(self, params: SearchParams, programs: List[str]) -> List[Offer]:
+        """Unexpired offers previously stored by these programs for the same route and dates"""
+        try:
+            from sqlalchemy import text
 
-        return all_offers
+            rows = self.db.execute(text("""
+                SELECT * FROM offers
+                WHERE origin = :origin AND destination = :destination
+                  AND out_date = :out_date AND ret_date IS NOT DISTINCT FROM :ret_date
+                  AND cabin = :cabin AND offer_type = 'miles'
+                  AND source = ANY(:programs) AND expires_at > NOW()
+            """), {
+                "origin": params.origin,
+                "destination": params.destination,
+                "out_date": params.out_date,
+                "ret_date": params.ret_date,
+                "cabin": params.cabin.value,
+                "programs": programs
+            }).fetchall()
+            return [self._row_to_offer(row) for row in rows]
+
+        except Exception as e:
+            self.db.rollback()
+            logger.warning("stored_miles_offers_error", error=str(e))
+            return []
 
     def _hash_offer(self, offer: Offer) -> str:
         """Generate hash for offer deduplication"""
         segments_hash = hashlib.md5(
-            json.dumps([s.model_dump() for s in offer.segments], sort_keys=True).encode()
+            json.dumps([s.model_dump(mode='json') for s in offer.segments], sort_keys=True).encode()
         ).hexdigest()
 
         price_hash = ""
@@ -187,6 +827,13 @@ class SearchService:
 
     async def _store_offers_in_db(self, offers: List[Offer]):
         """Store offers in PostgreSQL"""
+        # offers has no partition past the horizon (services/offer_retention.py)
+        horizon = partition_horizon()
+        beyond = [offer for offer in offers if offer.out_date >= horizon]
+        if beyond:
+            logger.warning("offers_beyond_partition_horizon", count=len(beyond), horizon=horizon.isoformat())
+            offers = [offer for offer in offers if offer.out_date < horizon]
+
         try:
             from sqlalchemy import text
 
@@ -204,14 +851,15 @@ class SearchService:
                         :segments, :out_date, :ret_date, :origin, :destination,
                         :total_duration_minutes, :stops_count, :hash, :expires_at
                     )
-                    ON CONFLICT (hash) DO UPDATE SET
+                    ON CONFLICT (hash, out_date) DO UPDATE SET
                         price_cents = EXCLUDED.price_cents,
                         miles = EXCLUDED.miles,
                         taxes_cents = EXCLUDED.taxes_cents,
                         expires_at = EXCLUDED.expires_at
+                    RETURNING id
                 """)
 
-                self.db.execute(query, {
+                result = self.db.execute(query, {
                     "id": offer.id,
                     "source": offer.source,
                     "offer_type": offer.offer_type.value,
@@ -233,12 +881,20 @@ class SearchService:
                     "expires_at": offer.expires_at
                 })
 
+                # A re-seen offer keeps the id it was first stored with, so
+                # queries_cache and get_offer_by_id can find it
+                offer.id = result.scalar()
+
             self.db.commit()
             logger.info("offers_stored_in_db", count=len(offers))
 
         except Exception as e:
             self.db.rollback()
             logger.error("db_storage_error", error=str(e))
+            return
+
+        # Only this batch is checked against the alert index
+        PriceAlertMatcher(self.db).notify(offers)
 
     async def get_offer_by_id(self, offer_id: str) -> Optional[Offer]:
         """Retrieve offer by ID from database"""
@@ -265,7 +921,9 @@ class SearchService:
         """Convert database row to Offer model"""
         from schemas.flight import Segment, CashPrice, MilesPrice, CabinClass, MilesProgram
 
-        segments = [Segment(**s) for s in json.loads(row.segments)]
+        # psycopg2 already decodes JSONB columns
+        raw_segments = json.loads(row.segments) if isinstance(row.segments, str) else row.segments
+        segments = [Segment(**s) for s in raw_segments]
 
         offer_data = {
             "id": row.id,
@@ -0,0 +1,97 @@
+import functools
+import http.server
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("playwright.sync_api")
+
+from workers.browser_pool import BrowserContextPool
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "scrape")
+
+
+@pytest.fixture(scope="module")
+def fixture_server():
+    """Serve the scrape fixtures over local HTTP (context routes don't see file:// requests)"""
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=FIXTURES)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def pool():
+    pool = BrowserContextPool(size=2, max_pages=2)
+    try:
+        pool._ensure_browser()
+    except Exception as e:
+        pytest.skip(f"Chromium not available: {e}")
+    yield pool
+    pool.close()
+
+
+def test_page_loads_fixture(pool, fixture_server):
+    with pool.page() as page:
+        page.goto(f"{fixture_server}/award_search.html")
+        points = page.eval_on_selector_all(".flight", "items => items.map(i => i.dataset.points)")
+
+    assert page.is_closed()
+    assert points == ["12000", "15500"]
+
+
+def test_blocks_images(pool, fixture_server):
+    failed = []
+    with pool.page() as page:
+        page.on("requestfailed", lambda request: failed.append(request.resource_type))
+        page.goto(f"{fixture_server}/award_search.html")
+        page.wait_for_load_state("load")
+
+    assert failed == ["image"]
+
+
+def test_reuses_context_until_max_pages(pool, fixture_server):
+    for _ in range(3):
+        with pool.page() as page:
+            page.goto(f"{fixture_server}/award_search.html")
+
+    # max_pages=2: the first context serves two pages, then a second one is created
+    assert pool.stats["contexts_created"] == 2
+    assert pool.stats["launches"] == 1
+
+
+def test_failed_page_recycles_context(pool, fixture_server):
+    with pytest.raises(RuntimeError):
+        with pool.page() as page:
+            page.goto(f"{fixture_server}/award_search.html")
+            raise RuntimeError("parse failed")
+
+    assert pool._idle == []
+    assert pool.stats["contexts_recycled"] == 1
+
+
+def test_replaces_closed_context(pool, fixture_server):
+    with pool.page() as page:
+        page.goto(f"{fixture_server}/award_search.html")
+    pool._idle[0].context.close()
+
+    with pool.page() as page:
+        page.goto(f"{fixture_server}/award_search.html")
+        assert page.title() == "Busca de passagens com milhas"
+
+    assert pool.stats["contexts_created"] == 2
+
+
+def test_relaunches_crashed_browser(pool, fixture_server):
+    with pool.page() as page:
+        page.goto(f"{fixture_server}/award_search.html")
+    pool._browser.close()
+
+    with pool.page() as page:
+        page.goto(f"{fixture_server}/award_search.html")
+        assert page.title() == "Busca de passagens com milhas"
+
+    assert pool.stats["launches"] == 2
@@ -0,0 +1,122 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+
+from agents.llm_client import LLMClient
+from agents.llm_router import LLMRouter
+from benchmarks.stub_llm_server import StubConfig, StubLLMServer
+from config import settings
+
+MESSAGES = [{"role": "user", "content": "Oi"}]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _stub(first_token_delay_ms: float) -> StubLLMServer:
+    config = StubConfig(
+        first_token_delay_ms=first_token_delay_ms,
+        token_delay_ms=0,
+        response_tokens=3,
+        tool_calls=False
+    )
+    return StubLLMServer(config, port=_free_port())
+
+
+@pytest.fixture(scope="module")
+def fast_server():
+    with _stub(10) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def slow_server():
+    with _stub(600) as server:
+        yield server
+
+
+@pytest.fixture
+def dead_url():
+    return f"http://127.0.0.1:{_free_port()}/v1"
+
+
+def _backend(name: str, base_url: str) -> LLMClient:
+    backend = LLMClient(provider="openai", model="stub", base_url=base_url, api_key="stub", name=name)
+    # The router does the falling back; the SDK's own retries would only hide it
+    backend.client = backend.client.with_options(max_retries=0)
+    return backend
+
+
+def _run(backends, calls: int = 1):
+    """Make `calls` sequential completions through a router over (name, url) backends"""
+    async def run():
+        router = LLMRouter([_backend(name, url) for name, url in backends])
+        try:
+            results = []
+            for _ in range(calls):
+                started = time.monotonic()
+                result = await router.chat_completion(MESSAGES)
+                results.append((result, time.monotonic() - started))
+            return router, results
+        finally:
+            await router.aclose()
+
+    return asyncio.run(run())
+
+
+def test_routes_to_fastest_backend(fast_server, slow_server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_HEDGE_ENABLED", False)
+    fast_before, slow_before = len(fast_server.state.records), len(slow_server.state.records)
+
+    router, results = _run([("slow", slow_server.base_url), ("fast", fast_server.base_url)], calls=4)
+
+    # Unmeasured backends are tried first; once both are measured the fast one wins
+    assert len(slow_server.state.records) - slow_before == 1
+    assert len(fast_server.state.records) - fast_before == 3
+    assert all(result["content"] == "palavra0 palavra1 palavra2" for result, _ in results)
+    assert router.stats["fast"].expected_latency() < router.stats["slow"].expected_latency()
+
+
+def test_falls_back_when_backend_is_down(fast_server, dead_url, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_HEDGE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_ROUTER_MIN_SAMPLES", 1)
+
+    router, results = _run([("dead", dead_url), ("fast", fast_server.base_url)], calls=3)
+
+    assert len(results) == 3
+    # One failure trips the dead backend, so later calls don't try it again
+    assert list(router.stats["dead"].errors) == [True]
+    assert not router.stats["dead"].is_healthy(time.monotonic())
+    assert list(router.stats["fast"].errors) == [False, False, False]
+
+
+def test_raises_when_every_backend_fails(dead_url, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_HEDGE_ENABLED", False)
+
+    with pytest.raises(Exception):
+        _run([("dead", dead_url), ("also_dead", f"http://127.0.0.1:{_free_port()}/v1")])
+
+
+def test_hedges_slow_backend(fast_server, slow_server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_ROUTER_HEDGE_MIN_DELAY_SECONDS", 0.1)
+    fast_before, slow_before = len(fast_server.state.records), len(slow_server.state.records)
+
+    router, [(result, elapsed)] = _run([("slow", slow_server.base_url), ("fast", fast_server.base_url)])
+
+    # The slow primary got the request, the hedge answered first
+    assert result["content"] == "palavra0 palavra1 palavra2"
+    assert elapsed < 0.5
+    assert len(slow_server.state.records) - slow_before == 1
+    assert len(fast_server.state.records) - fast_before == 1
+    # The cancelled primary still counts as at least that slow, not as an error
+    assert router.stats["slow"].in_flight == 0
+    assert list(router.stats["slow"].errors) == []
+    assert router.stats["slow"].percentile(0.5) >= 0.1
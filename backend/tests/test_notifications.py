@@ -0,0 +1,337 @@
+from collections import namedtuple
+import http.server
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+
+from config import settings
+from services import notifications, price_alerts
+from services.notifications import EmailBatchError, EmailSender
+from services.price_alerts import DIGEST_DUE_KEY, DIGEST_KEY_PREFIX, PriceAlertDigester
+from services.rate_limiter import RateLimitExceeded
+
+
+class PostmarkStub(http.server.ThreadingHTTPServer):
+    """Local stand-in for Postmark's /email/batch endpoint"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), PostmarkHandler)
+        self.batches = []
+        self.fail_batch = None  # 1-based index of the batch answered with a 500
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class PostmarkHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches.append((self.path, self.headers["X-Postmark-Server-Token"], body))
+
+        if len(self.server.batches) == self.server.fail_batch:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        # Postmark answers 200 for the batch with a result per message
+        results = [
+            {"ErrorCode": 300 if message["To"].startswith("invalid") else 0}
+            for message in body
+        ]
+        payload = json.dumps(results).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server: accepts every recipient except rejected ones"""
+
+    daemon_threads = True
+
+    def __init__(self, reject=()):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.reject = set(reject)
+        self.messages = []
+        self.connections = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 stub ESMTP")
+        recipients = []
+
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO", "NOOP", "RSET"):
+                recipients = []
+                self.reply("250 ok")
+            elif verb == "MAIL":
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in self.server.reject:
+                    self.reply("550 mailbox unavailable")
+                else:
+                    recipients.append(address)
+                    self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 end with .")
+                data = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b"\r\n") == b".":
+                        break
+                    data.append(data_line)
+                self.server.messages.append((recipients, b"".join(data).decode()))
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+    def reply(self, text: str):
+        self.wfile.write(f"{text}\r\n".encode())
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class StubRateLimiter:
+    """Counts email tokens; raises once `budget` tokens have been handed out"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.acquired = 0
+
+    def acquire_blocking(self, bucket, max_wait=None, trace_id=None):
+        if self.budget is not None and self.acquired >= self.budget:
+            raise RateLimitExceeded(bucket, max_wait or 0)
+        self.acquired += 1
+
+
+def _messages(*recipients):
+    return [{"to": to, "subject": "Alerta", "text": f"Olá {to}"} for to in recipients]
+
+
+def _sender(rate_limiter=None) -> EmailSender:
+    sender = EmailSender()
+    sender.rate_limiter = rate_limiter or StubRateLimiter()
+    return sender
+
+
+@pytest.fixture
+def postmark(monkeypatch):
+    server = _serve(PostmarkStub())
+    monkeypatch.setattr(settings, "POSTMARK_API_KEY", "test-token")
+    monkeypatch.setattr(settings, "POSTMARK_API_URL", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = _serve(SMTPStub(reject={"bounce@example.com"}))
+    monkeypatch.setattr(settings, "POSTMARK_API_KEY", "")
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_postmark_sends_chunks_and_counts_accepted(postmark, monkeypatch):
+    monkeypatch.setattr(notifications, "POSTMARK_BATCH_LIMIT", 2)
+    limiter = StubRateLimiter()
+
+    sent = _sender(limiter).send_batch(_messages("a@example.com", "invalid@example.com", "c@example.com"))
+
+    assert sent == 2
+    assert limiter.acquired == 3
+    assert [(path, token, len(body)) for path, token, body in postmark.batches] == [
+        ("/email/batch", "test-token", 2),
+        ("/email/batch", "test-token", 1)
+    ]
+    assert postmark.batches[0][2][0]["From"] == settings.EMAIL_FROM
+
+
+def test_postmark_failure_reports_handled_messages(postmark, monkeypatch):
+    monkeypatch.setattr(notifications, "POSTMARK_BATCH_LIMIT", 2)
+    postmark.fail_batch = 2
+
+    with pytest.raises(EmailBatchError) as exc_info:
+        _sender().send_batch(_messages("a@example.com", "b@example.com", "c@example.com", "d@example.com"))
+
+    assert exc_info.value.handled == 2
+    assert len(postmark.batches) == 2
+
+
+def test_postmark_throttle_timeout_stops_before_posting(postmark, monkeypatch):
+    monkeypatch.setattr(notifications, "POSTMARK_BATCH_LIMIT", 2)
+
+    with pytest.raises(EmailBatchError) as exc_info:
+        _sender(StubRateLimiter(budget=3)).send_batch(
+            _messages("a@example.com", "b@example.com", "c@example.com", "d@example.com")
+        )
+
+    assert exc_info.value.handled == 2
+    assert isinstance(exc_info.value.error, RateLimitExceeded)
+    assert len(postmark.batches) == 1
+
+
+def test_smtp_sends_batch_over_one_connection(smtp):
+    sent = _sender().send_batch(_messages("a@example.com", "bounce@example.com", "c@example.com"))
+
+    assert sent == 2
+    assert smtp.connections == 1
+    assert [recipients for recipients, _ in smtp.messages] == [["a@example.com"], ["c@example.com"]]
+    assert "Subject: Alerta" in smtp.messages[0][1]
+
+
+def test_smtp_throttle_timeout_reports_handled_messages(smtp):
+    with pytest.raises(EmailBatchError) as exc_info:
+        _sender(StubRateLimiter(budget=1)).send_batch(_messages("a@example.com", "c@example.com"))
+
+    assert exc_info.value.handled == 1
+    assert len(smtp.messages) == 1
+
+
+class FakeRedis:
+    """The handful of hash/sorted-set commands the digester uses"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted(
+            (score, member) for member, score in self.zsets.get(key, {}).items()
+            if low <= score <= high
+        )
+        return [member for _, member in members][start:None if num is None else start + num]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(field, value)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def zadd(self, key, mapping, nx=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not (nx and member in zset):
+                zset[member] = score
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+User = namedtuple("User", "id email name")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = users
+
+    def execute(self, statement, params):
+        return FakeResult([user for user in self.users if user.id in params["ids"]])
+
+
+def _entry(offer_id: str, price: int) -> str:
+    return json.dumps({
+        "alert_id": 1, "origin": "GRU", "destination": "LIS", "out_date": "2026-12-01",
+        "ret_date": None, "source": "duffel", "offer_type": "cash",
+        "price": price, "price_label": f"BRL {price / 100:.2f}"
+    })
+
+
+@pytest.fixture
+def digest_redis(monkeypatch):
+    redis = FakeRedis()
+    for user_id in (1, 2, 3, 4):
+        redis.hset(f"{DIGEST_KEY_PREFIX}:{user_id}", f"offer-{user_id}", _entry(f"offer-{user_id}", 100000))
+        redis.zadd(DIGEST_DUE_KEY, {str(user_id): time.time() - user_id})
+    monkeypatch.setattr(price_alerts, "get_redis", lambda: redis)
+    return redis
+
+
+def test_digest_failure_requeues_only_unsent_users(postmark, monkeypatch, digest_redis):
+    monkeypatch.setattr(notifications, "POSTMARK_BATCH_LIMIT", 2)
+    postmark.fail_batch = 2
+    db = FakeDB([User(i, f"user{i}@example.com", f"User {i}") for i in (1, 2, 3, 4)])
+
+    with pytest.raises(EmailBatchError):
+        PriceAlertDigester(db, sender=_sender()).flush()
+
+    # Due users come out oldest first (4, 3, 2, 1); the first chunk reached Postmark
+    first_chunk = [message["To"] for message in postmark.batches[0][2]]
+    assert first_chunk == ["user4@example.com", "user3@example.com"]
+    assert sorted(digest_redis.zsets[DIGEST_DUE_KEY]) == ["1", "2"]
+    assert sorted(digest_redis.hashes) == [f"{DIGEST_KEY_PREFIX}:1", f"{DIGEST_KEY_PREFIX}:2"]
+
+    # The next flush delivers just the requeued digests
+    postmark.fail_batch = None
+    stats = PriceAlertDigester(db, sender=_sender()).flush()
+
+    assert stats == {"users": 2, "offers": 2, "sent": 2}
+    assert not digest_redis.zsets[DIGEST_DUE_KEY]
+
+
+def test_digest_dedupes_offers_per_user(postmark, digest_redis):
+    digest_redis.hset(f"{DIGEST_KEY_PREFIX}:1", "offer-1", _entry("offer-1", 90000))
+    digest_redis.hset(f"{DIGEST_KEY_PREFIX}:1", "offer-9", _entry("offer-9", 120000))
+    db = FakeDB([User(i, f"user{i}@example.com", None) for i in (1, 2, 3, 4)])
+
+    stats = PriceAlertDigester(db, sender=_sender()).flush()
+
+    assert stats == {"users": 4, "offers": 5, "sent": 4}
+    [batch] = [body for _, _, body in postmark.batches]
+    digest = next(message for message in batch if message["To"] == "user1@example.com")
+    assert digest["Subject"] == "Alerta de preço: 2 oferta(s) encontrada(s)"
+    assert digest["TextBody"].index("BRL 900.00") < digest["TextBody"].index("BRL 1200.00")
@@ -0,0 +1,207 @@
+import asyncio
+import http.server
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from config import settings
+from providers import transport
+from providers.transport import ProviderTransport
+
+READ_TIMEOUT = 0.2
+
+
+class ProviderStub(http.server.ThreadingHTTPServer):
+    """
+    Local provider API: answers each request with the next scripted action.
+
+    An action is a status code, "drop" (close without answering) or
+    "slow" (answer after the client's read timeout); once the script is
+    used up every request gets a 200.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ProviderHandler)
+        self.script = []
+        self.requests = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class ProviderHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._answer()
+
+    def _answer(self):
+        self.server.requests.append((self.command, self.path))
+        action = self.server.script.pop(0) if self.server.script else 200
+
+        if action == "drop":
+            self.close_connection = True
+            return
+        if action == "slow":
+            time.sleep(READ_TIMEOUT * 3)
+            action = 200
+
+        payload = json.dumps({"status": action}).encode()
+        self.send_response(action)
+        if action == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider():
+    server = ProviderStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    """Skip the backoff sleeps, recording the delays instead"""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(transport.asyncio, "sleep", sleep)
+    monkeypatch.setattr(settings, "PROVIDER_TIMEOUTS", {"stub": READ_TIMEOUT})
+    monkeypatch.setattr(settings, "PROVIDER_MAX_RETRIES", 2)
+    return delays
+
+
+def _request(base_url: str, method: str, url: str = "/offers", **kwargs):
+    async def run():
+        provider_transport = ProviderTransport("stub", base_url)
+        try:
+            return await provider_transport.request(method, url, **kwargs)
+        finally:
+            await provider_transport.aclose()
+
+    return asyncio.run(run())
+
+
+def test_get_retries_server_errors_with_backoff(provider, backoff):
+    provider.script = [503, 502]
+
+    response = _request(provider.url, "GET")
+
+    assert response.status_code == 200
+    assert len(provider.requests) == 3
+    assert backoff == [0.2, 0.4]
+
+
+def test_retry_after_header_stretches_backoff(provider, backoff):
+    provider.script = [429]
+
+    response = _request(provider.url, "GET")
+
+    assert response.status_code == 200
+    assert backoff == [1.0]
+
+
+def test_gives_up_with_last_response_after_max_retries(provider, backoff):
+    provider.script = [503, 503, 503, 503]
+
+    response = _request(provider.url, "GET")
+
+    assert response.status_code == 503
+    assert len(provider.requests) == 3
+
+
+def test_post_is_not_resent_after_server_error(provider, backoff):
+    provider.script = [502]
+
+    response = _request(provider.url, "POST", json={"slices": []})
+
+    assert response.status_code == 502
+    assert provider.requests == [("POST", "/offers")]
+
+
+def test_post_is_resent_when_rejected(provider, backoff):
+    provider.script = [429]
+
+    response = _request(provider.url, "POST", json={"slices": []})
+
+    assert response.status_code == 200
+    assert len(provider.requests) == 2
+
+
+def test_post_read_timeout_is_raised_without_retry(provider, backoff):
+    provider.script = ["slow"]
+
+    with pytest.raises(httpx.ReadTimeout):
+        _request(provider.url, "POST", json={"slices": []})
+
+    assert len(provider.requests) == 1
+
+
+def test_idempotent_post_retries_read_timeout(provider, backoff):
+    provider.script = ["slow"]
+
+    response = _request(provider.url, "POST", json={"slices": []}, idempotent=True)
+
+    assert response.status_code == 200
+    assert len(provider.requests) == 2
+
+
+def test_get_retries_dropped_connection(provider, backoff):
+    provider.script = ["drop"]
+
+    response = _request(provider.url, "GET")
+
+    assert response.status_code == 200
+    assert len(provider.requests) == 2
+
+
+def test_connect_error_is_retried_then_raised(backoff):
+    # Nothing listens on the port the stub was bound to once it is closed
+    server = ProviderStub()
+    url = server.url
+    server.server_close()
+
+    with pytest.raises(httpx.ConnectError):
+        _request(url, "POST", json={"slices": []})
+
+    assert len(backoff) == 2
+
+
+def test_retry_budget_stops_retry_storm(provider, backoff, monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BUDGET_MIN", 1)
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BUDGET_RATIO", 0.0)
+    provider.script = [503, 503, 503]
+
+    async def run():
+        provider_transport = ProviderTransport("stub", provider.url)
+        try:
+            first = await provider_transport.request("GET", "/offers")
+            second = await provider_transport.request("GET", "/offers")
+            return first, second, provider_transport.retry_budget
+        finally:
+            await provider_transport.aclose()
+
+    first, second, budget = asyncio.run(run())
+
+    # The first request spends the budget's only retry; the second gets none
+    assert (first.status_code, second.status_code) == (503, 503)
+    assert len(provider.requests) == 3
+    assert (len(budget._requests), len(budget._retries)) == (2, 1)
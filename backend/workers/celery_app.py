@@ -1,5 +1,7 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_shutdown
+from kombu import Exchange, Queue
 from config import settings
 
 # Initialize Celery
@@ -22,6 +24,31 @@ celery_app.conf.update(
     worker_max_tasks_per_child=50
 )
 
+# Queues, highest priority first. Interactive and notifications each have
+# their own worker pool in docker-compose, so neither a user's scrape nor
+# the every-minute price-alert digests can wait behind a long warm run or
+# cleanup; warm and maintenance share the background pool, drained in
+# this order. Unrouted tasks default to maintenance, never interactive.
+INTERACTIVE_QUEUE = 'interactive'
+WARM_QUEUE = 'warm'
+MAINTENANCE_QUEUE = 'maintenance'
+NOTIFICATIONS_QUEUE = 'notifications'
+QUEUES = [INTERACTIVE_QUEUE, WARM_QUEUE, NOTIFICATIONS_QUEUE, MAINTENANCE_QUEUE]
+
+celery_app.conf.update(
+    task_queues=[Queue(name, Exchange(name), routing_key=name) for name in QUEUES],
+    task_default_queue=MAINTENANCE_QUEUE,
+    task_routes={
+        'workers.tasks.scrape_miles_offers': {'queue': INTERACTIVE_QUEUE},
+        'workers.tasks.refresh_popular_routes': {'queue': WARM_QUEUE},
+        'workers.tasks.cleanup_expired_offers': {'queue': MAINTENANCE_QUEUE},
+        'workers.tasks.rebuild_knowledge_index': {'queue': MAINTENANCE_QUEUE},
+        'workers.tasks.send_price_alert_digests': {'queue': NOTIFICATIONS_QUEUE},
+    },
+    # Redis transport: poll queues in the order above instead of round-robin
+    broker_transport_options={'queue_order_strategy': 'priority'},
+)
+
 # Periodic tasks
 celery_app.conf.beat_schedule = {
     'refresh-popular-routes': {
@@ -32,7 +59,34 @@ celery_app.conf.beat_schedule = {
         'task': 'workers.tasks.cleanup_expired_offers',
         'schedule': crontab(hour='*/6'),  # Every 6 hours
     },
+    'send-price-alert-digests': {
+        'task': 'workers.tasks.send_price_alert_digests',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'rebuild-knowledge-index': {
+        'task': 'workers.tasks.rebuild_knowledge_index',
+        'schedule': crontab(minute='*/30'),  # Every 30 minutes
+    },
 }
 
+
+def queue_depths() -> dict:
+    """Tasks waiting in each queue (Redis broker: one list per queue)"""
+    from database.db import get_redis
+
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    for name in QUEUES:
+        pipe.llen(name)
+    return dict(zip(QUEUES, pipe.execute()))
+
+
+@worker_process_shutdown.connect
+def _close_browser_pool(**kwargs):
+    """Close the worker's pooled Playwright browser, if one was launched"""
+    from workers.browser_pool import close_browser_pool
+    close_browser_pool()
+
+
 # Auto-discover tasks
 celery_app.autodiscover_tasks(['workers'])
@@ -1,82 +1,188 @@
 from workers.celery_app import celery_app
-from database.db import SessionLocal
-from sqlalchemy import text
+from database.db import SessionLocal, get_redis
+from services.rate_limiter import get_rate_limiter, RateLimitExceeded
+from workers.browser_pool import get_browser_pool
+from config import settings
+from datetime import date
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import time
 import structlog
 
 logger = structlog.get_logger()
 
 
+# Playwright's sync API keeps its own event loop registered as running on
+# the task thread once the browser pool has started it, so asyncio.run()
+# there fails; async work gets a fresh loop on this thread instead
+_async_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-async")
+
+
+def run_async(coro):
+    """Run a coroutine to completion on a fresh event loop off the task thread"""
+    return _async_runner.submit(asyncio.run, coro).result()
+
+
 @celery_app.task(name='workers.tasks.scrape_miles_offers')
-def scrape_miles_offers(origin: str, destination: str, out_date: str, program: str):
+def scrape_miles_offers(
+    origin: str,
+    destination: str,
+    out_date: str,
+    program: str,
+    ret_date: Optional[str] = None,
+    adults: int = 1,
+    children: int = 0,
+    infants: int = 0,
+    cabin: str = "ECONOMY",
+    trace_id: Optional[str] = None,
+    reply_channel: Optional[str] = None
+):
     """
     Scrape miles offers from loyalty program websites.
 
-    This is a STUB for MVP. Real implementation would use Playwright
-    to scrape availability from Smiles, LATAM Pass, TudoAzul.
+    Dispatched by SearchService.search_miles_offers, one task per program.
+    Offers are stored here and then published to reply_channel, so the
+    waiting API request gets them over Redis pub/sub and late results still
+    land in the database for the next search.
+
+    This is a STUB for MVP: it loads the program's site in a pooled
+    Playwright context (workers/browser_pool.py) but offers still come
+    from the provider's mock for Smiles, LATAM Pass, TudoAzul.
 
     IMPORTANT: Scraping must respect:
     - robots.txt
     - Terms of Service
-    - Rate limits
+    - Rate limits (enforced by the shared token bucket for the program)
     - Use rotating proxies
-    - Implement circuit breakers
+    - Circuit breakers (tracked by the dispatching SearchService)
     """
+    from schemas.flight import SearchParams, Pax, CabinClass
+    from services.search_service import SearchService, get_miles_provider
+    from providers.base_provider import prepaid_token
+
+    trace_id = trace_id or f"scrape-{program}"
     logger.info(
         "scrape_task_started",
         origin=origin,
         destination=destination,
-        program=program
+        program=program,
+        trace_id=trace_id
     )
 
+    db = SessionLocal()
     try:
-        # In real implementation:
-        # 1. Launch Playwright browser with stealth mode
-        # 2. Navigate to program website
-        # 3. Fill search form
-        # 4. Parse results
-        # 5. Store in database
-        # 6. Return offer IDs
+        # Same bucket as the provider, shared across every worker and replica
+        get_rate_limiter().acquire_blocking(program, trace_id=trace_id)
 
-        logger.info("scrape_task_stub", message="Scraping not implemented in MVP")
+        started = time.perf_counter()
 
-        return {
+        # Warm context from the worker's pool instead of a browser per scrape.
+        # While parsing is a stub the page isn't needed, so it's only loaded
+        # with SCRAPING_LOAD_PAGES, and never for longer than half the
+        # interactive miles deadline
+        if settings.SCRAPING_LOAD_PAGES:
+            try:
+                with get_browser_pool().page() as page:
+                    page.goto(
+                        settings.SCRAPING_PROGRAM_URLS[program],
+                        wait_until="domcontentloaded",
+                        timeout=min(
+                            settings.SCRAPING_PAGE_TIMEOUT_SECONDS,
+                            settings.MILES_SEARCH_TIMEOUT_SECONDS / 2
+                        ) * 1000
+                    )
+
+                    # In real implementation:
+                    # 1. Fill search form
+                    # 2. Parse results into offers
+
+                logger.info(
+                    "scrape_page_loaded",
+                    program=program,
+                    duration_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+            except Exception as e:
+                logger.warning("scrape_page_error", program=program, error=str(e), trace_id=trace_id)
+
+        params = SearchParams(
+            origin=origin,
+            destination=destination,
+            out_date=date.fromisoformat(out_date),
+            ret_date=date.fromisoformat(ret_date) if ret_date else None,
+            pax=Pax(adults=adults, children=children, infants=infants),
+            cabin=CabinClass(cabin)
+        )
+
+        provider = get_miles_provider(program)
+
+        async def scrape():
+            # This scrape's token was already taken above
+            with prepaid_token(program):
+                offers = await provider.search_offers(params, trace_id)
+            await SearchService(db)._store_offers_in_db(offers)
+            return offers
+
+        offers = run_async(scrape())
+        result = {
             "success": True,
-            "message": "Scraping stub - no real data collected"
+            "program": program,
+            "offers": [offer.model_dump(mode='json') for offer in offers],
+            # Scrape time only (after queueing and the token wait), for the
+            # program's adaptive timeout
+            "scrape_ms": round((time.perf_counter() - started) * 1000, 1)
         }
 
     except Exception as e:
-        logger.error("scrape_task_error", error=str(e))
-        return {
+        logger.error("scrape_task_error", error=str(e), program=program, trace_id=trace_id)
+        result = {
             "success": False,
-            "error": str(e)
+            "program": program,
+            "error": str(e),
+            # Our own throttle, not the program failing: doesn't count
+            # against its circuit breaker
+            "rate_limited": isinstance(e, RateLimitExceeded),
+            "offers": []
         }
+    finally:
+        db.close()
+
+    if reply_channel:
+        try:
+            get_redis().publish(reply_channel, json.dumps(result))
+        except Exception as e:
+            logger.warning("scrape_result_publish_error", error=str(e), trace_id=trace_id)
+
+    return {
+        "success": result["success"],
+        "program": program,
+        "offers_count": len(result["offers"]),
+        "error": result.get("error")
+    }
 
 
 @celery_app.task(name='workers.tasks.refresh_popular_routes')
 def refresh_popular_routes():
     """
     Periodically refresh cache for popular routes.
-    This keeps the cache warm for common searches.
+
+    Routes and dates are ranked by observed search demand (hourly Redis
+    counters) and by how soon their cache expires; the top ones are
+    re-searched through SearchService within the scraping rate budget.
     """
-    logger.info("refresh_popular_routes_started")
+    from services.route_warmer import RouteWarmer
 
-    popular_routes = [
-        ("GRU", "REC"),
-        ("GRU", "SSA"),
-        ("GRU", "FOR"),
-        ("GRU", "BSB"),
-        ("REC", "GRU"),
-        ("SSA", "GRU")
-    ]
+    logger.info("refresh_popular_routes_started")
 
+    db = SessionLocal()
     try:
-        # Trigger searches for popular routes
-        # This would call the search service
-        logger.info("refresh_popular_routes_stub", count=len(popular_routes))
+        result = run_async(RouteWarmer(db).warm())
 
         return {
             "success": True,
-            "routes_refreshed": len(popular_routes)
+            "routes_refreshed": result["refreshed"],
+            "routes_failed": result["failed"]
         }
 
     except Exception as e:
@@ -85,63 +191,94 @@ def refresh_popular_routes():
             "success": False,
             "error": str(e)
         }
+    finally:
+        db.close()
 
 
 @celery_app.task(name='workers.tasks.cleanup_expired_offers')
 def cleanup_expired_offers():
     """
     Clean up expired offers from database.
+
+    Drops departed out_date partitions and deletes the remaining expired
+    rows in short batches, so the search path's writes never wait on it.
     """
+    from services.offer_retention import OfferRetention
+
     logger.info("cleanup_expired_offers_started")
 
+    db = SessionLocal()
     try:
-        db = SessionLocal()
+        stats = OfferRetention(db).run()
 
-        # Delete expired offers
-        result = db.execute(text("""
-            DELETE FROM offers
-            WHERE expires_at < NOW()
-        """))
+        return {
+            "success": True,
+            "deleted_count": stats["rows_deleted"] + stats["rows_dropped"],
+            **stats
+        }
 
-        deleted_count = result.rowcount
-        db.commit()
+    except Exception as e:
+        logger.error("cleanup_error", error=str(e))
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    finally:
         db.close()
 
-        logger.info("cleanup_complete", deleted_count=deleted_count)
+
+@celery_app.task(name='workers.tasks.send_price_alert_digests')
+def send_price_alert_digests():
+    """
+    Send the price alert digests whose buffering window has closed.
+    One email per user, however many alerts and offers matched.
+    """
+    from services.price_alerts import PriceAlertDigester
+
+    db = SessionLocal()
+    try:
+        stats = PriceAlertDigester(db).flush()
 
         return {
             "success": True,
-            "deleted_count": deleted_count
+            **stats
         }
 
     except Exception as e:
-        logger.error("cleanup_error", error=str(e))
+        logger.error("price_alert_digest_error", error=str(e))
         return {
             "success": False,
             "error": str(e)
         }
+    finally:
+        db.close()
 
 
-@celery_app.task(name='workers.tasks.send_price_alert')
-def send_price_alert(user_id: int, alert_id: int, offer_id: str):
+@celery_app.task(name='workers.tasks.rebuild_knowledge_index')
+def rebuild_knowledge_index():
     """
-    Send price alert email when a matching offer is found.
-    For v1 implementation.
+    Rebuild the in-process ANN index over knowledge_base.
+    API workers pick up the new version on their next reload check.
     """
-    logger.info("send_price_alert", user_id=user_id, alert_id=alert_id)
+    from services.knowledge_service import rebuild_knowledge_index as rebuild
 
+    logger.info("rebuild_knowledge_index_started")
+
+    db = SessionLocal()
     try:
-        # Send email via Postmark/Sendgrid
-        # Include offer details and deeplink
+        index = rebuild(db)
 
         return {
             "success": True,
-            "message": "Price alert stub"
+            "documents": len(index),
+            "version": index.version
         }
 
     except Exception as e:
-        logger.error("price_alert_error", error=str(e))
+        logger.error("rebuild_knowledge_index_error", error=str(e))
         return {
             "success": False,
             "error": str(e)
         }
+    finally:
+        db.close()
@@ -19,9 +19,10 @@ CREATE TABLE IF NOT EXISTS carriers (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Offers table
+-- Offers table, range-partitioned by out_date week so departed weeks are
+-- dropped as whole partitions (see services/offer_retention.py)
 CREATE TABLE IF NOT EXISTS offers (
-    id VARCHAR(100) PRIMARY KEY,
+    id VARCHAR(100) NOT NULL,
     source VARCHAR(50) NOT NULL,
     offer_type VARCHAR(20) NOT NULL CHECK (offer_type IN ('cash', 'miles')),
     cabin VARCHAR(20) NOT NULL,
@@ -50,17 +51,39 @@ CREATE TABLE IF NOT EXISTS offers (
     ancillaries_available BOOLEAN DEFAULT false,
 
     -- Cache control
-    hash VARCHAR(64) UNIQUE NOT NULL,
+    hash VARCHAR(64) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     expires_at TIMESTAMP NOT NULL,
 
+    -- Unique keys on a partitioned table must include the partition key
+    PRIMARY KEY (id, out_date),
+    UNIQUE (hash, out_date),
     FOREIGN KEY (origin) REFERENCES airports(iata),
     FOREIGN KEY (destination) REFERENCES airports(iata)
-);
+) PARTITION BY RANGE (out_date);
 
 CREATE INDEX idx_offers_route_date ON offers(origin, destination, out_date, ret_date);
 CREATE INDEX idx_offers_expires ON offers(expires_at);
-CREATE INDEX idx_offers_hash ON offers(hash);
+
+-- No DEFAULT partition: it would rule out DETACH PARTITION ... CONCURRENTLY
+-- when departed weeks are dropped. The weeks below reach further than
+-- airlines sell; offers past them aren't stored (partition_horizon).
+
+-- One partition per ISO week (Monday start), named offers_pYYYYMMDD;
+-- the cleanup task keeps creating them OFFER_PARTITION_WEEKS_AHEAD ahead
+DO $$
+DECLARE
+    week_start DATE := date_trunc('week', CURRENT_DATE)::date;
+BEGIN
+    FOR i IN 0..56 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF offers FOR VALUES FROM (%L) TO (%L)',
+            'offers_p' || to_char(week_start + i * 7, 'YYYYMMDD'),
+            week_start + i * 7,
+            week_start + (i + 1) * 7
+        );
+    END LOOP;
+END $$;
 
 -- Queries cache table
 CREATE TABLE IF NOT EXISTS queries_cache (
@@ -78,7 +101,8 @@ CREATE TABLE IF NOT EXISTS queries_cache (
     result_offer_ids TEXT[],
     last_refreshed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
-    CONSTRAINT unique_query UNIQUE (origin, destination, out_date, ret_date, pax_adults, pax_children, pax_infants, cabin)
+    -- NULLS NOT DISTINCT so one-way queries (ret_date NULL) upsert too
+    CONSTRAINT unique_query UNIQUE NULLS NOT DISTINCT (origin, destination, out_date, ret_date, pax_adults, pax_children, pax_infants, cabin)
 );
 
 CREATE INDEX idx_queries_route ON queries_cache(origin, destination, out_date);
@@ -104,11 +128,14 @@ CREATE TABLE IF NOT EXISTS bookings (
     deeplink_url TEXT,
 
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 
-    FOREIGN KEY (offer_id) REFERENCES offers(id)
+    -- No FK to offers: offers are short-lived cache rows that get deleted
+    -- and dropped by partition, while bookings are kept
 );
 
+CREATE INDEX idx_bookings_offer ON bookings(offer_id);
+
 CREATE INDEX idx_bookings_reference ON bookings(booking_reference);
 CREATE INDEX idx_bookings_email ON bookings(contact_email);
 
@@ -178,9 +205,12 @@ CREATE INDEX idx_audit_service ON audit_log(service, created_at);
 INSERT INTO airports (iata, name, city, country, timezone) VALUES
 ('GRU', 'São Paulo/Guarulhos International Airport', 'São Paulo', 'Brazil', 'America/Sao_Paulo'),
 ('CGH', 'Congonhas Airport', 'São Paulo', 'Brazil', 'America/Sao_Paulo'),
+('VCP', 'Viracopos International Airport', 'Campinas', 'Brazil', 'America/Sao_Paulo'),
 ('GIG', 'Rio de Janeiro/Galeão International Airport', 'Rio de Janeiro', 'Brazil', 'America/Sao_Paulo'),
 ('SDU', 'Santos Dumont Airport', 'Rio de Janeiro', 'Brazil', 'America/Sao_Paulo'),
 ('BSB', 'Brasília International Airport', 'Brasília', 'Brazil', 'America/Sao_Paulo'),
+('CNF', 'Belo Horizonte/Confins International Airport', 'Belo Horizonte', 'Brazil', 'America/Sao_Paulo'),
+('PLU', 'Pampulha Airport', 'Belo Horizonte', 'Brazil', 'America/Sao_Paulo'),
 ('REC', 'Recife/Guararapes International Airport', 'Recife', 'Brazil', 'America/Recife'),
 ('SSA', 'Salvador Deputado Luís Eduardo Magalhães International Airport', 'Salvador', 'Brazil', 'America/Bahia'),
 ('FOR', 'Fortaleza Pinto Martins International Airport', 'Fortaleza', 'Brazil', 'America/Fortaleza'),